@@ -102,7 +102,22 @@ admin.site.register(Trajectory)
 admin.site.register(TrajectoryPoint)
 
 admin.site.register(SpectrumData)
-admin.site.register(SpectralRecord)
+
+
+class SpectralRecordAdmin(admin.ModelAdmin):
+    list_display = ('name', 'processing_status', 'raw_file_size', 'processing_time', 'created')
+    list_filter = ('processing_status',)
+    readonly_fields = ('processing_stats',)
+
+    @admin.display(description="Raw file size")
+    def raw_file_size(self, obj):
+        return obj.raw_file.size if obj.raw_file else None
+
+    @admin.display(description="Processing time [s]")
+    def processing_time(self, obj):
+        return obj.processing_stats.get('total_s')
+
+admin.site.register(SpectralRecord, SpectralRecordAdmin)
 admin.site.register(SpectralRecordArtifact)
 
 
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from DOSPORTAL.services.spectral_parser import (
+    DEFAULT_CHUNK_SIZE,
+    FIRST_CHANNEL,
+    iter_sentence_lines,
+    tokenize_sentences,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized $CANDY tokenizer against the pandas read_csv path on a synthetic log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=int,
+            default=1_000_000,
+            help='Number of $CANDY sentences in the synthetic log (default: 1M)',
+        )
+        parser.add_argument(
+            '--channels',
+            type=int,
+            default=256,
+            help='Number of spectrum channels per sentence (default: 256)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Bytes read at once by the streaming tokenizer',
+        )
+        parser.add_argument(
+            '--mixed',
+            action='store_true',
+            help='Mix decimal times, negative and corrupted fields into a few percent of the synthetic sentences',
+        )
+        parser.add_argument(
+            '--log',
+            help='Benchmark an existing log file instead of generating one',
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='dosportal_bench_') as workdir:
+            path = options['log']
+            if not path:
+                path = os.path.join(workdir, 'synthetic.log')
+                self.stdout.write(f"==> Generating {options['lines']} lines x {options['channels']} channels...")
+                self._write_synthetic_log(path, options['lines'], options['channels'], options['mixed'])
+
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            self.stdout.write(f'==> Log size: {size_mb:.1f} MB')
+
+            pandas_rows, pandas_time = self._measure(self._parse_pandas, path)
+            self._report('pandas read_csv', pandas_rows, pandas_time, size_mb)
+
+            numpy_rows, numpy_time = self._measure(self._parse_tokenizer, path, options['chunk_size'])
+            self._report('vectorized tokenizer', numpy_rows, numpy_time, size_mb)
+
+        if pandas_rows != numpy_rows:
+            self.stdout.write(self.style.WARNING(f'Row count mismatch: pandas {pandas_rows}, tokenizer {numpy_rows}'))
+
+        self.stdout.write(self.style.SUCCESS(f'==> Speedup: {pandas_time / numpy_time:.2f}x'))
+
+    def _write_synthetic_log(self, path, n_lines, n_channels, mixed=False, block=10_000):
+        rng = np.random.default_rng(0)
+        # decaying spectrum like a real detector, high channels are mostly empty
+        expected = 2000 * np.exp(-np.arange(n_channels) / 12)
+        spectra = [
+            ','.join(map(str, row))
+            for row in rng.poisson(expected, size=(min(block, n_lines), n_channels))
+        ]
+
+        with open(path, 'w') as f:
+            f.write('$DOS,AIRDOS04,F4,256,f157c1d,benchmark,0000000000000000\n')
+            for i in range(n_lines):
+                time_ms, aux = 10 * i, '256,0,0,0,0'
+                if mixed and i % 50 == 1:
+                    time_ms = f'{10 * i}.25'
+                elif mixed and i % 50 == 2:
+                    aux = '256,-3,0,0,0'
+                elif mixed and i % 500 == 3:
+                    aux = '256,0,0,n/a,0'
+                f.write(f'$CANDY,{i},{time_ms},{25000 + i % 1000},1,{aux},{spectra[i % len(spectra)]}\n')
+                if i % 60 == 0:
+                    f.write(f'$HOUSE,{i // 60},23.5,1013.2,4.98\n')
+
+    def _parse_pandas(self, path):
+        # Mirrors the original ingestion: probe the $CANDY width, read every
+        # sentence with read_csv, then filter and cast column by column.
+        with open(path) as f:
+            num_columns = next(len(line.split(',')) for line in f if line.startswith('$CANDY'))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+            df_log_raw = pd.read_csv(path, sep=',', header=None, names=range(num_columns), on_bad_lines='skip')
+        df_candy = df_log_raw[df_log_raw[0] == '$CANDY']
+        time_col = df_candy[2].astype(float)
+        df_candy[3].astype(float)
+        df_candy.iloc[:, FIRST_CHANNEL:].fillna(0).astype(int)
+        return len(time_col)
+
+    def _parse_tokenizer(self, path, chunk_size):
+        def chunks():
+            with open(path, 'rb') as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+        rows = 0
+        for lines in iter_sentence_lines(chunks()):
+            time_ms, _, _ = tokenize_sentences(lines)
+            rows += len(time_ms)
+        return rows
+
+    def _measure(self, func, *args):
+        start = time.perf_counter()
+        rows = func(*args)
+        return rows, time.perf_counter() - start
+
+    def _report(self, name, rows, elapsed, size_mb):
+        self.stdout.write(
+            f'{name:>22}: {elapsed:8.2f} s  {rows / elapsed:12,.0f} lines/s  {size_mb / elapsed:8.1f} MB/s'
+        )
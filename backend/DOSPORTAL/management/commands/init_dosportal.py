@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
+from django_q.models import Schedule
 
 
 class Command(BaseCommand):
@@ -40,6 +42,9 @@ class Command(BaseCommand):
         else:
             self._setup_minio()
 
+        # 4. Periodic tasks
+        self._setup_schedules()
+
         self.stdout.write(self.style.SUCCESS('==> DOSPORTAL initialization completed'))
 
     def _load_fixtures(self, options):
@@ -68,3 +73,17 @@ class Command(BaseCommand):
             call_command('setup_minio')
         except Exception as e:
             self.stdout.write(self.style.WARNING(f'==> MinIO setup failed: {e}'))
+
+    def _setup_schedules(self):
+        self.stdout.write('==> Setting up periodic tasks...')
+        # ingestions killed by a task timeout are not delivered again by the broker
+        Schedule.objects.update_or_create(
+            name='recover_stale_ingests',
+            defaults={
+                'func': 'DOSPORTAL.tasks.recover_stale_ingests',
+                'schedule_type': Schedule.MINUTES,
+                'minutes': settings.SPECTRAL_INGEST_RECOVERY_MINUTES,
+                'repeats': -1,
+            },
+        )
+        self.stdout.write(self.style.SUCCESS('==> Periodic tasks scheduled'))
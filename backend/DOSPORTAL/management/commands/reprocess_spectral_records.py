@@ -0,0 +1,262 @@
+import datetime
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count, Q
+
+from DOSPORTAL.models import File
+from DOSPORTAL.models.spectrals import SpectralRecord, SpectralRecordArtifact
+from DOSPORTAL.services.spectral_parser import PARSER_VERSION
+from DOSPORTAL.task_queues import (
+    acquire_ingest_lock,
+    ingest_cluster,
+    ingest_lock_ttl,
+    queued_ingests,
+    schedule_ingest,
+)
+from DOSPORTAL.tasks import INGESTION_ARTIFACT_TYPES, process_spectral_record_into_spectral_file_async
+
+
+def _init_worker():
+    django.setup()
+
+
+def _reprocess(record_id, raw_size):
+    """Ingest one record in a pool process. Returns (record_id, error or None, skipped)."""
+    if not acquire_ingest_lock(record_id, ingest_lock_ttl(ingest_cluster(raw_size))):
+        return record_id, None, True
+    try:
+        process_spectral_record_into_spectral_file_async(record_id)
+    except Exception as e:
+        return record_id, str(e), False
+    return record_id, None, False
+
+
+class Command(BaseCommand):
+    help = (
+        'Regenerate artifacts of existing spectral records, e.g. after a parser or artifact schema change. '
+        'Records whose artifacts were created by the current parser version are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Owner organization (id or name)')
+        parser.add_argument('--detector-type', help='Detector type (id or name)')
+        parser.add_argument(
+            '--status',
+            action='append',
+            choices=[choice for choice, _ in SpectralRecord.PROCESSING_STATUS_CHOICES],
+            help='Processing status, may be repeated',
+        )
+        parser.add_argument(
+            '--parser-version',
+            type=int,
+            help='Only records whose spectral artifact was created by this parser version',
+        )
+        parser.add_argument('--limit', type=int, help='Process at most this many records')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Also reprocess records whose artifacts are current',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['queue', 'pool'],
+            default='queue',
+            help='Queue records to the django-q ingestion clusters (default) or ingest them in a local process pool',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processes of the local pool (--mode pool)',
+        )
+        parser.add_argument(
+            '--wait',
+            action='store_true',
+            help='With --mode queue, wait until the queued records are ingested and report the progress',
+        )
+        parser.add_argument(
+            '--state-file',
+            help='Ids of finished records are appended here, they are skipped when the command is run again',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only list the selected records')
+
+    def handle(self, *args, **options):
+        records = self._select(options)
+        done = self._read_state(options['state_file'])
+        selected = [(record_id, size or 0) for record_id, size in records if str(record_id) not in done]
+
+        total_bytes = sum(size for _, size in selected)
+        self.stdout.write(
+            f'==> {len(selected)} records selected ({total_bytes / 1024 / 1024:.1f} MB of raw logs), '
+            f'{len(done)} already finished according to the state file'
+        )
+        if options['dry_run']:
+            for record_id, size in selected:
+                self.stdout.write(f'{record_id}  {size} B')
+            return
+        if not selected:
+            return
+
+        if options['mode'] == 'pool':
+            self._run_pool(selected, options['workers'], options['state_file'])
+        else:
+            self._run_queue(selected, options['wait'], options['state_file'])
+
+    def _select(self, options):
+        queryset = SpectralRecord.objects.filter(raw_file__file_type=File.FILE_TYPE_LOG)
+
+        if options['organization']:
+            queryset = queryset.filter(self._id_or_name('owner', options['organization']))
+        if options['detector_type']:
+            queryset = queryset.filter(self._id_or_name('detector__type', options['detector_type']))
+        if options['status']:
+            queryset = queryset.filter(processing_status__in=options['status'])
+        if options['parser_version'] is not None:
+            queryset = queryset.filter(id__in=SpectralRecordArtifact.objects.filter(
+                artifact_type=SpectralRecordArtifact.SPECTRAL_FILE,
+                artifact__metadata__parser_version=options['parser_version'],
+            ).values('spectral_record'))
+
+        if not options['force']:
+            # current: completed with every ingestion artifact from the running parser version
+            current = SpectralRecord.objects.filter(
+                processing_status=SpectralRecord.PROCESSING_COMPLETED,
+            ).annotate(
+                current_artifacts=Count(
+                    'artifacts__artifact_type',
+                    filter=Q(
+                        artifacts__artifact_type__in=INGESTION_ARTIFACT_TYPES,
+                        artifacts__artifact__metadata__parser_version=PARSER_VERSION,
+                    ),
+                    distinct=True,
+                )
+            ).filter(current_artifacts=len(INGESTION_ARTIFACT_TYPES))
+            queryset = queryset.exclude(id__in=current.values('id'))
+
+        # stable order, an interrupted run continues where it stopped
+        queryset = queryset.order_by('created', 'id').values_list('id', 'raw_file__size')
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+        return list(queryset)
+
+    def _id_or_name(self, field, value):
+        try:
+            return Q(**{f'{field}__id': uuid.UUID(value)})
+        except ValueError:
+            return Q(**{f'{field}__name': value})
+
+    def _read_state(self, path):
+        if not path or not os.path.exists(path):
+            return set()
+        with open(path) as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def _run_pool(self, selected, workers, state_file):
+        self.stdout.write(f'==> Ingesting in {workers} processes')
+        meter = _ThroughputMeter(len(selected), sum(size for _, size in selected))
+        sizes = dict(selected)
+        failed = skipped = 0
+
+        # forked processes must not share the database connections of this one
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_reprocess, record_id, size) for record_id, size in selected]
+            try:
+                for future in as_completed(futures):
+                    record_id, error, was_skipped = future.result()
+                    if was_skipped:
+                        skipped += 1
+                        self.stdout.write(self.style.WARNING(f'{record_id} is already being ingested, skipped'))
+                    elif error:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f'{record_id} failed: {error}'))
+                    else:
+                        self._write_state(state_file, [record_id])
+                    meter.update(1, sizes[record_id])
+                    self.stdout.write(meter.report(failed=failed, skipped=skipped))
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                self.stdout.write(self.style.WARNING('Interrupted, run the command again to continue'))
+                raise
+
+        self._finish(len(selected), failed, skipped)
+
+    def _run_queue(self, selected, wait, state_file):
+        queued = {}
+        skipped = 0
+        records = SpectralRecord.objects.filter(id__in=[record_id for record_id, _ in selected]).select_related('raw_file')
+        for record in records.order_by('created', 'id'):
+            if schedule_ingest(record) is None:
+                skipped += 1
+            queued[record.id] = record.raw_file.size or 0
+        self.stdout.write(f'==> {len(queued) - skipped} records queued, {skipped} were queued already')
+
+        if not wait:
+            self.stdout.write(self.style.SUCCESS('Done, the ingestion clusters process the records in the background'))
+            return
+
+        meter = _ThroughputMeter(len(queued), sum(queued.values()))
+        pending = set(queued)
+        while pending:
+            time.sleep(5)
+            finished = pending - queued_ingests(pending)
+            if not finished:
+                continue
+            pending -= finished
+            meter.update(len(finished), sum(queued[record_id] for record_id in finished))
+            self._write_state(state_file, [
+                record_id for record_id in SpectralRecord.objects.filter(
+                    id__in=finished, processing_status=SpectralRecord.PROCESSING_COMPLETED
+                ).values_list('id', flat=True)
+            ])
+            self.stdout.write(meter.report())
+
+        failed = SpectralRecord.objects.filter(id__in=queued, processing_status=SpectralRecord.PROCESSING_FAILED).count()
+        self._finish(len(queued), failed, 0)
+
+    def _write_state(self, path, record_ids):
+        if not path or not record_ids:
+            return
+        with open(path, 'a') as f:
+            f.writelines(f'{record_id}\n' for record_id in record_ids)
+
+    def _finish(self, total, failed, skipped):
+        message = f'\n==> {total - failed - skipped} records reprocessed, {failed} failed, {skipped} skipped'
+        self.stdout.write(self.style.ERROR(message) if failed else self.style.SUCCESS(message))
+
+
+class _ThroughputMeter:
+    """Records and raw bytes per second since the start, ETA from the byte rate."""
+
+    def __init__(self, total_records, total_bytes):
+        self.total_records = total_records
+        self.total_bytes = total_bytes
+        self.records = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+
+    def update(self, records, size):
+        self.records += records
+        self.bytes += size
+
+    def report(self, **counts):
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        byte_rate = self.bytes / elapsed
+        if self.bytes and self.total_bytes:
+            eta = (self.total_bytes - self.bytes) / byte_rate
+        else:
+            eta = (self.total_records - self.records) * elapsed / max(self.records, 1)
+        extra = ''.join(f'  {name} {value}' for name, value in counts.items() if value)
+        return (
+            f'[{self.records:>{len(str(self.total_records))}}/{self.total_records}] '
+            f'{100 * self.records / self.total_records:5.1f}%  '
+            f'{self.records / elapsed:6.2f} records/s  {byte_rate / 1024 / 1024:7.1f} MB/s  '
+            f'ETA {datetime.timedelta(seconds=round(eta))}{extra}'
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DOSPORTAL', '0005_alter_spectralrecord_owner'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='spectralrecordartifact',
+            name='artifact_type',
+            field=models.CharField(choices=[('spectral', 'Processed log file into spectral file (Parquet)'), ('evolution', 'Count rate evolution at multiple time resolutions (Parquet)')], help_text='Type of artifact (e.g. histogram, processed spectral logs, ...)', max_length=16),
+        ),
+    ]
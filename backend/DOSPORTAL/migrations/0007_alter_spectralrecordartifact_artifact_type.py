@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DOSPORTAL', '0006_alter_spectralrecordartifact_artifact_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='spectralrecordartifact',
+            name='artifact_type',
+            field=models.CharField(choices=[('spectral', 'Processed log file into spectral file (Parquet)'), ('evolution', 'Count rate evolution at multiple time resolutions (Parquet)'), ('spectrum_index', 'Cumulative spectra for time window queries (NumPy)')], help_text='Type of artifact (e.g. histogram, processed spectral logs, ...)', max_length=16),
+        ),
+    ]
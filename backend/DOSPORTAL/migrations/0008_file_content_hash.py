@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DOSPORTAL', '0007_alter_spectralrecordartifact_artifact_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file content, computed during upload', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DOSPORTAL', '0008_file_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spectralrecord',
+            name='processing_stats',
+            field=models.JSONField(blank=True, default=dict, help_text='Timings (seconds) of the processing stages and sizes of the processed data'),
+        ),
+    ]
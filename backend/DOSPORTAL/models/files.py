@@ -2,6 +2,7 @@ from .utils import UUIDMixin
 from django.db import models
 from ..models.organizations import Organization
 from django.conf import settings
+from DOSPORTAL.services.log_metadata import METADATA_KEY, read_log_metadata
 
 
 class File(UUIDMixin):
@@ -35,6 +36,12 @@ class File(UUIDMixin):
 
     metadata = models.JSONField(blank=True, default=dict)
     size = models.BigIntegerField(null=True, blank=True)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the file content, computed during upload",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(
@@ -59,4 +66,10 @@ class File(UUIDMixin):
     def save(self, *args, **kwargs):
         if self.file and not self.size:
             self.size = self.file.size
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if self.file and not self.content_hash and not self.file._committed:
+            # set by DOSPORTAL.upload_handlers while the upload streamed in
+            self.content_hash = getattr(self.file.file, 'content_hash', '')
+        if self.file and self.file_type == self.FILE_TYPE_LOG and not self.file._committed and isinstance(self.metadata, dict):
+            # header and time range from both ends of the upload, before it is sent to storage
+            self.metadata[METADATA_KEY] = read_log_metadata(self.file.file, self.size)
+        super().save(*args, **kwargs)
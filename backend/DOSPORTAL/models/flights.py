@@ -65,7 +65,7 @@ class Flight(UUIDMixin):
 
     def save(self, *args, **kwargs):
         print("ASYNYC..", self)
-        # async_task(process_flight_entry, self)
+        # schedule_cari(self)  # DOSPORTAL.task_queues
         super(Flight, self).save(*args, **kwargs)
 
     class Meta:
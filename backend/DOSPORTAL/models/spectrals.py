@@ -190,13 +190,25 @@ class SpectralRecord(UUIDMixin):
         help_text="Status of async background processing"
     )
 
+    processing_stats = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Timings (seconds) of the processing stages and sizes of the processed data",
+    )
+
 
 class SpectralRecordArtifact(UUIDMixin):
     SPECTRAL_FILE = "spectral"
+    EVOLUTION_PYRAMID = "evolution"
+    SPECTRUM_INDEX = "spectrum_index"
+    TELEMETRY = "telemetry"
 
 
     ARTIFACT_TYPES = (
         (SPECTRAL_FILE, "Processed log file into spectral file (Parquet)"),
+        (EVOLUTION_PYRAMID, "Count rate evolution at multiple time resolutions (Parquet)"),
+        (SPECTRUM_INDEX, "Cumulative spectra for time window queries (NumPy)"),
+        (TELEMETRY, "Auxiliary $CANDY fields and telemetry sentences (Parquet)"),
     )
 
     artifact_type = models.CharField(
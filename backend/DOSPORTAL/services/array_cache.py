@@ -0,0 +1,108 @@
+"""
+In-process LRU cache of decoded artifact arrays.
+
+Decoding a spectral artifact costs a full download and a Parquet decode,
+while the charts of one record request it several times in a row (and in
+parallel). Decoded arrays are kept per process under a byte budget, least
+recently used entries are evicted first. Concurrent misses of one key are
+coalesced: the first request loads, the others wait for its result.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class LRUArrayCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> threading.Event of the request loading it
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """Store `value` of `nbytes`, values above the whole budget are not kept."""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def get_or_load(self, key, load, sizeof):
+        """
+        Cached value of `key`, otherwise `load()` it and keep it with
+        `sizeof(value)` bytes. Only one concurrent request loads a key.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    self.misses += 1
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # another request loads the key, retry once it is done (or failed)
+            loading.wait()
+
+        try:
+            value = load()
+            self.put(key, value, sizeof(value))
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_spectral_arrays = None
+_create_lock = threading.Lock()
+
+
+def spectral_array_cache():
+    """Per-process cache of decoded spectral artifacts, see SPECTRAL_ARRAY_CACHE_BYTES."""
+    global _spectral_arrays
+    with _create_lock:
+        if _spectral_arrays is None:
+            _spectral_arrays = LRUArrayCache(settings.SPECTRAL_ARRAY_CACHE_BYTES)
+    return _spectral_arrays
@@ -0,0 +1,185 @@
+"""
+Node-local disk cache of immutable artifact objects.
+
+Generated artifacts never change once written and are identified by the
+SHA-256 of their content (`File.content_hash`), so a copy downloaded once
+serves every later request of any process on the node. Files are stored
+content-addressed as `<directory>/<hash[:2]>/<hash>`; the modification time
+is bumped on every hit and the least recently used files are removed once
+the directory grows above its byte budget. The size of the directory is
+kept in `<directory>/.size`, updated by every fill, so it is only walked
+when an eviction is due. A fill holds an exclusive lock file, concurrent
+requests of the same object wait for it instead of downloading it again.
+Cached files are opened memory-mapped, readers get zero-copy views of the
+page cache instead of Python bytes.
+"""
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+import pyarrow as pa
+from django.conf import settings
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+SIZE_FILE = '.size'
+
+
+class ArtifactDiskCache:
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, content_hash):
+        return os.path.join(self.directory, content_hash[:2], content_hash)
+
+    def open(self, content_hash, size, chunks):
+        """
+        Memory-map the cached object `content_hash` of `size` bytes, filling
+        it from the iterable of byte `chunks` (called without arguments) on a
+        miss. Returns None for objects above the whole budget.
+        """
+        if size is not None and size > self.max_bytes:
+            return None
+        path = self.path(content_hash)
+        if not os.path.exists(path):
+            self._fill(path, content_hash, chunks)
+        try:
+            os.utime(path)
+            return pa.memory_map(path, 'r')
+        except FileNotFoundError:
+            # evicted by another process in between
+            self._fill(path, content_hash, chunks)
+            return pa.memory_map(path, 'r')
+
+    def _fill(self, path, content_hash, chunks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(path):
+                    return  # filled by the request holding the lock before
+                partial = f'{path}.{os.getpid()}.partial'
+                digest = hashlib.sha256()
+                size = 0
+                try:
+                    with open(partial, 'wb') as f:
+                        for chunk in chunks():
+                            digest.update(chunk)
+                            f.write(chunk)
+                            size += len(chunk)
+                    if digest.hexdigest() != content_hash:
+                        raise ValueError(f'Content of cached artifact {content_hash} does not match its hash')
+                    os.replace(partial, path)
+                finally:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        with self._size_file() as size_file:
+            total = _read_size(size_file)
+            if total is not None:
+                total += size
+                _write_size(size_file, total)
+        if total is None or total > self.max_bytes:
+            self.evict(keep=path)
+
+    @contextmanager
+    def _size_file(self):
+        """The size file, locked against the other processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.open(os.path.join(self.directory, SIZE_FILE), os.O_RDWR | os.O_CREAT), 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used files (with their lock files) until the
+        cache fits its budget, and store the size of what is left.
+        """
+        with self._size_file() as size_file:
+            files = []
+            locks = set()
+            total = 0
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if name.endswith('.lock'):
+                        locks.add(path)
+                    if name.endswith(('.lock', '.partial')) or name == SIZE_FILE:
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            evicted = []
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    # readers holding the file mapped keep reading the unlinked inode
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted.append(path)
+
+            for path in evicted:
+                _remove(f'{path}.lock')
+            # Locks without an object are of failed fills, or of fills still in
+            # progress, which hold their lock and keep it.
+            for lock in locks - {f'{path}.lock' for _, _, path in files}:
+                _remove_unheld_lock(lock)
+            _write_size(size_file, total)
+
+
+def artifact_disk_cache():
+    """Cache configured by ARTIFACT_CACHE_DIR and ARTIFACT_CACHE_BYTES, None when disabled."""
+    if not settings.ARTIFACT_CACHE_DIR or not settings.ARTIFACT_CACHE_BYTES:
+        return None
+    return ArtifactDiskCache(settings.ARTIFACT_CACHE_DIR, settings.ARTIFACT_CACHE_BYTES)
+
+
+def _read_size(f):
+    """Stored size of the cache, None when it is not known yet."""
+    f.seek(0)
+    content = f.read().strip()
+    return int(content) if content else None
+
+
+def _write_size(f, size):
+    f.seek(0)
+    f.truncate()
+    f.write(str(size))
+    f.flush()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_unheld_lock(path):
+    """Remove a lock file, unless a fill holds it."""
+    try:
+        with open(path) as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            os.remove(path)
+    except FileNotFoundError:
+        pass
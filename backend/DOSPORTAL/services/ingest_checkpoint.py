@@ -0,0 +1,164 @@
+"""
+Checkpoints of long running log ingestion.
+
+While a raw log is parsed, segments parsed so far are uploaded to storage
+every `interval` bytes of log, and the byte offset parsing can resume from
+is stored in `SpectralRecord.metadata['ingest_checkpoint']`. When a task
+is killed (timeout, worker recycle) and the record is queued again (see
+`DOSPORTAL.tasks.recover_stale_ingests`), the uploaded segments are
+downloaded again and parsing resumes from the checkpoint offset instead of
+byte zero.
+
+Logs parsed by a process pool are split into byte ranges of at most
+`interval` bytes (`byte_range_parts`), the segments of every range are
+uploaded as soon as the range is parsed and a retried task only parses the
+ranges missing in the checkpoint.
+"""
+import io
+import os
+import shutil
+
+import numpy as np
+from django.core.files import File as DjangoFile
+
+from .spectral_parser import PARSER_VERSION
+
+
+CHECKPOINT_KEY = 'ingest_checkpoint'
+
+
+def byte_range_parts(size, workers, interval):
+    """
+    Number of byte ranges a log of `size` bytes is parsed in by `workers`
+    processes, no range is longer than `interval` so parsed ranges are
+    checkpointed regularly.
+    """
+    if interval <= 0:
+        return workers
+    return max(workers, -(-size // interval))
+
+
+class IngestCheckpoint:
+
+    def __init__(self, record, storage, workdir, interval):
+        self.record = record
+        self.storage = storage
+        self.workdir = workdir
+        self.interval = interval
+        self.uploaded = []  # storage names of the uploaded segments, in log order
+        self.offset = 0
+        self.parts = None
+        self.ranges = {}  # index of a parsed byte range -> its uploaded segments and summary
+
+    def _matches(self, state):
+        raw_file = self.record.raw_file
+        return (
+            state.get('parser_version') == PARSER_VERSION
+            and state.get('raw_file_id') == str(raw_file.id)
+            and state.get('raw_size') == raw_file.size
+        )
+
+    def _save_state(self, summary):
+        self._store({
+            'offset': self.offset,
+            'segments': self.uploaded,
+            'summary': _without_segments(summary),
+        })
+
+    def _store(self, state):
+        state = {
+            'parser_version': PARSER_VERSION,
+            'raw_file_id': str(self.record.raw_file.id),
+            'raw_size': self.record.raw_file.size,
+            **state,
+        }
+        self.record.metadata = self.record.metadata or {}
+        self.record.metadata[CHECKPOINT_KEY] = state
+        self.record.save(update_fields=['metadata'])
+
+    def resume(self):
+        """
+        Download the segments of a matching checkpoint into the work
+        directory. Returns (summary, offset), or (None, 0) without one.
+        """
+        state = (self.record.metadata or {}).get(CHECKPOINT_KEY)
+        if not state or not self._matches(state) or 'offset' not in state:
+            return None, 0
+
+        segments = self._download(state['segments'], 'resumed')
+        self.uploaded = list(state['segments'])
+        self.offset = state['offset']
+        return {**state['summary'], 'segments': segments}, self.offset
+
+    def resume_ranges(self, parts):
+        """
+        Download the segments of the byte ranges parsed before by a task
+        splitting the log into the same number of `parts`. Returns a dict of
+        range index -> summary, empty without a matching checkpoint.
+        """
+        self.parts = parts
+        state = (self.record.metadata or {}).get(CHECKPOINT_KEY)
+        if not state or not self._matches(state) or state.get('parts') != parts:
+            return {}
+
+        summaries = {}
+        for index, parsed in state['ranges'].items():
+            segments = self._download(parsed['segments'], f"resumed_range_{int(index):04d}")
+            summaries[int(index)] = {**parsed['summary'], 'segments': segments}
+            self.uploaded.extend(parsed['segments'])
+        self.ranges = dict(state['ranges'])
+        return summaries
+
+    def _download(self, names, prefix):
+        segments = []
+        for name in names:
+            path = os.path.join(self.workdir, f"{prefix}_{len(segments):06d}.npz")
+            with self.storage.open(name, 'rb') as source, open(path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            segments.append(path)
+        return segments
+
+    def _upload(self, segment, name):
+        if isinstance(segment, str):
+            with open(segment, 'rb') as f:
+                return self.storage.save(name, DjangoFile(f))
+        buffer = io.BytesIO()
+        np.savez(buffer, **segment)
+        buffer.seek(0)
+        return self.storage.save(name, DjangoFile(buffer))
+
+    def __call__(self, summary, offset):
+        """`on_segment` callback of `spill_candy_segments`."""
+        if offset - self.offset < self.interval:
+            return
+
+        for segment in summary['segments'][len(self.uploaded):]:
+            name = f"checkpoints/{self.record.id}/segment_{len(self.uploaded):06d}.npz"
+            self.uploaded.append(self._upload(segment, name))
+
+        self.offset = offset
+        self._save_state(summary)
+        print(f"Checkpoint of SpectralRecord {self.record.id} at byte {offset}")
+
+    def range_parsed(self, index, summary):
+        """`on_range` callback of `spill_candy_segments_parallel`."""
+        names = [
+            self._upload(segment, f"checkpoints/{self.record.id}/range_{index:04d}_segment_{number:06d}.npz")
+            for number, segment in enumerate(summary['segments'])
+        ]
+        self.uploaded.extend(names)
+        self.ranges[str(index)] = {'segments': names, 'summary': _without_segments(summary)}
+        self._store({'parts': self.parts, 'ranges': self.ranges})
+        print(f"Checkpoint of SpectralRecord {self.record.id} with {len(self.ranges)}/{self.parts} byte ranges")
+
+    def clear(self):
+        """Delete the uploaded segments and the checkpoint state."""
+        for name in self.uploaded:
+            self.storage.delete(name)
+        self.uploaded = []
+        if (self.record.metadata or {}).pop(CHECKPOINT_KEY, None) is not None:
+            self.record.save(update_fields=['metadata'])
+
+
+def _without_segments(summary):
+    return {key: value for key, value in summary.items() if key != 'segments'}
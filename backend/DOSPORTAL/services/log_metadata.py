@@ -0,0 +1,98 @@
+"""
+Fast metadata of a detector log from its first and last few KB.
+
+The `$DOS` header and the first spectral sentence are at the start of the
+log, the last spectral sentence at its end, so detector identification,
+time range and exposure count are known without reading the log in between.
+Uploads are read locally before they reach storage, stored logs with ranged
+reads (`open_ranged`) of the two ends only.
+"""
+from .spectral_parser import CANDY_SENTENCE, HEADER_SENTENCE, HIST_SENTENCE, TIME_COLUMN, parse_header
+
+
+EDGE_BYTES = 16 * 1024  # bytes read from each end of the log
+METADATA_KEY = 'log'  # key of the extracted metadata in File.metadata
+
+
+def _spectral_lines(lines):
+    candy = [line for line in lines if line.startswith(CANDY_SENTENCE)]
+    return candy or [line for line in lines if line.startswith(HIST_SENTENCE)]
+
+
+def _sequence_and_time(line):
+    """Exposure number (column 1) and time (ms) of a spectral sentence, None where not numeric."""
+    fields = line.split(b",")
+    values = []
+    for column in (1, TIME_COLUMN):
+        try:
+            values.append(float(fields[column]))
+        except (IndexError, ValueError):
+            values.append(None)
+    return values
+
+
+def parse_log_edges(head, tail, size):
+    """
+    Metadata from the first bytes (`head`) and the last bytes (`tail`) of a
+    log of `size` bytes. Fields which cannot be found are None.
+    """
+    head_lines = [line.rstrip(b"\r") for line in head.split(b"\n")]
+    if len(head) < size:
+        head_lines = head_lines[:-1]  # cut by the end of the read
+    tail_lines = [line.rstrip(b"\r") for line in tail.split(b"\n")]
+    if len(tail) < size:
+        tail_lines = tail_lines[1:]  # cut by the start of the read
+
+    header = next((parse_header(line) for line in head_lines if line.startswith(HEADER_SENTENCE)), {})
+    first_lines, last_lines = _spectral_lines(head_lines), _spectral_lines(tail_lines)
+    first_sequence, first_time = _sequence_and_time(first_lines[0]) if first_lines else (None, None)
+    last_sequence, last_time = _sequence_and_time(last_lines[-1]) if last_lines else (None, None)
+
+    exposures = None
+    if first_sequence is not None and last_sequence is not None and last_sequence >= first_sequence:
+        exposures = int(last_sequence - first_sequence) + 1
+    elif first_lines:
+        # no exposure counter, estimate from the mean line length at the start
+        line_bytes = sum(len(line) + 1 for line in first_lines) / len(first_lines)
+        exposures = int(size / line_bytes)
+
+    duration = None
+    if first_time is not None and last_time is not None:
+        duration = last_time - first_time
+
+    return {
+        'detector_type': header.get('detector_type'),
+        'detector_sn': header.get('detector_sn'),
+        'firmware_build': header.get('firmware_build'),
+        'firmware_commit': header.get('firmware_commit'),
+        'channels': int(header['channels']) if header.get('channels', '').isdigit() else None,
+        'time_first_ms': first_time,
+        'time_last_ms': last_time,
+        'duration_ms': duration,
+        'exposures_estimate': exposures,
+    }
+
+
+def read_log_metadata(f, size, edge_bytes=EDGE_BYTES):
+    """Metadata of a log from a seekable binary file, the file position is restored."""
+    position = f.tell()
+    try:
+        f.seek(0)
+        head = f.read(min(edge_bytes, size))
+        if size <= edge_bytes:
+            tail = head
+        else:
+            f.seek(size - edge_bytes)
+            tail = f.read(edge_bytes)
+    finally:
+        f.seek(position)
+    return parse_log_edges(head, tail, size)
+
+
+def read_stored_log_metadata(field_file, edge_bytes=EDGE_BYTES):
+    """Metadata of a stored log, S3 storages only fetch both ends of the object."""
+    storage = field_file.storage
+    size = field_file.size
+    opener = storage.open_ranged if hasattr(storage, 'open_ranged') else (lambda name: storage.open(name, 'rb'))
+    with opener(field_file.name) as f:
+        return read_log_metadata(f, size, edge_bytes)
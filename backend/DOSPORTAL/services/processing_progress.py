@@ -0,0 +1,191 @@
+"""
+Processing progress of spectral records, published to Redis.
+
+Ingestion tasks publish their stage and percentage under a short-lived key
+and notify a pub/sub channel on every change, so status requests (and
+long-polls waiting for a change) never touch the database. Redis problems
+are logged and otherwise ignored, progress reporting must never fail a task.
+"""
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from ..models.spectrals import SpectralRecord
+
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TTL = 24 * 3600  # seconds a progress entry is kept after its last update
+HEARTBEAT_INTERVAL = 30  # seconds between heartbeats of a running task
+KEY_PREFIX = 'dosportal:spectral_progress'
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        # fail fast, an unreachable Redis must not stall tasks or requests
+        _client = redis.Redis(socket_connect_timeout=2, **settings.Q_CLUSTER['redis'])
+    return _client
+
+
+def _key(record_id):
+    return f'{KEY_PREFIX}:{record_id}'
+
+
+def publish_progress(record_id, status, stage=None, percent=None):
+    """Store the current progress of a record and notify waiting readers."""
+    progress = {
+        'processing_status': status,
+        'stage': stage,
+        'percent': percent,
+        'updated': time.time(),
+    }
+    payload = json.dumps(progress)
+    try:
+        client = get_redis()
+        client.set(_key(record_id), payload, ex=PROGRESS_TTL)
+        client.publish(_key(record_id), payload)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to publish progress of SpectralRecord {record_id}: {str(e)}")
+    return progress
+
+
+def read_progress(record_id):
+    """Last published progress of a record, None when unknown."""
+    try:
+        payload = get_redis().get(_key(record_id))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to read progress of SpectralRecord {record_id}: {str(e)}")
+        return None
+    return json.loads(payload) if payload else None
+
+
+def wait_for_progress(record_id, since, timeout):
+    """
+    Block until progress newer than `since` (an `updated` timestamp) is
+    published or `timeout` seconds pass. Returns the latest progress.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(_key(record_id))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to wait for progress of SpectralRecord {record_id}: {str(e)}")
+        return read_progress(record_id)
+
+    try:
+        # read after subscribing, an update in between is not lost
+        progress = read_progress(record_id)
+        while progress is None or progress['updated'] <= since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            message = pubsub.get_message(timeout=remaining)
+            if message is not None:
+                progress = json.loads(message['data'])
+        return progress
+    except redis.RedisError as e:
+        logger.warning(f"Failed to wait for progress of SpectralRecord {record_id}: {str(e)}")
+        return read_progress(record_id)
+    finally:
+        pubsub.close()
+
+
+class ProgressReporter:
+    """
+    Publishes ingestion progress of a record. Every stage covers a fixed
+    span of the percentage, updates are throttled to whole percent steps.
+    `heartbeat` (a callable) is called on updates at most every
+    HEARTBEAT_INTERVAL seconds, also when the percentage does not change.
+    """
+
+    STAGES = {
+        'parse': (0, 70),
+        'encode': (70, 95),
+        'transform': (95, 100),
+    }
+
+    def __init__(self, record_id, heartbeat=None):
+        self.record_id = record_id
+        self.heartbeat = heartbeat
+        self._last = None
+        self._last_beat = None
+
+    def update(self, stage, fraction=0.0):
+        if self.heartbeat is not None:
+            now = time.monotonic()
+            if self._last_beat is None or now - self._last_beat >= HEARTBEAT_INTERVAL:
+                self._last_beat = now
+                self.heartbeat()
+        start, end = self.STAGES[stage]
+        percent = int(start + (end - start) * min(max(fraction, 0.0), 1.0))
+        if (stage, percent) == self._last:
+            return
+        self._last = (stage, percent)
+        publish_progress(self.record_id, SpectralRecord.PROCESSING_IN_PROGRESS, stage, percent)
+
+    def iter_bytes(self, chunks, stage, total, start=0):
+        """Yield from `chunks` (bytes), reporting the share of `total` bytes read."""
+        position = start
+        for chunk in chunks:
+            position += len(chunk)
+            self.update(stage, position / total if total else 1.0)
+            yield chunk
+
+    def rows_consumer(self, stage, total):
+        """Consumer of `write_spectral_parquet` reporting the share of `total` rows written."""
+        return _RowsProgress(self, stage, total)
+
+    def ranges_callback(self, stage, ranges, done=(), on_range=None):
+        """
+        `on_range(index, summary)` callback of a parse of (start, end) byte
+        `ranges` (see `spill_candy_segments_parallel`), reporting the share
+        of bytes in ranges parsed so far, `done` included, then calling
+        `on_range`.
+        """
+        return _RangesProgress(self, stage, ranges, done, on_range)
+
+    def finish(self, status):
+        publish_progress(
+            self.record_id, status, None, 100 if status == SpectralRecord.PROCESSING_COMPLETED else None
+        )
+
+
+class _RowsProgress:
+
+    def __init__(self, reporter, stage, total):
+        self.reporter = reporter
+        self.stage = stage
+        self.total = total
+        self.rows = 0
+
+    def add(self, time_ms, particle_count, channels):
+        self.rows += len(time_ms)
+        self.reporter.update(self.stage, self.rows / self.total if self.total else 1.0)
+
+
+class _RangesProgress:
+
+    def __init__(self, reporter, stage, ranges, done, on_range):
+        self.reporter = reporter
+        self.stage = stage
+        self.ranges = ranges
+        self.on_range = on_range
+        self.total = sum(end - start for start, end in ranges)
+        self.parsed = sum(end - start for index, (start, end) in enumerate(ranges) if index in done)
+        self._report()
+
+    def _report(self):
+        self.reporter.update(self.stage, self.parsed / self.total if self.total else 1.0)
+
+    def __call__(self, index, summary):
+        start, end = self.ranges[index]
+        self.parsed += end - start
+        self._report()
+        if self.on_range is not None:
+            self.on_range(index, summary)
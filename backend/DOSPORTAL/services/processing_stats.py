@@ -0,0 +1,61 @@
+"""
+Per-stage timing of background processing tasks.
+
+Stages may be nested, the time of a nested stage is not counted in its
+parent, so the stage timings add up to the measured wall time. Time spent
+pulling items from a wrapped iterator (e.g. chunks streamed from S3) is
+counted in its own stage.
+"""
+import time
+from contextlib import contextmanager
+
+
+class ProcessingStats:
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self._stack = []
+        self._started = time.perf_counter()
+
+    def _add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)  # time of nested stages
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            self._add(name, elapsed - nested)
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def timed_iter(self, iterable, name, count=None):
+        """
+        Yield from `iterable`, timing every `next()` as stage `name`.
+        With `count`, the total `len()` of the items is added to that counter.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if count:
+                self.count(count, len(item))
+            yield item
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def as_dict(self):
+        return {
+            'stages_s': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'total_s': round(time.perf_counter() - self._started, 4),
+            **self.counts,
+        }
@@ -0,0 +1,84 @@
+"""
+Shared cache of derived spectral responses, kept in Redis.
+
+Evolution and spectrum responses only depend on the record's artifacts, its
+calibration and the query parameters, so every web process (and host) can
+serve a response rendered once by any of them. Keys contain the ids of the
+record's artifact files and the id and coefficients of its calibration, so
+a reprocessed record or a changed calibration never hits a stale entry.
+Keys of a record are also listed in a per-record set and dropped explicitly
+(`invalidate_record`) when its artifacts or calibration change, instead of
+waiting for their TTL.
+Redis problems are logged and the response is computed as without the cache.
+"""
+import hashlib
+import json
+import logging
+
+import redis
+from django.conf import settings
+
+from .processing_progress import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'dosportal:result'
+INDEX_PREFIX = 'dosportal:result_keys'
+
+
+def _index_key(record_id):
+    return f'{INDEX_PREFIX}:{record_id}'
+
+
+def result_key(view, record_id, artifact_ids, calib, params):
+    """
+    Key of a derived response of `view` for a record with artifact files
+    `artifact_ids` and DetectorCalib `calib` (or None), for query `params`.
+    """
+    state = json.dumps([
+        sorted(str(artifact_id) for artifact_id in artifact_ids),
+        [str(calib.id), calib.coef0, calib.coef1, calib.coef2] if calib is not None else None,
+        sorted((str(name), str(value)) for name, value in params),
+    ])
+    digest = hashlib.sha1(state.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{record_id}:{view}:{digest}'
+
+
+def get_result(key):
+    """Cached rendered response, None on a miss."""
+    try:
+        return get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to read cached result {key}: {str(e)}")
+        return None
+
+
+def store_result(record_id, key, content):
+    """Cache a rendered response of a record, responses above RESULT_CACHE_MAX_BYTES are not kept."""
+    if len(content) > settings.RESULT_CACHE_MAX_BYTES:
+        return
+    ttl = settings.RESULT_CACHE_TTL
+    try:
+        pipeline = get_redis().pipeline()
+        pipeline.set(key, content, ex=ttl)
+        pipeline.sadd(_index_key(record_id), key)
+        pipeline.expire(_index_key(record_id), ttl)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Failed to cache result {key}: {str(e)}")
+
+
+def invalidate_record(record_id):
+    """Drop every cached response of a record."""
+    invalidate_records([record_id])
+
+
+def invalidate_records(record_ids):
+    try:
+        client = get_redis()
+        for record_id in record_ids:
+            keys = client.smembers(_index_key(record_id))
+            client.delete(_index_key(record_id), *keys)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to invalidate cached results: {str(e)}")
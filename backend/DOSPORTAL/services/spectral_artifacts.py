@@ -0,0 +1,339 @@
+"""
+Writers and readers for spectral record artifacts (Parquet).
+
+Schema versions:
+    1 - "wide" layout, one `channel_N` column per spectrum channel
+        (read-only, written by older DOSPORTAL versions)
+    2 - "matrix" layout, `time_ms`, `particle_count` and a single
+        fixed-size list column `spectrum` holding all channels of an
+        exposure in a compact unsigned integer type
+    3 - matrix layout with `total_count`, the sum of all channels of an
+        exposure, so readers of totals never decode the spectrum column
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .spectral_parser import FIRST_CHANNEL, compact_channel_dtype, load_segment
+
+
+SCHEMA_WIDE = 1
+SCHEMA_MATRIX = 2
+SCHEMA_MATRIX_TOTALS = 3
+SCHEMA_VERSION = SCHEMA_MATRIX_TOTALS  # version written by the ingestion
+
+ROW_GROUP_ROWS = 1024  # exposures per Parquet row group
+
+SPECTRUM_COLUMN = 'spectrum'
+TOTAL_COLUMN = 'total_count'
+CHANNEL_PREFIX = 'channel_'
+
+# arrays `read_spectral_parquet` can be restricted to
+ARRAY_COLUMNS = ('time_ms', 'particle_count', 'total_count', 'channels')
+
+
+@dataclass
+class SpectralArrays:
+    """Decoded content of a spectral artifact, arrays which were not read are None."""
+    time_ms: np.ndarray          # (n_exposures,) float64
+    particle_count: np.ndarray   # (n_exposures,) int64
+    channels: np.ndarray         # (n_exposures, n_channels) unsigned integers
+    first_channel: int           # log column number of channels[:, 0]
+    total_count: np.ndarray = None  # (n_exposures,) int64, sum of all channels
+
+    @property
+    def channel_numbers(self):
+        return np.arange(self.first_channel, self.first_channel + self.channels.shape[1])
+
+    @property
+    def nbytes(self):
+        arrays = (self.time_ms, self.particle_count, self.channels, self.total_count)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def window(self, time_from=None, time_to=None):
+        """Exposures within [time_from, time_to] (ms), like a windowed `read_spectral_parquet`."""
+        if time_from is None and time_to is None:
+            return self
+        mask = np.ones(len(self.time_ms), dtype=bool)
+        if time_from is not None:
+            mask &= self.time_ms >= time_from
+        if time_to is not None:
+            mask &= self.time_ms <= time_to
+
+        def take(array):
+            return None if array is None else array[mask]
+
+        return SpectralArrays(
+            self.time_ms[mask], take(self.particle_count), take(self.channels), self.first_channel, take(self.total_count)
+        )
+
+    def select_channels(self, channel_range=None):
+        """Channels within `channel_range` (first, last log channel numbers, inclusive)."""
+        if channel_range is None or self.channels is None:
+            return self
+        start, stop = _channel_slice(self.first_channel, self.channels.shape[1], channel_range)
+        return SpectralArrays(
+            self.time_ms, self.particle_count, self.channels[:, start:stop], self.first_channel + start, self.total_count
+        )
+
+
+def _channel_slice(first_channel, n_channels, channel_range):
+    first, last = channel_range  # may be unbounded (+-inf)
+    start = int(min(max(np.ceil(first) - first_channel, 0), n_channels))
+    stop = int(min(max(np.floor(last) - first_channel + 1, start), n_channels))
+    return start, stop
+
+
+def matrix_schema(n_channels, channel_dtype):
+    return pa.schema(
+        [
+            ('time_ms', pa.float64()),
+            ('particle_count', pa.int64()),
+            (TOTAL_COLUMN, pa.int64()),
+            (SPECTRUM_COLUMN, pa.list_(pa.from_numpy_dtype(channel_dtype), n_channels)),
+        ],
+        metadata={
+            'dosportal.schema_version': str(SCHEMA_VERSION),
+            'dosportal.first_channel': str(FIRST_CHANNEL),
+        },
+    )
+
+
+def _stack_segments(summary, channels_path, channel_dtype, memory_budget=None):
+    """
+    Concatenate parsed segments. Channels go to a memory-mapped `.npy` file
+    at `channels_path` unless they fit into `memory_budget` bytes, only the
+    per-exposure columns are always kept in memory.
+    """
+    n_rows, n_channels = summary['rows'], summary['channels']
+    time_ms = np.empty(n_rows, dtype=np.float64)
+    particle_count = np.empty(n_rows, dtype=np.int64)
+    if memory_budget and n_rows * n_channels * np.dtype(channel_dtype).itemsize <= memory_budget:
+        channels = np.empty((n_rows, n_channels), dtype=channel_dtype)
+    else:
+        channels = np.lib.format.open_memmap(channels_path, mode='w+', dtype=channel_dtype, shape=(n_rows, n_channels))
+
+    offset = 0
+    for segment in summary['segments']:
+        segment = load_segment(segment)
+        segment_time = segment['time_ms']
+        rows = slice(offset, offset + len(segment_time))
+        time_ms[rows] = segment_time
+        particle_count[rows] = segment['particle_count']
+        segment_channels = segment['channels']
+        channels[rows, :segment_channels.shape[1]] = segment_channels
+        channels[rows, segment_channels.shape[1]:] = 0
+        offset += len(segment_time)
+
+    return time_ms, particle_count, channels
+
+
+def write_spectral_parquet(summary, path, row_group_rows=None, consumers=(), memory_budget=None, channels_path=None):
+    """
+    Write parsed `$CANDY` segments into a matrix-layout Parquet file.
+
+    `path` is a local path or a writable binary stream (e.g. a multipart
+    upload from `MinIOMediaStorage.open_multipart`), row groups are written
+    to it as soon as they are encoded.
+
+    Rows are sorted by time and written in row groups of at most
+    `row_group_rows` exposures with min/max statistics on `time_ms`, so
+    readers can skip row groups outside a requested time window. Channel
+    data is staged in a memory-mapped file at `channels_path` (by default
+    next to `path`) unless it fits into `memory_budget` bytes, only the
+    time and particle count columns are always held in memory. Segments
+    narrower than the widest one are padded with zero channels and time is
+    normalized to start from 0. Channels share one compact unsigned dtype.
+
+    Every object in `consumers` gets `add(time_ms, particle_count, channels)`
+    called with each row group as it is written, so derived artifacts can be
+    built in the same pass.
+    """
+    row_group_rows = row_group_rows or ROW_GROUP_ROWS
+    n_channels = summary['channels']
+    channel_dtype = compact_channel_dtype(summary['max_count'])
+    schema = matrix_schema(n_channels, channel_dtype)
+
+    channels_path = channels_path or f"{path}.channels.npy"
+    time_ms, particle_count, channels = _stack_segments(summary, channels_path, channel_dtype, memory_budget=memory_budget)
+    time_ms -= summary['time_min']
+
+    # logs are normally in time order already, then no reordering is needed
+    if np.all(time_ms[1:] >= time_ms[:-1]):
+        order = None
+    else:
+        order = np.argsort(time_ms, kind='stable')
+
+    try:
+        with pq.ParquetWriter(
+            path,
+            schema,
+            write_statistics=['time_ms', 'particle_count'],
+            sorting_columns=[pq.SortingColumn(0)],
+        ) as writer:
+            for start in range(0, len(time_ms), row_group_rows):
+                rows = slice(start, start + row_group_rows)
+                if order is not None:
+                    rows = order[rows]
+                group_time, group_particles, group_channels = time_ms[rows], particle_count[rows], channels[rows]
+                spectrum = pa.FixedSizeListArray.from_arrays(pa.array(group_channels.ravel()), n_channels)
+                group_totals = group_channels.sum(axis=1, dtype=np.int64)
+                writer.write_table(pa.table(
+                    [pa.array(group_time), pa.array(group_particles), pa.array(group_totals), spectrum],
+                    schema=schema,
+                ))
+                for consumer in consumers:
+                    consumer.add(group_time, group_particles, group_channels)
+    finally:
+        del channels
+        if os.path.exists(channels_path):
+            os.remove(channels_path)
+
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'first_channel': FIRST_CHANNEL,
+        'channels_count': n_channels,
+        'channel_dtype': np.dtype(channel_dtype).name,
+        'row_group_rows': row_group_rows,
+    }
+
+
+def select_row_groups(parquet_file, time_from=None, time_to=None):
+    """
+    Indices of row groups which may contain exposures within
+    [time_from, time_to], judged from the `time_ms` column statistics.
+    Row groups without statistics are always selected.
+    """
+    metadata = parquet_file.metadata
+    time_index = parquet_file.schema_arrow.get_field_index('time_ms')
+    selected = []
+    for i in range(metadata.num_row_groups):
+        statistics = metadata.row_group(i).column(time_index).statistics
+        if statistics is not None and statistics.has_min_max:
+            if time_from is not None and statistics.max < time_from:
+                continue
+            if time_to is not None and statistics.min > time_to:
+                continue
+        selected.append(i)
+    return selected
+
+
+def open_artifact(field_file):
+    """
+    Open a stored artifact for reading. S3 storages serve it memory-mapped
+    from the node-local disk cache, or give a ranged reader so that only the
+    Parquet footer and the selected row groups are fetched.
+    """
+    storage = field_file.storage
+    if hasattr(storage, 'open_cached'):
+        instance = field_file.instance
+        return storage.open_cached(field_file.name, getattr(instance, 'content_hash', None), getattr(instance, 'size', None))
+    if hasattr(storage, 'open_ranged'):
+        return storage.open_ranged(field_file.name)
+    return storage.open(field_file.name, 'rb')
+
+
+def _fixed_size_list_to_matrix(column):
+    array = column.combine_chunks()
+    width = array.type.list_size
+    values = array.flatten().to_numpy(zero_copy_only=False)
+    return values.reshape(-1, width)
+
+
+def _wide_channel_columns(names):
+    columns = [name for name in names if name.startswith(CHANNEL_PREFIX)]
+    return sorted(columns, key=lambda name: int(name[len(CHANNEL_PREFIX):]))
+
+
+def read_spectral_parquet(source, time_from=None, time_to=None, columns=None, channel_range=None):
+    """
+    Read a spectral artifact of any schema version into SpectralArrays.
+
+    `source` is a path or a binary file-like object. With `time_from` /
+    `time_to` (ms, relative to record start) only row groups overlapping the
+    window are read and exposures outside of it are dropped.
+
+    `columns` restricts the decoded arrays to a subset of ARRAY_COLUMNS (the
+    others are None), only their Parquet columns are read. `channel_range`
+    (first, last log channel numbers, inclusive) restricts `channels`: wide
+    artifacts read only those channel columns, matrix artifacts hold all
+    channels of an exposure in one list column which is sliced once decoded.
+    Artifacts older than schema 3 sum `total_count` from the channels.
+    """
+    columns = set(ARRAY_COLUMNS if columns is None else columns)
+    unknown = columns - set(ARRAY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown spectral columns: {', '.join(sorted(unknown))}")
+
+    parquet_file = pq.ParquetFile(source)
+    names = parquet_file.schema_arrow.names
+    has_totals = TOTAL_COLUMN in names
+    totals_from_channels = 'total_count' in columns and not has_totals
+    decode_channels = 'channels' in columns or totals_from_channels
+
+    read = ['time_ms']
+    if 'particle_count' in columns and 'particle_count' in names:
+        read.append('particle_count')
+    if 'total_count' in columns and has_totals:
+        read.append(TOTAL_COLUMN)
+    wide_columns = []
+    if decode_channels:
+        if SPECTRUM_COLUMN in names:
+            read.append(SPECTRUM_COLUMN)
+        else:
+            # schema 1: one column per channel, only the requested ones are read
+            wide_columns = _wide_channel_columns(names)
+            if channel_range is not None and not totals_from_channels:
+                wide_columns = _channels_in_range(wide_columns, channel_range)
+            read.extend(wide_columns)
+
+    if time_from is None and time_to is None:
+        table = parquet_file.read(columns=read)
+    else:
+        table = parquet_file.read_row_groups(select_row_groups(parquet_file, time_from, time_to), columns=read)
+        mask = pc.is_valid(table.column('time_ms'))
+        if time_from is not None:
+            mask = pc.and_(mask, pc.greater_equal(table.column('time_ms'), time_from))
+        if time_to is not None:
+            mask = pc.and_(mask, pc.less_equal(table.column('time_ms'), time_to))
+        table = table.filter(mask)
+
+    time_ms = pc.fill_null(table.column('time_ms'), 0).to_numpy().astype(np.float64)
+    particle_count = None
+    if 'particle_count' in columns:
+        if 'particle_count' in table.column_names:
+            particle_count = pc.fill_null(table.column('particle_count'), 0).to_numpy().astype(np.int64)
+        else:
+            particle_count = np.zeros(len(time_ms), dtype=np.int64)
+
+    channels = None
+    first_channel = FIRST_CHANNEL
+    if SPECTRUM_COLUMN in table.column_names:
+        metadata = parquet_file.schema_arrow.metadata or {}
+        first_channel = int(metadata.get(b'dosportal.first_channel', FIRST_CHANNEL))
+        channels = _fixed_size_list_to_matrix(table.column(SPECTRUM_COLUMN))
+    elif decode_channels:
+        channels = np.zeros((len(time_ms), len(wide_columns)), dtype=np.int64)
+        for i, name in enumerate(wide_columns):
+            channels[:, i] = pc.fill_null(table.column(name), 0).to_numpy()
+        all_columns = _wide_channel_columns(names)
+        first_channel = int((wide_columns or all_columns)[0][len(CHANNEL_PREFIX):]) if all_columns else FIRST_CHANNEL
+
+    total_count = None
+    if 'total_count' in columns:
+        if totals_from_channels:
+            total_count = channels.sum(axis=1, dtype=np.int64)
+        else:
+            total_count = pc.fill_null(table.column(TOTAL_COLUMN), 0).to_numpy().astype(np.int64)
+
+    arrays = SpectralArrays(time_ms, particle_count, channels if 'channels' in columns else None, first_channel, total_count)
+    return arrays.select_channels(channel_range)
+
+
+def _channels_in_range(wide_columns, channel_range):
+    first, last = channel_range
+    return [name for name in wide_columns if first <= int(name[len(CHANNEL_PREFIX):]) <= last]
@@ -0,0 +1,207 @@
+"""
+Multi-resolution evolution pyramid of a spectral record.
+
+Total counts per exposure are aggregated into fixed time buckets at several
+resolutions (level 0 keeps every exposure). Each bucket stores the number
+of exposures and the min / max / mean of their total counts, so charts of
+long records can be drawn from a few thousand pre-computed points. Series
+still longer than the point budget of a chart (raw exposures, channel
+windows) are downsampled keeping their shape (`downsample_indices`).
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .spectral_artifacts import ROW_GROUP_ROWS
+
+
+RAW_RESOLUTION = 0.0
+DEFAULT_LEVELS_MS = [RAW_RESOLUTION, 10_000.0, 60_000.0, 600_000.0]
+
+DOWNSAMPLE_LTTB = 'lttb'
+DOWNSAMPLE_MINMAX = 'minmax'
+DOWNSAMPLE_METHODS = (DOWNSAMPLE_LTTB, DOWNSAMPLE_MINMAX)
+
+PYRAMID_SCHEMA = pa.schema([
+    ('resolution_ms', pa.float64()),
+    ('time_ms', pa.float64()),
+    ('exposures', pa.int64()),
+    ('min', pa.float64()),
+    ('max', pa.float64()),
+    ('mean', pa.float64()),
+])
+
+
+def aggregate_level(time_ms, totals, resolution_ms):
+    """
+    Aggregate time-sorted exposure totals into buckets of `resolution_ms`.
+    Returns a dict of column arrays, bucket time is the bucket start.
+    """
+    if resolution_ms == RAW_RESOLUTION or not len(time_ms):
+        return {
+            'time_ms': time_ms,
+            'exposures': np.ones(len(time_ms), dtype=np.int64),
+            'min': totals,
+            'max': totals,
+            'mean': totals,
+        }
+
+    buckets = np.floor(time_ms / resolution_ms)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    exposures = np.diff(np.r_[starts, len(time_ms)])
+    return {
+        'time_ms': buckets[starts] * resolution_ms,
+        'exposures': exposures,
+        'min': np.minimum.reduceat(totals, starts),
+        'max': np.maximum.reduceat(totals, starts),
+        'mean': np.add.reduceat(totals, starts) / exposures,
+    }
+
+
+class EvolutionPyramidBuilder:
+    """
+    Collects exposure totals while the spectral artifact is written (see
+    `write_spectral_parquet(consumers=...)`) and writes the pyramid artifact.
+    Only two floats per exposure are kept in memory.
+    """
+
+    def __init__(self, levels_ms=None):
+        self.levels_ms = sorted(levels_ms or DEFAULT_LEVELS_MS)
+        self._time = []
+        self._totals = []
+
+    def add(self, time_ms, particle_count, channels):
+        self._time.append(np.asarray(time_ms, dtype=np.float64))
+        self._totals.append(channels.sum(axis=1, dtype=np.int64).astype(np.float64))
+
+    def write(self, path):
+        """Write all levels into `path`, one or more row groups per level.
+        Returns metadata describing the levels."""
+        time_ms = np.concatenate(self._time) if self._time else np.zeros(0)
+        totals = np.concatenate(self._totals) if self._totals else np.zeros(0)
+
+        levels = []
+        with pq.ParquetWriter(path, PYRAMID_SCHEMA, write_statistics=['resolution_ms', 'time_ms']) as writer:
+            for resolution_ms in self.levels_ms:
+                level = aggregate_level(time_ms, totals, resolution_ms)
+                n_points = len(level['time_ms'])
+                writer.write_table(
+                    pa.table({'resolution_ms': np.full(n_points, resolution_ms), **level}, schema=PYRAMID_SCHEMA),
+                    row_group_size=ROW_GROUP_ROWS,
+                )
+                levels.append({'resolution_ms': resolution_ms, 'points': n_points})
+
+        return {
+            'levels': levels,
+            'time_range_ms': [float(time_ms.min()), float(time_ms.max())] if len(time_ms) else [0.0, 0.0],
+            'exposure_ms': exposure_time(time_ms),
+        }
+
+
+def exposure_time(time_ms):
+    """Median time between consecutive exposures (ms), None for fewer than two."""
+    if len(time_ms) < 2:
+        return None
+    return float(np.median(np.diff(np.sort(time_ms))))
+
+
+def choose_level(levels, time_range_ms, max_points, time_from=None, time_to=None):
+    """
+    Pick the finest level whose expected number of points inside the window
+    fits into `max_points`. Falls back to the coarsest level.
+    """
+    record_start, record_end = time_range_ms
+    record_span = max(record_end - record_start, 1.0)
+    window_start = record_start if time_from is None else max(time_from, record_start)
+    window_end = record_end if time_to is None else min(time_to, record_end)
+    fraction = min(max(window_end - window_start, 0.0) / record_span, 1.0)
+
+    ordered = sorted(levels, key=lambda level: level['resolution_ms'])
+    for level in ordered:
+        if level['points'] * fraction <= max_points:
+            return level['resolution_ms']
+    return ordered[-1]['resolution_ms']
+
+
+def read_evolution_level(source, resolution_ms, time_from=None, time_to=None):
+    """
+    Read one pyramid level, restricted to buckets overlapping the window.
+    Only row groups of that level (and window) are read thanks to the
+    column statistics.
+    """
+    filters = [('resolution_ms', '=', resolution_ms)]
+    if time_from is not None:
+        # a bucket starting before time_from may still overlap the window
+        filters.append(('time_ms', '>=', time_from - resolution_ms))
+    if time_to is not None:
+        filters.append(('time_ms', '<=', time_to))
+
+    table = pq.read_table(source, filters=filters)
+    return {name: table.column(name).to_numpy() for name in ('time_ms', 'exposures', 'min', 'max', 'mean')}
+
+
+def lttb_indices(time_ms, values, max_points):
+    """
+    Indices of at most `max_points` points picked by Largest-Triangle-Three-
+    Buckets. First and last points are kept, every bucket in between keeps
+    the point spanning the largest triangle with the point kept in the
+    previous bucket and the mean of the next one, so peaks stay visible.
+    The loop runs once per output point, buckets are scanned vectorized.
+    """
+    n = len(time_ms)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1], dtype=np.int64)[:max_points]
+
+    time_ms = np.asarray(time_ms, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    # buckets of the inner points 1..n-2, each holding at least one point
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_time = np.add.reduceat(time_ms[:n - 1], edges[:-1]) / counts
+    mean_value = np.add.reduceat(values[:n - 1], edges[:-1]) / counts
+    next_time = np.r_[mean_time[1:], time_ms[-1]]
+    next_value = np.r_[mean_value[1:], values[-1]]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        previous = selected[bucket]
+        area = np.abs(
+            (time_ms[previous] - next_time[bucket]) * (values[start:stop] - values[previous])
+            - (time_ms[previous] - time_ms[start:stop]) * (next_value[bucket] - values[previous])
+        )
+        selected[bucket + 1] = start + int(np.argmax(area))
+    return selected
+
+
+def minmax_indices(low, high, max_points):
+    """
+    Indices of the minimum of `low` and the maximum of `high` in each of
+    `max_points // 2` equal-count buckets, in order (at most `max_points`).
+    Every extreme of the series is kept, the choice of bounds for a chart.
+    """
+    n = len(low)
+    if n <= max_points:
+        return np.arange(n)
+
+    size = -(-n // max(max_points // 2, 1))
+    buckets = -(-n // size)
+    padding = buckets * size - n
+    low = np.r_[np.asarray(low, dtype=np.float64), np.full(padding, np.inf)].reshape(buckets, size)
+    high = np.r_[np.asarray(high, dtype=np.float64), np.full(padding, -np.inf)].reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    return np.unique(np.r_[offsets + np.argmin(low, axis=1), offsets + np.argmax(high, axis=1)])
+
+
+def downsample_indices(time_ms, values, max_points, method=DOWNSAMPLE_LTTB, low=None, high=None):
+    """
+    Indices of at most `max_points` points of a time series keeping its
+    shape. `low` / `high` are the per-point bounds used by min/max
+    downsampling (default `values`).
+    """
+    if method == DOWNSAMPLE_MINMAX:
+        return minmax_indices(values if low is None else low, values if high is None else high, max_points)
+    return lttb_indices(time_ms, values, max_points)
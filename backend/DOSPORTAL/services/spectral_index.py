@@ -0,0 +1,220 @@
+"""
+Cumulative (prefix-sum) spectrum index of a spectral record.
+
+Exposures are split into blocks of `checkpoint_rows`. The index file holds
+three `.npy` arrays written back to back, followed by the blocks:
+
+    time_ms        (n_exposures,) float64, sorted
+    cumulative     (n_blocks + 1, n_channels) int64, row b is the sum of the
+                   spectra of the first b blocks
+    block_offsets  (n_blocks + 1,) int64, byte offsets of the blocks from
+                   the end of this array
+    blocks         the spectra of the exposures of every block, in the
+                   compact channel dtype of the spectral artifact, split
+                   into byte planes (low bytes first) and compressed with
+                   CODEC
+
+The cumulative row of any exposure is delta-encoded against the row of its
+block: the sum of the first i exposures is the row of block i //
+checkpoint_rows plus the spectra preceding i within that block. The spectrum
+of any time window is the difference of two such rows. Every
+`checkpoint_rows`-th time is kept in the artifact metadata, so a window is
+resolved with a handful of small ranged reads: per bound one block of
+times, one cumulative row and one compressed block (tens of kB). The index
+is smaller than the Parquet artifact, a window never decodes the artifact.
+"""
+import numpy as np
+import pyarrow as pa
+
+
+CHECKPOINT_ROWS = 1024  # exposures per block, also between times kept in the artifact metadata
+CODEC = 'zstd'
+
+_TIME_DTYPE = np.dtype('<f8')
+_CUMULATIVE_DTYPE = np.dtype('<i8')
+_OFFSET_DTYPE = np.dtype('<i8')
+
+
+def _write_header(f, dtype, shape):
+    np.lib.format.write_array_header_1_0(f, {'descr': dtype.str, 'fortran_order': False, 'shape': shape})
+    return f.tell()
+
+
+def _encode_block(block):
+    # byte planes: the mostly zero high bytes of counts compress far better on their own
+    return pa.compress(block.view(np.uint8).reshape(-1, block.itemsize).T.tobytes(), codec=CODEC, asbytes=True)
+
+
+def _decode_block(data, dtype, rows, n_channels):
+    planes = pa.decompress(data, rows * n_channels * dtype.itemsize, codec=CODEC, asbytes=True)
+    planes = np.frombuffer(planes, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(rows, n_channels)
+
+
+def _read_header(f, offset):
+    f.seek(offset)
+    np.lib.format.read_magic(f)
+    shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+    return shape, dtype, f.tell()
+
+
+class CumulativeSpectrumBuilder:
+    """
+    Writes the cumulative spectrum index while the spectral artifact is
+    written (see `write_spectral_parquet(consumers=...)`). Row groups must
+    arrive in time order, only the running total and the spectra of the
+    unfinished block are kept in memory.
+    """
+
+    def __init__(self, path, n_rows, n_channels, channel_dtype=np.uint32, checkpoint_rows=CHECKPOINT_ROWS):
+        self.path = path
+        self.n_rows = n_rows
+        self.n_channels = n_channels
+        self.channel_dtype = np.dtype(channel_dtype).newbyteorder('<')
+        self.checkpoint_rows = checkpoint_rows
+        self.checkpoints = []
+        self._position = 0
+        self._total = np.zeros(n_channels, dtype=_CUMULATIVE_DTYPE)
+        self._block = []
+        self._block_rows = 0
+        self._block_ends = [0]
+
+        self.n_blocks = -(-n_rows // checkpoint_rows)
+        self._file = open(path, 'wb+')
+        self._time_offset = _write_header(self._file, _TIME_DTYPE, (n_rows,))
+        self._file.seek(self._time_offset + n_rows * _TIME_DTYPE.itemsize)
+        self._cumulative_offset = _write_header(self._file, _CUMULATIVE_DTYPE, (self.n_blocks + 1, n_channels))
+        self._file.write(self._total.tobytes())
+        self._file.seek(self._cumulative_offset + (self.n_blocks + 1) * n_channels * _CUMULATIVE_DTYPE.itemsize)
+        self._offsets_offset = _write_header(self._file, _OFFSET_DTYPE, (self.n_blocks + 1,))
+        self._blocks_offset = self._offsets_offset + (self.n_blocks + 1) * _OFFSET_DTYPE.itemsize
+
+    def add(self, time_ms, particle_count, channels):
+        rows = len(time_ms)
+        if not rows:
+            return
+        time_ms = np.asarray(time_ms, dtype=_TIME_DTYPE)
+        channels = np.asarray(channels, dtype=self.channel_dtype)
+
+        self._file.seek(self._time_offset + self._position * _TIME_DTYPE.itemsize)
+        self._file.write(time_ms.tobytes())
+        first = -self._position % self.checkpoint_rows
+        self.checkpoints.extend(time_ms[first::self.checkpoint_rows].tolist())
+        self._position += rows
+
+        start = 0
+        while start < rows:
+            stop = min(start + self.checkpoint_rows - self._block_rows, rows)
+            self._block.append(channels[start:stop])
+            self._block_rows += stop - start
+            start = stop
+            if self._block_rows == self.checkpoint_rows:
+                self._write_block()
+
+    def _write_block(self):
+        block = np.concatenate(self._block)
+        self._block, self._block_rows = [], 0
+        self._total = self._total + block.sum(axis=0, dtype=_CUMULATIVE_DTYPE)
+
+        compressed = _encode_block(block)
+        self._file.seek(self._blocks_offset + self._block_ends[-1])
+        self._file.write(compressed)
+        self._block_ends.append(self._block_ends[-1] + len(compressed))
+
+        row_bytes = self.n_channels * _CUMULATIVE_DTYPE.itemsize
+        self._file.seek(self._cumulative_offset + (len(self._block_ends) - 1) * row_bytes)
+        self._file.write(self._total.tobytes())
+
+    def close(self):
+        """Finish the index file. Returns metadata needed to query it."""
+        try:
+            if self._block_rows:
+                self._write_block()
+            self._file.seek(self._offsets_offset)
+            self._file.write(np.asarray(self._block_ends, dtype=_OFFSET_DTYPE).tobytes())
+        finally:
+            self._file.close()
+        if self._position != self.n_rows:
+            raise ValueError(f"Cumulative index expected {self.n_rows} exposures, got {self._position}")
+        return {
+            'rows': self.n_rows,
+            'channels_count': self.n_channels,
+            'channel_dtype': self.channel_dtype.name,
+            'codec': CODEC,
+            'checkpoint_rows': self.checkpoint_rows,
+            'time_checkpoints': self.checkpoints,
+        }
+
+
+class CumulativeSpectrumIndex:
+    """
+    Reader of a cumulative spectrum index from a seekable binary file,
+    `channel_dtype` is the one returned by `CumulativeSpectrumBuilder.close`.
+    """
+
+    def __init__(self, f, time_checkpoints, checkpoint_rows=CHECKPOINT_ROWS, channel_dtype=np.uint32):
+        self.f = f
+        self.time_checkpoints = np.asarray(time_checkpoints, dtype=np.float64)
+        self.checkpoint_rows = checkpoint_rows
+        self.channel_dtype = np.dtype(channel_dtype).newbyteorder('<')
+
+        (self.n_rows,), _, self._time_offset = _read_header(f, 0)
+        (n_cumulative, self.n_channels), _, self._cumulative_offset = _read_header(
+            f, self._time_offset + self.n_rows * _TIME_DTYPE.itemsize
+        )
+        self.n_blocks = n_cumulative - 1
+        _, _, offsets_offset = _read_header(
+            f, self._cumulative_offset + n_cumulative * self.n_channels * _CUMULATIVE_DTYPE.itemsize
+        )
+        self._block_ends = self._read(offsets_offset, _OFFSET_DTYPE, n_cumulative)
+        self._blocks_offset = offsets_offset + n_cumulative * _OFFSET_DTYPE.itemsize
+
+    def _read(self, offset, dtype, count):
+        self.f.seek(offset)
+        return np.frombuffer(self.f.read(count * dtype.itemsize), dtype=dtype)
+
+    def _times(self, start, stop):
+        return self._read(self._time_offset + start * _TIME_DTYPE.itemsize, _TIME_DTYPE, stop - start)
+
+    def _cumulative_row(self, block):
+        row_bytes = self.n_channels * _CUMULATIVE_DTYPE.itemsize
+        return self._read(self._cumulative_offset + block * row_bytes, _CUMULATIVE_DTYPE, self.n_channels)
+
+    def _block(self, block):
+        """Spectra of the exposures of one block."""
+        start, stop = int(self._block_ends[block]), int(self._block_ends[block + 1])
+        self.f.seek(self._blocks_offset + start)
+        rows = min(self.checkpoint_rows, self.n_rows - block * self.checkpoint_rows)
+        return _decode_block(self.f.read(stop - start), self.channel_dtype, rows, self.n_channels)
+
+    def cumulative_row(self, row):
+        """Summed spectrum of the first `row` exposures."""
+        block, within = divmod(row, self.checkpoint_rows)
+        counts = self._cumulative_row(block)
+        if within:
+            counts = counts + self._block(block)[:within].sum(axis=0, dtype=_CUMULATIVE_DTYPE)
+        return counts
+
+    def search(self, time_ms, side='left'):
+        """Like `np.searchsorted` over the exposure times, reading one block of times."""
+        block = int(np.searchsorted(self.time_checkpoints, time_ms, side=side)) - 1
+        if block < 0:
+            return 0
+        start = block * self.checkpoint_rows
+        stop = min(start + self.checkpoint_rows, self.n_rows)
+        return start + int(np.searchsorted(self._times(start, stop), time_ms, side=side))
+
+    def window(self, time_from=None, time_to=None):
+        """
+        Summed spectrum of exposures within [time_from, time_to].
+        Returns (counts, first_time, last_time), times are None for an empty window.
+        """
+        first = 0 if time_from is None else self.search(time_from, 'left')
+        stop = self.n_rows if time_to is None else self.search(time_to, 'right')
+        if stop <= first:
+            return np.zeros(self.n_channels, dtype=_CUMULATIVE_DTYPE), None, None
+
+        counts = self.cumulative_row(stop) - self.cumulative_row(first)
+        first_time = float(self._times(first, first + 1)[0])
+        last_time = float(self._times(stop - 1, stop)[0])
+        return counts, first_time, last_time
@@ -0,0 +1,600 @@
+"""
+Streaming parser for AIRDOS / LABDOS / GEODOS detector logs.
+
+The raw log is read once, in bounded chunks. `$CANDY` sentences give the
+spectra, their auxiliary fields and all other sentences (housekeeping,
+telemetry) are kept as numeric tables next to them. Every chunk is parsed
+into numeric arrays and handed to the caller right away, so peak memory
+depends on the chunk size and not on the size of the log. Sentences are
+decoded straight into typed NumPy arrays, no object-dtype DataFrame is built
+on the way.
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+# Bump whenever the ingestion output changes, artifacts of older versions are not reused
+PARSER_VERSION = 6
+
+CANDY_SENTENCE = b"$CANDY"
+HIST_SENTENCE = b"$HIST"
+HEADER_SENTENCE = b"$DOS"
+SENTENCE_PREFIX = b"$"
+
+# Fields of the `$DOS` header sentence
+HEADER_FIELDS = ['DET', 'detector_type', 'firmware_build', 'channels', 'firmware_commit', 'firmware_origin', 'detector_sn']
+
+# Column layout of $CANDY / $HIST sentences
+TIME_COLUMN = 2
+PARTICLE_COLUMN = 3
+FIRST_CHANNEL = 10
+# $CANDY columns which are neither time, particle count nor a channel
+AUX_COLUMNS = [1, 4, 5, 6, 7, 8, 9]
+
+TELEMETRY_MAX_FIELDS = 64  # fields kept per telemetry sentence
+TELEMETRY_KEY_PREFIX = 'telemetry_'  # segment arrays of telemetry sentences, by sentence name
+TELEMETRY_TIME_KEY_PREFIX = 'time_ms:'  # segment arrays of their times, by sentence name
+_SENTENCE_NAME = re.compile(r'^[A-Za-z0-9_]+$')
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # bytes of raw log read at once
+
+
+def iter_storage_chunks(storage, name, chunk_size=DEFAULT_CHUNK_SIZE, start=0):
+    """
+    Yield the content of a stored object as byte chunks, from byte `start`.
+
+    S3 backed storages stream the object directly, other storages fall back
+    to plain sequential reads of the opened file.
+    """
+    if hasattr(storage, 'iter_chunks'):
+        yield from storage.iter_chunks(name, chunk_size, start=start)
+        return
+
+    with storage.open(name, 'rb') as f:
+        f.seek(start)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_file_chunks(field_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the content of a FieldFile as byte chunks."""
+    yield from iter_storage_chunks(field_file.storage, field_file.name, chunk_size)
+
+
+def iter_line_range(chunks, start, end):
+    """
+    Restrict a byte stream to the lines starting within [start, end).
+
+    `chunks` must begin at offset `max(start - 1, 0)` of the file. The line
+    cut by `start` belongs to the previous range and is skipped, the line cut
+    by `end` is read to its end. Consecutive ranges therefore cover every
+    line of the file exactly once.
+    """
+    position = max(start - 1, 0)
+    skipping = start > 0
+    finishing = False
+
+    for chunk in chunks:
+        chunk_start = position
+        position += len(chunk)
+
+        if skipping:
+            cut = chunk.find(b"\n")
+            if cut == -1:
+                continue
+            chunk = chunk[cut + 1:]
+            chunk_start += cut + 1
+            skipping = False
+            if chunk_start >= end:
+                return
+
+        if finishing:
+            cut = chunk.find(b"\n")
+            if cut != -1:
+                yield chunk[:cut + 1]
+                return
+            yield chunk
+            continue
+
+        if position < end:
+            yield chunk
+            continue
+
+        # this chunk holds byte `end - 1`, the last line of the range is the
+        # one holding it; a newline right there ends the range at `end`
+        cut = chunk.find(b"\n", end - chunk_start - 1)
+        if cut != -1:
+            yield chunk[:cut + 1]
+            return
+        yield chunk
+        finishing = True
+
+
+def split_byte_ranges(size, parts):
+    """Split `size` bytes into `parts` contiguous (start, end) ranges."""
+    parts = max(1, min(parts, size))
+    return [(size * i // parts, size * (i + 1) // parts) for i in range(parts)]
+
+
+def iter_sentence_blocks(chunks, sentence=CANDY_SENTENCE, start=0):
+    """
+    Like `iter_sentence_lines`, yielding `(lines, end)` where `end` is the
+    file offset right after the last complete line consumed so far, given
+    that `chunks` begin at file offset `start`. Parsing can later resume
+    from `end` without losing or repeating a line.
+    """
+    tail = b""
+    position = start
+    for chunk in chunks:
+        position += len(chunk)
+        data = tail + chunk
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            tail = data
+            continue
+        tail = data[cut + 1:]
+
+        lines = [line.rstrip(b"\r") for line in data[:cut].split(b"\n") if line.startswith(sentence)]
+        if lines:
+            yield lines, position - len(tail)
+
+    tail = tail.rstrip(b"\r")
+    if tail.startswith(sentence):
+        yield [tail], position
+
+
+def iter_sentence_lines(chunks, sentence=CANDY_SENTENCE):
+    """
+    Split byte chunks into lines and yield, per chunk, the list of complete
+    lines starting with `sentence`. A line cut by a chunk boundary is carried
+    over to the next chunk.
+    """
+    for lines, _ in iter_sentence_blocks(chunks, sentence):
+        yield lines
+
+
+def compact_channel_dtype(max_count):
+    """Smallest unsigned integer dtype able to hold `max_count`."""
+    if max_count <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def parse_header(line):
+    """Parse a `$DOS` header sentence (e.g. `$DOS,AIRDOS04,F4,...`) into a dict."""
+    fields = line.decode('utf-8', errors='replace').rstrip().split(',')
+    return dict(zip(HEADER_FIELDS, fields))
+
+
+def _decode_integers(digits, field_end):
+    """
+    Values of the non-negative integer fields ending at `field_end` of a
+    buffer of digits (byte - ord('0')) and separators.
+    """
+    field_length = np.diff(field_end, prepend=-1) - 1
+
+    # Sum digit * 10^k going backwards from the end of each field. Most values
+    # are short, so longer fields are finished on the shrinking subset only.
+    values = np.zeros(field_end.size, dtype=np.int64)
+    longest = int(field_length.max())
+    scale = 1
+    for k in range(1, min(longest, 3) + 1):
+        values += np.where(field_length >= k, digits[field_end - k], 0) * np.int64(scale)
+        scale *= 10
+    live = np.flatnonzero(field_length > 3)
+    for k in range(4, longest + 1):
+        live = live[field_length[live] >= k]
+        values[live] += digits[field_end[live] - k] * np.int64(scale)
+        scale *= 10
+    return values
+
+
+def _tokenize_numbers(lines):
+    """
+    Vectorized tokenizer for sentences made of numbers.
+
+    Lines are concatenated into one byte buffer and every field is decoded
+    with NumPy operations over field end positions, so no Python object is
+    created per value. Signs and decimal points are taken out of the buffer
+    and applied per field afterwards. Only lines holding anything else (or a
+    malformed number) go through `_tokenize_fallback`. The sentence name is
+    expected to be stripped already.
+    Returns a 2D array (rows padded with zeros), int64 unless a field has a
+    decimal point or a line needed the fallback (float64).
+    """
+    if not lines:
+        return np.zeros((0, 0), dtype=np.int64)
+
+    buffer = np.frombuffer(b"\n".join(lines) + b"\n", dtype=np.uint8)
+    digits = buffer - np.uint8(ord('0'))
+    is_separator = (buffer == ord(',')) | (buffer == ord('\n'))
+    field_end = np.flatnonzero(is_separator)
+    row_end = np.flatnonzero(buffer[field_end] == ord('\n'))  # last field of every line
+
+    signed = decimal = None
+    special = np.flatnonzero((digits > 9) & ~is_separator)
+    if special.size:
+        # a number has digits, at most one decimal point and its sign in front
+        kind = buffer[special]
+        field = np.searchsorted(field_end, special)
+        field_start = np.where(field > 0, field_end[field - 1] + 1, 0)
+        is_dot = kind == ord('.')
+        is_minus = kind == ord('-')
+        fields, count = np.unique(field, return_counts=True)
+        dot_fields, dot_count = np.unique(field[is_dot], return_counts=True)
+        malformed = np.r_[
+            field[~(is_dot | is_minus) | (is_minus & (special != field_start))],
+            dot_fields[dot_count > 1],
+            fields[count == field_end[fields] - np.where(fields > 0, field_end[fields - 1] + 1, 0)],
+        ]
+        if malformed.size:
+            return _tokenize_mixed(lines, np.unique(np.searchsorted(row_end, malformed)))
+
+        signed = field[is_minus]
+        decimal = field[is_dot]
+        fraction_digits = field_end[decimal] - special[is_dot] - 1
+        keep = np.ones(buffer.size, dtype=bool)
+        keep[special] = False
+        digits = digits[keep]
+        field_end = field_end - np.searchsorted(special, field_end)
+
+    values = _decode_integers(digits, field_end)
+    if signed is not None:
+        values[signed] *= -1
+    if decimal is not None and decimal.size:
+        # the same value as float() while the digits fit into 53 bits
+        values = values.astype(np.float64)
+        values[decimal] /= 10.0 ** fraction_digits
+
+    row_length = np.diff(row_end, prepend=-1)
+    width = int(row_length.max())
+    if np.all(row_length == width):
+        return values.reshape(-1, width)
+
+    matrix = np.zeros((row_length.size, width), dtype=values.dtype)
+    matrix[np.arange(width) < row_length[:, None]] = values
+    return matrix
+
+
+def _tokenize_mixed(lines, bad):
+    """`_tokenize_numbers` of all `lines` but the `bad` ones (indices), which are parsed by the fallback."""
+    good = np.setdiff1d(np.arange(len(lines)), bad)
+    fallback, parsed = _tokenize_fallback([lines[i] for i in bad])
+    parts = [_tokenize_numbers([lines[i] for i in good]), fallback]
+    width = max(part.shape[1] for part in parts)
+    matrix = np.concatenate([
+        np.pad(part.astype(np.float64), ((0, 0), (0, width - part.shape[1]))) for part in parts
+    ])
+    # back to log order
+    return matrix[np.argsort(np.r_[good, bad[parsed]], kind='stable')]
+
+
+def _tokenize_fallback(lines):
+    """
+    Line by line tokenizer for lines the vectorized one cannot parse. Empty
+    fields read as 0 and lines which cannot be parsed are skipped.
+    Returns the float64 matrix and the indices of the parsed lines.
+    """
+    rows = []
+    parsed = []
+    for i, line in enumerate(lines):
+        try:
+            rows.append([float(field or 0) for field in line.split(b",")])
+        except ValueError:
+            continue
+        parsed.append(i)
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float64), np.array(parsed, dtype=np.int64)
+
+    width = max(len(row) for row in rows)
+    matrix = np.zeros((len(rows), width), dtype=np.float64)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix, np.array(parsed, dtype=np.int64)
+
+
+def tokenize_sentences(lines, sentence=CANDY_SENTENCE, aux=False):
+    """
+    Turn raw spectral sentences (`$CANDY`, `$HIST`) into typed arrays.
+
+    Returns (time_ms, particle_count, channels): time as float64, particle
+    count as int64 and the channel matrix (every column from FIRST_CHANNEL
+    onward) in the smallest unsigned dtype holding its values. Lines shorter
+    than the widest one are padded with zeros, lines ending before the first
+    channel (cut off, e.g. by a power loss) are skipped. With `aux`, the
+    AUX_COLUMNS fields are returned as a fourth float64 matrix.
+    """
+    prefix = sentence + b","
+    # the sentence name is not part of the matrix, log column N is matrix column N - 1
+    stripped = [line[len(prefix):] for line in lines if line.count(b",") >= FIRST_CHANNEL]
+
+    matrix = _tokenize_numbers(stripped)
+    if not len(matrix):
+        matrix = np.zeros((0, FIRST_CHANNEL - 1), dtype=np.int64)
+
+    time_ms = matrix[:, TIME_COLUMN - 1].astype(np.float64)
+    particle_count = matrix[:, PARTICLE_COLUMN - 1].astype(np.int64)
+    channels = matrix[:, FIRST_CHANNEL - 1:]
+    max_count = int(channels.max()) if channels.size else 0
+    channels = channels.astype(compact_channel_dtype(max_count))
+    if aux:
+        return time_ms, particle_count, channels, matrix[:, np.array(AUX_COLUMNS) - 1].astype(np.float64)
+    return time_ms, particle_count, channels
+
+
+def tokenize_telemetry(lines, max_fields=TELEMETRY_MAX_FIELDS, time_ms=None):
+    """
+    Parse non-spectral sentences into one float64 matrix per sentence name.
+    Column j holds log column j + 1, fields which are empty, missing or not
+    numeric read as NaN. Sentences with unusual names are dropped. With
+    `time_ms` (one time per line), a second dict maps every sentence name to
+    the float64 times of its rows.
+    """
+    grouped = {}
+    times = {}
+    for i, line in enumerate(lines):
+        name, _, rest = line[len(SENTENCE_PREFIX):].partition(b",")
+        name = name.decode('ascii', errors='replace')
+        if _SENTENCE_NAME.match(name):
+            grouped.setdefault(name, []).append(rest.split(b",")[:max_fields])
+            if time_ms is not None:
+                times.setdefault(name, []).append(time_ms[i])
+
+    tables = {}
+    for name, rows in grouped.items():
+        matrix = np.full((len(rows), max(len(row) for row in rows)), np.nan)
+        for i, row in enumerate(rows):
+            for j, field in enumerate(row):
+                try:
+                    matrix[i, j] = float(field)
+                except ValueError:
+                    pass
+        tables[name] = matrix
+    if time_ms is not None:
+        return tables, {name: np.array(values, dtype=np.float64) for name, values in times.items()}
+    return tables
+
+
+def current_rss():
+    """Resident set size of this process in bytes, None where it cannot be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def chunk_size_for_budget(memory_budget, default=DEFAULT_CHUNK_SIZE):
+    """
+    Raw log bytes read at once under a memory budget. Tokenizing a chunk
+    needs roughly 16x its size in temporary arrays.
+    """
+    if not memory_budget:
+        return default
+    return int(min(default, max(memory_budget // 16, 256 * 1024)))
+
+
+def load_segment(segment, skip=()):
+    """
+    Arrays of a segment, either kept in memory (dict) or spilled (`.npz`
+    path). Arrays named in `skip` are not read from spilled segments.
+    """
+    if isinstance(segment, dict):
+        return segment
+    with np.load(segment) as data:
+        return {name: data[name] for name in data.files if name not in skip}
+
+
+def _spill_segment(segment, spill_dir, prefix, index):
+    path = os.path.join(spill_dir, f"{prefix}_{index:06d}.npz")
+    np.savez(path, **segment)
+    return path
+
+
+def empty_summary():
+    return {
+        'segments': [],
+        'rows': 0,
+        'channels': 0,
+        'max_count': 0,
+        'time_min': None,
+        'time_max': None,
+        'telemetry': {},  # sentence name -> widest row seen
+        'header': None,
+    }
+
+
+def _sentence_time(line):
+    try:
+        return float(line.split(b",", TIME_COLUMN + 1)[TIME_COLUMN])
+    except (IndexError, ValueError):
+        return np.nan
+
+
+def _split_sentences(lines, summary):
+    """
+    Split lines into $CANDY sentences and telemetry, the first header goes to
+    `summary`. Telemetry sentences have no common time column, every one is
+    given the time of the $CANDY sentence before it (NaN for those before the
+    first $CANDY of `lines`, see `write_telemetry_parquet`).
+    """
+    candy, telemetry, telemetry_time = [], [], []
+    time_ms, parsed = np.nan, 0  # time of the last $CANDY line, parsed once telemetry follows it
+    for line in lines:
+        if line.startswith(CANDY_SENTENCE):
+            candy.append(line)
+        elif line.startswith(HEADER_SENTENCE):
+            if summary['header'] is None:
+                summary['header'] = parse_header(line)
+        elif not line.startswith(HIST_SENTENCE):
+            if len(candy) != parsed:
+                time_ms, parsed = _sentence_time(candy[-1]), len(candy)
+            telemetry.append(line)
+            telemetry_time.append(time_ms)
+    return candy, telemetry, telemetry_time
+
+
+def _empty_candy_arrays():
+    return (
+        np.empty(0, dtype=np.float64),
+        np.empty(0, dtype=np.int64),
+        np.empty((0, 0), dtype=np.uint16),
+        np.empty((0, len(AUX_COLUMNS)), dtype=np.float64),
+    )
+
+
+def spill_candy_segments(chunks, spill_dir, prefix='segment', memory_budget=None,
+                         start=0, summary=None, on_segment=None):
+    """
+    Parse sentences from byte chunks into segments, one per parsed chunk.
+    A segment holds the `$CANDY` arrays (`time_ms`, `particle_count`,
+    `channels` and the auxiliary fields `aux`) and a `telemetry_<NAME>`
+    matrix per other sentence found in the chunk (see `tokenize_telemetry`)
+    with the times of its rows in `time_ms:<NAME>`.
+    `$HIST` sentences are skipped, the first `$DOS` header is kept in the
+    summary.
+
+    Without `memory_budget` every segment is spilled right away as a `.npz`
+    file into `spill_dir`, named `<prefix>_<n>.npz`. With a budget (bytes)
+    segments stay in memory until their size or the process RSS exceed it,
+    then everything held so far and all following segments are spilled.
+
+    To resume an interrupted parse, pass the `summary` reached so far and
+    chunks beginning at file offset `start`. `on_segment(summary, end)` is
+    called after every segment with the file offset parsing could resume
+    from.
+
+    Returns a summary dict with the segments (in log order, see
+    `load_segment`), number of rows, maximum number of channels seen, the
+    highest channel count value, the time range, the widest row of every
+    telemetry sentence and the header.
+    """
+    summary = summary or empty_summary()
+    held_bytes = 0
+    spilling = memory_budget is None
+
+    for lines, end in iter_sentence_blocks(chunks, SENTENCE_PREFIX, start=start):
+        candy, telemetry, telemetry_time = _split_sentences(lines, summary)
+        time_ms, particle_count, channels, aux = (
+            tokenize_sentences(candy, aux=True) if candy else _empty_candy_arrays()
+        )
+        telemetry, telemetry_time = tokenize_telemetry(telemetry, time_ms=telemetry_time)
+        if not len(time_ms) and not telemetry:
+            continue
+
+        segment = {'time_ms': time_ms, 'particle_count': particle_count, 'channels': channels, 'aux': aux}
+        for name, matrix in telemetry.items():
+            segment[TELEMETRY_KEY_PREFIX + name] = matrix
+            segment[TELEMETRY_TIME_KEY_PREFIX + name] = telemetry_time[name]
+            summary['telemetry'][name] = max(summary['telemetry'].get(name, 0), matrix.shape[1])
+        if not spilling:
+            held_bytes += sum(array.nbytes for array in segment.values())
+            rss = current_rss()
+            if held_bytes > memory_budget or (rss is not None and rss > memory_budget):
+                spilling = True
+                summary['segments'] = [
+                    held if isinstance(held, str) else _spill_segment(held, spill_dir, prefix, i)
+                    for i, held in enumerate(summary['segments'])
+                ]
+        if spilling:
+            segment = _spill_segment(segment, spill_dir, prefix, len(summary['segments']))
+
+        summary['segments'].append(segment)
+        summary['rows'] += len(time_ms)
+        summary['channels'] = max(summary['channels'], channels.shape[1])
+        if channels.size:
+            summary['max_count'] = max(summary['max_count'], int(channels.max()))
+
+        if len(time_ms):
+            _update_time_range(summary, time_ms)
+
+        if on_segment is not None:
+            on_segment(summary, end)
+
+    return summary
+
+
+def _update_time_range(summary, time_ms):
+    chunk_min, chunk_max = float(np.nanmin(time_ms)), float(np.nanmax(time_ms))
+    if summary['time_min'] is None or chunk_min < summary['time_min']:
+        summary['time_min'] = chunk_min
+    if summary['time_max'] is None or chunk_max > summary['time_max']:
+        summary['time_max'] = chunk_max
+
+
+def merge_summaries(summaries):
+    """
+    Merge summaries of consecutive parts of one log into a single summary.
+    Segments keep the order of `summaries`, time range and channel counts
+    are taken over the whole file.
+    """
+    merged = empty_summary()
+    for summary in summaries:
+        merged['segments'].extend(summary['segments'])
+        merged['rows'] += summary['rows']
+        merged['channels'] = max(merged['channels'], summary['channels'])
+        merged['max_count'] = max(merged['max_count'], summary['max_count'])
+        for name, width in summary['telemetry'].items():
+            merged['telemetry'][name] = max(merged['telemetry'].get(name, 0), width)
+        if merged['header'] is None:
+            merged['header'] = summary['header']
+        if summary['rows'] == 0:
+            continue
+        if merged['time_min'] is None or summary['time_min'] < merged['time_min']:
+            merged['time_min'] = summary['time_min']
+        if merged['time_max'] is None or summary['time_max'] > merged['time_max']:
+            merged['time_max'] = summary['time_max']
+    return merged
+
+
+def _init_parser_process():
+    import django
+    django.setup()
+
+
+def _spill_byte_range(storage, name, start, end, spill_dir, index, chunk_size):
+    chunks = iter_storage_chunks(storage, name, chunk_size, start=max(start - 1, 0))
+    return spill_candy_segments(iter_line_range(chunks, start, end), spill_dir, prefix=f"part_{index:04d}")
+
+
+def spill_candy_segments_parallel(storage, name, size, spill_dir, workers, chunk_size=DEFAULT_CHUNK_SIZE,
+                                  parts=None, done=None, on_range=None):
+    """
+    Parallel variant of `spill_candy_segments` for large logs.
+
+    The stored object is split at line boundaries into `parts` byte ranges
+    (one per worker by default), every range is parsed in a separate process
+    (reading only its own range from storage) and the partial summaries are
+    merged in file order. Time normalization must use the merged `time_min`.
+    Segments are always spilled, they are handed over between processes as
+    files.
+
+    `done` maps indexes of ranges parsed before (by a killed task) to their
+    summaries, only the other ranges are parsed. `on_range(index, summary)`
+    is called in this process as soon as a range is parsed.
+    """
+    ranges = split_byte_ranges(size, parts or workers)
+    summaries = dict(done or {})
+    pending = [index for index in range(len(ranges)) if index not in summaries]
+    if pending:
+        # spawn gives every worker a fresh Django setup and storage connection
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context,
+                                 initializer=_init_parser_process) as pool:
+            futures = {
+                pool.submit(_spill_byte_range, storage, name, *ranges[index], spill_dir, index, chunk_size): index
+                for index in pending
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                summaries[index] = future.result()
+                if on_range is not None:
+                    on_range(index, summaries[index])
+    return merge_summaries([summaries[index] for index in range(len(ranges))])
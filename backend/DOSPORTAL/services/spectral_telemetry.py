@@ -0,0 +1,173 @@
+"""
+Telemetry artifact of a spectral record (Parquet).
+
+Holds everything of the raw log besides the spectra: the auxiliary `$CANDY`
+fields (AUX_COLUMNS) and every other numeric sentence (housekeeping,
+temperature, pressure, ...). Rows of all sentences share one table:
+
+    sentence    string, sentence name without `$` (e.g. `CANDY`, `HOUSE`)
+    time_ms     float64, from record start, time column of `$CANDY` rows, other
+                sentences have no common layout and take the time of the
+                `$CANDY` exposure logged before them
+    field_<N>   float64, log column N of the sentence, null where the
+                sentence has no such column, NaN where it was not numeric
+
+Every row group holds rows of a single sentence in log order, so a reader
+selects the row groups of one sentence (and time window) from the column
+statistics and reads only the requested field columns.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .spectral_artifacts import ROW_GROUP_ROWS, select_row_groups
+from .spectral_parser import AUX_COLUMNS, TELEMETRY_KEY_PREFIX, TELEMETRY_TIME_KEY_PREFIX, load_segment
+
+
+CANDY = 'CANDY'
+FIELD_PREFIX = 'field_'
+
+
+def field_name(column):
+    return f'{FIELD_PREFIX}{column}'
+
+
+def sentence_columns(summary):
+    """Log columns stored per sentence, `$CANDY` time is kept in `time_ms`."""
+    columns = {}
+    if summary['rows']:
+        columns[CANDY] = list(AUX_COLUMNS)
+    for name, width in sorted(summary['telemetry'].items()):
+        columns[name] = list(range(1, width + 1))
+    return columns
+
+
+class _SentenceBuffer:
+    """Rows of one sentence waiting to fill a row group."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.parts = []
+        self.rows = 0
+        self.total_rows = 0
+
+    def add(self, time_ms, fields):
+        self.parts.append((time_ms, fields))
+        self.rows += len(time_ms)
+        self.total_rows += len(time_ms)
+
+    def take(self):
+        time_ms = np.concatenate([time_ms for time_ms, _ in self.parts])
+        fields = np.concatenate([fields for _, fields in self.parts])
+        self.parts = []
+        self.rows = 0
+        return time_ms, fields
+
+
+def write_telemetry_parquet(summary, path, row_group_rows=None):
+    """
+    Write auxiliary `$CANDY` fields and telemetry sentences of parsed
+    segments into a Parquet file (local path or writable binary stream).
+    Time is normalized with the spectral artifact's `time_min`, so both
+    share one time axis; telemetry logged before the first exposure is put
+    at time 0. Returns the artifact metadata.
+    """
+    row_group_rows = row_group_rows or ROW_GROUP_ROWS
+    columns = sentence_columns(summary)
+    all_columns = sorted({column for sentence in columns.values() for column in sentence})
+    schema = pa.schema(
+        [('sentence', pa.string()), ('time_ms', pa.float64())]
+        + [(field_name(column), pa.float64()) for column in all_columns]
+    )
+    time_origin = summary['time_min'] or 0.0
+    buffers = {name: _SentenceBuffer(sentence) for name, sentence in columns.items()}
+
+    def flush(writer, name):
+        buffer = buffers[name]
+        time_ms, fields = buffer.take()
+        arrays = {field_name(column): fields[:, i] for i, column in enumerate(buffer.columns)}
+        writer.write_table(pa.table(
+            [pa.array([name] * len(time_ms)), pa.array(time_ms)]
+            + [
+                pa.array(arrays[field_name(column)]) if field_name(column) in arrays
+                else pa.nulls(len(time_ms), pa.float64())
+                for column in all_columns
+            ],
+            schema=schema,
+        ))
+
+    last_time = time_origin
+    with pq.ParquetWriter(path, schema, write_statistics=['sentence', 'time_ms']) as writer:
+        for segment in summary['segments']:
+            segment = load_segment(segment, skip=('channels', 'particle_count'))
+            for key, matrix in segment.items():
+                if not key.startswith(TELEMETRY_KEY_PREFIX):
+                    continue
+                name = key[len(TELEMETRY_KEY_PREFIX):]
+                buffer = buffers[name]
+                # rows before the first $CANDY of the segment follow the last one of earlier segments
+                time_ms = segment[TELEMETRY_TIME_KEY_PREFIX + name]
+                time_ms = np.where(np.isnan(time_ms), last_time, time_ms)
+                # pad to the widest row of the sentence
+                fields = np.pad(matrix, ((0, 0), (0, len(buffer.columns) - matrix.shape[1])), constant_values=np.nan)
+                buffer.add(time_ms - time_origin, fields)
+            if len(segment['time_ms']):
+                buffers[CANDY].add(segment['time_ms'] - time_origin, segment['aux'])
+                last_time = segment['time_ms'][-1]
+
+            for name, buffer in buffers.items():
+                if buffer.rows >= row_group_rows:
+                    flush(writer, name)
+
+        for name, buffer in buffers.items():
+            if buffer.rows:
+                flush(writer, name)
+
+    return {
+        'sentences': {
+            name: {'rows': buffers[name].total_rows, 'fields': [field_name(column) for column in sentence]}
+            for name, sentence in columns.items()
+        },
+        'header': summary['header'],
+        'row_group_rows': row_group_rows,
+    }
+
+
+def select_sentence_row_groups(parquet_file, sentence, time_from=None, time_to=None):
+    """Row groups holding rows of `sentence` which may fall within [time_from, time_to]."""
+    metadata = parquet_file.metadata
+    sentence_index = parquet_file.schema_arrow.get_field_index('sentence')
+    selected = []
+    for i in select_row_groups(parquet_file, time_from, time_to):
+        statistics = metadata.row_group(i).column(sentence_index).statistics
+        if statistics is not None and statistics.has_min_max and statistics.min != sentence:
+            continue
+        selected.append(i)
+    return selected
+
+
+def read_telemetry(source, sentence, fields, time_from=None, time_to=None):
+    """
+    Read `fields` of one sentence within the optional time window.
+    Returns (time_ms, {field: values}) as float64 arrays.
+    """
+    parquet_file = pq.ParquetFile(source)
+    unknown = set(fields) - set(parquet_file.schema_arrow.names)
+    if unknown:
+        raise ValueError(f"Unknown telemetry fields: {', '.join(sorted(unknown))}")
+
+    row_groups = select_sentence_row_groups(parquet_file, sentence, time_from, time_to)
+    table = parquet_file.read_row_groups(row_groups, columns=['sentence', 'time_ms', *fields])
+
+    time_ms = table.column('time_ms').to_numpy()
+    mask = (table.column('sentence').to_numpy(zero_copy_only=False) == sentence)
+    if time_from is not None:
+        mask &= time_ms >= time_from
+    if time_to is not None:
+        mask &= time_ms <= time_to
+
+    values = {
+        field: table.column(field).to_numpy(zero_copy_only=False).astype(np.float64)[mask]
+        for field in fields
+    }
+    return time_ms[mask], values
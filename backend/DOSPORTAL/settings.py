@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -231,6 +232,12 @@ MINIO_PUBLIC_URL = os.getenv("MINIO_PUBLIC_URL")
 # For presigned URLs, do not set MEDIA_URL; admin and templates should use file.url
 MEDIA_URL = None
 
+# Uploads are hashed while they stream in (File.content_hash)
+FILE_UPLOAD_HANDLERS = [
+    "DOSPORTAL.upload_handlers.HashingMemoryFileUploadHandler",
+    "DOSPORTAL.upload_handlers.HashingTemporaryFileUploadHandler",
+]
+
 
 
 REST_FRAMEWORK = {
@@ -308,21 +315,86 @@ MARTOR_TOOLBAR_BUTTONS = [
 MARTOR_ENABLE_LABEL = False
 
 
+# The default cluster serves interactive tasks (ingestion of small logs).
+# Heavy task classes go to their own clusters, started with Q_CLUSTER_NAME
+# set to the cluster name (see docker-compose), each with its own workers
+# and timeout. Routing is done in DOSPORTAL.task_queues.
 Q_CLUSTER = {
     "name": "Worker",
-    "workers": 4,
-    "timeout": 60,
-    "retry": 90,
+    "workers": int(os.getenv("Q_WORKERS", "4")),
+    "timeout": 300,
+    # The Redis broker has no acknowledgements, a task killed by the timeout is not delivered
+    # again. Ingestions left `processing` are queued again by DOSPORTAL.tasks.recover_stale_ingests
+    # (scheduled by init_dosportal) and resume from their checkpoint.
+    "retry": 360,
     "recycle": 500,
     "compress": True,
     #'save_limit': 250,
     #'queue_limit': 500,
     "cpu_affinity": 1,
     "label": "Async dosportal worker",
+    # workers spawn a process pool when parsing large logs
+    "daemonize_workers": False,
     #'orm': 'default',
     "redis": {
         "host": os.getenv("REDIS_HOST", "redis"),
         "port": 6379,
         "db": 0,
     },
+    "ALT_CLUSTERS": {
+        # ingestion of logs above SPECTRAL_LARGE_LOG_SIZE
+        "ingest_large": {
+            "workers": int(os.getenv("Q_INGEST_LARGE_WORKERS", "1")),
+            "timeout": 3600,
+            "retry": 3660,
+            "label": "Async dosportal worker (large logs)",
+        },
+        # dose rate calculations of records
+        "dose": {
+            "workers": int(os.getenv("Q_DOSE_WORKERS", "2")),
+            "timeout": 600,
+            "retry": 660,
+            "label": "Async dosportal worker (dose)",
+        },
+        # CARI flight dose simulations
+        "cari": {
+            "workers": int(os.getenv("Q_CARI_WORKERS", "1")),
+            "timeout": 7200,
+            "retry": 7260,
+            "label": "Async dosportal worker (CARI)",
+        },
+    },
 }
+
+
+# Spectral log ingestion
+# Logs above SPECTRAL_PARALLEL_MIN_SIZE are parsed in byte ranges by a process pool
+SPECTRAL_PARSER_WORKERS = int(os.getenv("SPECTRAL_PARSER_WORKERS", os.cpu_count() or 1))
+SPECTRAL_PARALLEL_MIN_SIZE = int(os.getenv("SPECTRAL_PARALLEL_MIN_SIZE_MB", "64")) * 1024 * 1024
+# Raw log bytes parsed between two ingestion checkpoints (see DOSPORTAL.services.ingest_checkpoint),
+# also the largest byte range of a parallel parse. Keep it below SPECTRAL_PARALLEL_MIN_SIZE,
+# sequentially parsed logs shorter than one interval are never checkpointed.
+SPECTRAL_CHECKPOINT_INTERVAL = int(os.getenv("SPECTRAL_CHECKPOINT_INTERVAL_MB", "16")) * 1024 * 1024
+# Ingestions interrupted by a task timeout are queued again every SPECTRAL_INGEST_RECOVERY_MINUTES,
+# a record interrupted more than SPECTRAL_INGEST_MAX_RECOVERIES times in a row is marked failed
+SPECTRAL_INGEST_RECOVERY_MINUTES = int(os.getenv("SPECTRAL_INGEST_RECOVERY_MINUTES", "5"))
+SPECTRAL_INGEST_MAX_RECOVERIES = int(os.getenv("SPECTRAL_INGEST_MAX_RECOVERIES", "3"))
+# Logs from this size on are ingested by the `ingest_large` cluster, smaller ones stay interactive
+SPECTRAL_LARGE_LOG_SIZE = int(os.getenv("SPECTRAL_LARGE_LOG_SIZE_MB", "32")) * 1024 * 1024
+# Memory one ingestion task may hold, parsed data above it is spilled to a local temp directory
+SPECTRAL_MEMORY_BUDGET = int(os.getenv("SPECTRAL_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+
+# Time resolutions (ms) of the pre-aggregated evolution artifact, 0 keeps every exposure
+SPECTRAL_EVOLUTION_LEVELS_MS = [
+    float(level) for level in os.getenv("SPECTRAL_EVOLUTION_LEVELS_MS", "0,10000,60000,600000").split(",")
+]
+# Default point budget of the evolution endpoint (`max_points` query parameter)
+SPECTRAL_EVOLUTION_MAX_POINTS = int(os.getenv("SPECTRAL_EVOLUTION_MAX_POINTS", "5000"))
+# Bytes of decoded spectral artifacts kept per web process (see DOSPORTAL.services.array_cache), 0 disables
+SPECTRAL_ARRAY_CACHE_BYTES = int(os.getenv("SPECTRAL_ARRAY_CACHE_MB", "256")) * 1024 * 1024
+# Node-local disk cache of artifact objects (see DOSPORTAL.services.artifact_disk_cache), empty dir or 0 disables
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dosportal_artifacts"))
+ARTIFACT_CACHE_BYTES = int(os.getenv("ARTIFACT_CACHE_MB", "4096")) * 1024 * 1024
+# Derived spectral responses shared by all web processes in Redis (see DOSPORTAL.services.result_cache)
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_MB", "16")) * 1024 * 1024
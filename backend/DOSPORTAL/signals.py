@@ -1,12 +1,14 @@
+from django.db import transaction
 from django.db.models.signals import post_save 
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile, File
+from .models import Profile, File, DetectorCalib
 from .models.spectrals import SpectralRecord
 from django.conf import settings
 from rest_framework.authtoken.models import Token
 
-from django_q.tasks import async_task
+from .services.result_cache import invalidate_record, invalidate_records
+from .task_queues import schedule_ingest
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -29,6 +31,7 @@ def save_profile(sender, instance, **kwargs):
 def process_spectral_record(sender, instance: SpectralRecord, created=False, **kwargs):
     """
     Schedule async processing of SpectralRecord when created.
+    The task is queued once the transaction commits, workers never see an uncommitted record.
     """
     
     if kwargs.get('update_fields'): # Avoid recursive calls from save() operations
@@ -37,7 +40,21 @@ def process_spectral_record(sender, instance: SpectralRecord, created=False, **k
     if created and instance.raw_file and instance.raw_file.file_type == File.FILE_TYPE_LOG:
         print(f"Scheduling async processing for SpectralRecord {instance.id}")
         
-        # Post-process spectral record raw file into artefacts
-        async_task('DOSPORTAL.tasks.process_spectral_record_into_spectral_file_async', instance.id)
+        # Post-process spectral record raw file into artefacts, large logs go to their own cluster
+        transaction.on_commit(lambda: schedule_ingest(instance))
 
-        print(f"Async task scheduled for SpectralRecord {instance.id}")
+
+@receiver(post_save, sender=SpectralRecord)
+def invalidate_record_results(sender, instance: SpectralRecord, created=False, update_fields=None, **kwargs):
+    """Drop cached derived responses of a record whose calibration may have changed."""
+    if created or (update_fields and 'calib' not in update_fields):
+        return
+    invalidate_record(instance.id)
+
+
+@receiver(post_save, sender=DetectorCalib)
+def invalidate_calib_results(sender, instance: DetectorCalib, created=False, **kwargs):
+    """Drop cached derived responses of all records using a changed calibration."""
+    if created:
+        return
+    invalidate_records(instance.records.values_list('id', flat=True))
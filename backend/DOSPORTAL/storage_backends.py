@@ -1,6 +1,153 @@
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
 from django.conf import settings
 
+from .services.artifact_disk_cache import CHUNK_SIZE, artifact_disk_cache
+
+
+class S3RangeFile(io.RawIOBase):
+    """
+    Read-only seekable view of an S3 object. Every read is served by an HTTP
+    Range request, so readers which seek (e.g. Parquet footers and selected
+    row groups) download only the bytes they actually touch.
+    """
+
+    def __init__(self, client, bucket, key, size):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer):
+        if self._position >= self._size or not len(buffer):
+            return 0
+        end = min(self._position + len(buffer), self._size) - 1
+        response = self._client.get_object(
+            Bucket=self._bucket, Key=self._key, Range=f"bytes={self._position}-{end}"
+        )
+        data = response['Body'].read()
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only stream into a new S3 object using a multipart upload.
+
+    Written bytes are cut into parts of `part_size` which are uploaded in
+    background threads while the caller keeps producing data, at most
+    `max_in_flight` parts are held in memory at once. Size and SHA-256 of
+    the content are computed on the fly. Leaving a `with` block on an
+    exception aborts the upload, no partial object is created.
+    """
+
+    MIN_PART_SIZE = 5 * 1024 * 1024  # S3 limit for all parts but the last
+
+    def __init__(self, client, bucket, key, part_size=8 * 1024 * 1024, max_in_flight=2, content_type=None):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = max(part_size, self.MIN_PART_SIZE)
+        self._max_in_flight = max_in_flight
+        self._buffer = bytearray()
+        self._parts = []
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+        params = {'Bucket': bucket, 'Key': key}
+        if content_type:
+            params['ContentType'] = content_type
+        self._upload_id = client.create_multipart_upload(**params)['UploadId']
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    @property
+    def content_hash(self):
+        return self._hash.hexdigest()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.size
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self._hash.update(data)
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self._part_size:
+            self._submit_part(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+        return len(data)
+
+    def _upload_part(self, number, body):
+        response = self._client.upload_part(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, PartNumber=number, Body=body
+        )
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def _submit_part(self, body):
+        # wait for the oldest running part, bounding memory held by parts
+        running = [part for part in self._parts if not part.done()]
+        if len(running) >= self._max_in_flight:
+            running[0].result()
+        self._parts.append(self._executor.submit(self._upload_part, len(self._parts) + 1, body))
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._parts:
+                self._submit_part(bytes(self._buffer))
+                self._buffer.clear()
+            parts = [part.result() for part in self._parts]
+            self._client.complete_multipart_upload(
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, MultipartUpload={'Parts': parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown()
+            super().close()
+
+    def abort(self):
+        """Cancel the upload and drop the uploaded parts."""
+        if self.closed:
+            return
+        self._executor.shutdown(cancel_futures=True)
+        self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
 
 class MinIOMediaStorage(S3Boto3Storage):
     """
@@ -21,3 +168,56 @@ class MinIOMediaStorage(S3Boto3Storage):
             url = url.replace(internal_url, public_url)
         
         return url
+
+    def iter_chunks(self, name, chunk_size, start=0, end=None):
+        """
+        Stream object bytes straight from S3 in chunks of `chunk_size`.
+
+        Unlike `open()`, which buffers the whole object into a temporary file,
+        only one chunk is held in memory at a time. `start`/`end` select a byte
+        range (`end` exclusive) using an HTTP Range request.
+        """
+        params = {
+            'Bucket': self.bucket_name,
+            'Key': self._normalize_name(clean_name(name)),
+        }
+        if start or end is not None:
+            params['Range'] = f"bytes={start}-{'' if end is None else end - 1}"
+
+        body = self.connection.meta.client.get_object(**params)['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def open_ranged(self, name, buffer_size=1024 * 1024):
+        """Open an object for random access reads without downloading it whole."""
+        key = self._normalize_name(clean_name(name))
+        raw = S3RangeFile(self.connection.meta.client, self.bucket_name, key, self.size(name))
+        return io.BufferedReader(raw, buffer_size=buffer_size)
+
+    def open_cached(self, name, content_hash, size=None):
+        """
+        Open an immutable object through the node-local disk cache (see
+        DOSPORTAL.services.artifact_disk_cache), memory-mapped. Objects without
+        a content hash, above the cache budget or with the cache disabled are
+        opened for ranged reads.
+        """
+        cache = artifact_disk_cache()
+        if cache is not None and content_hash:
+            mapped = cache.open(
+                content_hash,
+                self.size(name) if size is None else size,
+                lambda: self.iter_chunks(name, CHUNK_SIZE),
+            )
+            if mapped is not None:
+                return mapped
+        return self.open_ranged(name)
+
+    def open_multipart(self, name, **kwargs):
+        """
+        Open a new object for streamed writing (see S3MultipartWriter). The
+        caller picks an available `name`, nothing is uploaded through `save()`.
+        """
+        key = self._normalize_name(clean_name(name))
+        return S3MultipartWriter(self.connection.meta.client, self.bucket_name, key, **kwargs)
@@ -0,0 +1,134 @@
+"""
+Routing of background tasks to django-q clusters.
+
+Every task class has its own cluster (see `Q_CLUSTER["ALT_CLUSTERS"]` in
+settings) with its own workers and timeout, so long running tasks never
+queue in front of interactive ones.
+
+Ingestion of a record is guarded by a Redis key per record and parser
+version, taken when the task is queued and released when it finishes, so
+one record is never queued or ingested twice at the same time. The key
+expires a margin after the timeout of the ingesting cluster, the running
+task refreshes it with its progress (`ingest_heartbeat`). The key of a task
+killed by the timeout expires shortly after, and the record is queued again
+by `DOSPORTAL.tasks.recover_stale_ingests`.
+"""
+import functools
+
+import redis
+from django.conf import settings
+from django_q.tasks import async_task
+
+from .services.processing_progress import get_redis, publish_progress
+from .services.spectral_parser import PARSER_VERSION
+
+
+INGEST = None  # default cluster, interactive
+INGEST_LARGE = "ingest_large"
+DOSE = "dose"
+CARI = "cari"
+
+INGEST_LOCK_PREFIX = 'dosportal:ingest_lock'
+INGEST_LOCK_MARGIN = 60  # seconds an ingestion key outlives the timeout of its task
+
+
+def ingest_cluster(raw_size):
+    """Cluster ingesting a raw log of `raw_size` bytes."""
+    if raw_size and raw_size >= settings.SPECTRAL_LARGE_LOG_SIZE:
+        return INGEST_LARGE
+    return INGEST
+
+
+def _record_cluster(record):
+    return ingest_cluster(record.raw_file.size if record.raw_file else None)
+
+
+def schedule(func, *args, cluster=None, **kwargs):
+    """`async_task` on the given cluster (None is the default cluster)."""
+    if cluster is not None:
+        kwargs['cluster'] = cluster
+    return async_task(func, *args, **kwargs)
+
+
+def ingest_lock_ttl(cluster):
+    """Seconds the ingestion key of a task on `cluster` is kept without a refresh."""
+    conf = settings.Q_CLUSTER
+    if cluster is not None:
+        conf = {**conf, **conf['ALT_CLUSTERS'][cluster]}
+    return conf['timeout'] + INGEST_LOCK_MARGIN
+
+
+def _ingest_lock_key(record_id):
+    return f'{INGEST_LOCK_PREFIX}:{record_id}:{PARSER_VERSION}'
+
+
+def acquire_ingest_lock(record_id, ttl):
+    """
+    Take the ingestion key of a record, False when it is already queued or
+    running. Without Redis the task is scheduled anyway.
+    """
+    try:
+        return bool(get_redis().set(_ingest_lock_key(record_id), 1, nx=True, ex=ttl))
+    except redis.RedisError as e:
+        print(f"Ingestion lock of SpectralRecord {record_id} unavailable: {str(e)}")
+        return True
+
+
+def refresh_ingest_lock(record_id, ttl):
+    """Keep the ingestion key of a record for another `ttl` seconds."""
+    try:
+        get_redis().set(_ingest_lock_key(record_id), 1, ex=ttl)
+    except redis.RedisError as e:
+        print(f"Ingestion lock of SpectralRecord {record_id} not refreshed: {str(e)}")
+
+
+def ingest_heartbeat(record):
+    """Callable refreshing the ingestion key of `record`, called by its running task."""
+    return functools.partial(refresh_ingest_lock, record.id, ingest_lock_ttl(_record_cluster(record)))
+
+
+def queued_ingests(record_ids):
+    """Subset of `record_ids` whose ingestion is queued or running."""
+    record_ids = list(record_ids)
+    pipeline = get_redis().pipeline(transaction=False)
+    for record_id in record_ids:
+        pipeline.exists(_ingest_lock_key(record_id))
+    return {record_id for record_id, held in zip(record_ids, pipeline.execute()) if held}
+
+
+def release_ingest_lock(record_id):
+    try:
+        get_redis().delete(_ingest_lock_key(record_id))
+    except redis.RedisError as e:
+        print(f"Ingestion lock of SpectralRecord {record_id} not released: {str(e)}")
+
+
+def schedule_ingest(record):
+    """
+    Queue ingestion of `record`, unless it is already queued or running.
+    Returns the task id, None when skipped.
+    """
+    cluster = _record_cluster(record)
+    if not acquire_ingest_lock(record.id, ingest_lock_ttl(cluster)):
+        print(f"Ingestion of SpectralRecord {record.id} is already queued, not scheduled again")
+        return None
+
+    # a queued record must not report the progress of an earlier run
+    publish_progress(record.id, record.processing_status)
+    try:
+        return schedule(
+            'DOSPORTAL.tasks.process_spectral_record_into_spectral_file_async',
+            record.id,
+            cluster=cluster,
+        )
+    except Exception:
+        release_ingest_lock(record.id)
+        raise
+
+
+def schedule_dose(file_id):
+    return schedule('DOSPORTAL.tasks.process_record_entry', file_id, cluster=DOSE)
+
+
+def schedule_cari(flight):
+    return schedule('DOSPORTAL.tasks.process_flight_entry', flight, cluster=CARI)
@@ -2,9 +2,32 @@
 from .models import File
 from .models.spectrals import SpectralRecord, SpectralRecordArtifact
 from .helpers_cari import create_cari_input
-from django.core.files.base import ContentFile
-import io
+from .services.spectral_parser import (
+    PARSER_VERSION,
+    compact_channel_dtype,
+    chunk_size_for_budget,
+    iter_storage_chunks,
+    spill_candy_segments,
+    spill_candy_segments_parallel,
+    split_byte_ranges,
+)
+from .services.spectral_artifacts import write_spectral_parquet
+from .services.spectral_evolution import EvolutionPyramidBuilder
+from .services.spectral_index import CumulativeSpectrumBuilder
+from .services.spectral_telemetry import write_telemetry_parquet
+from .services.processing_stats import ProcessingStats
+from .services.ingest_checkpoint import IngestCheckpoint, byte_range_parts
+from .services.processing_progress import ProgressReporter, publish_progress
+from .services.result_cache import invalidate_record
+from .task_queues import ingest_heartbeat, queued_ingests, release_ingest_lock, schedule_ingest
+from django.core.files import File as DjangoFile
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+import hashlib
 import os
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 import json
@@ -103,127 +126,346 @@ def process_record_entry(pk):
     return dose_rate
 
 
-def process_spectral_record_into_spectral_file_async(spectral_record_id):
-    
-    print(f"creating spectral record artifact of type: {SpectralRecordArtifact.SPECTRAL_FILE}")
-    
-    def get_candy_line_lenght(file_obj):
-        file_obj.seek(0)
-        candy_line = None
-
-        for line in file_obj:
-            decoded = line.decode("utf-8").strip()
-            if decoded.startswith("$CANDY"):
-                candy_line = decoded
-                break
+def _hash_file(f, chunk_size=1024 * 1024):
+    f.seek(0)
+    content_hash = hashlib.sha256()
+    while chunk := f.read(chunk_size):
+        content_hash.update(chunk)
+    return content_hash.hexdigest(), f.tell()
+
+
+def _stream_generated_artifact(record, filename, artifact_type, write, stats, file_type=File.FILE_TYPE_PARQUET):
+    """
+    Create a generated artifact of `record`. `write(stream)` writes the
+    artifact content into a writable binary stream and returns its metadata.
+
+    S3 storages receive the content as a multipart upload while it is being
+    written, size and checksum are computed on the fly. Other storages get
+    it through a local temporary file. Writing is timed by the caller's
+    stages, finishing the upload as `upload` and the database rows as `db`.
+    """
+    field = File._meta.get_field('file')
+    artifact_file = File(
+        filename=filename,
+        file_type=file_type,
+        source_type="generated",
+        author=None,  # System generated
+        owner=record.owner,
+    )
+    name = field.storage.get_available_name(field.generate_filename(artifact_file, filename))
+
+    if hasattr(field.storage, 'open_multipart'):
+        stream = field.storage.open_multipart(name)
+        try:
+            metadata = write(stream)
+        except Exception:
+            stream.abort()
+            raise
+        with stats.stage('upload'):
+            stream.close()
+        content_hash, size = stream.content_hash, stream.size
+    else:
+        with tempfile.TemporaryFile() as stream:
+            metadata = write(stream)
+            with stats.stage('upload'):
+                content_hash, size = _hash_file(stream)
+                stream.seek(0)
+                name = field.storage.save(name, DjangoFile(stream))
+    stats.count('artifact_bytes', size)
+
+    with stats.stage('db'):
+        artifact_file.file.name = name
+        artifact_file.size = size
+        artifact_file.content_hash = content_hash
+        artifact_file.metadata = {'source_record_id': str(record.id), 'parser_version': PARSER_VERSION, **metadata}
+        artifact_file.save()
 
-        if candy_line is None:
-            raise ValueError("No $CANDY row found in file")
+        SpectralRecordArtifact.objects.create(
+            spectral_record=record,
+            artifact=artifact_file,
+            artifact_type=artifact_type,
+        )
+    return artifact_file
+
+
+# Artifacts created by the ingestion of a raw log
+INGESTION_ARTIFACT_TYPES = {
+    SpectralRecordArtifact.SPECTRAL_FILE,
+    SpectralRecordArtifact.EVOLUTION_PYRAMID,
+    SpectralRecordArtifact.SPECTRUM_INDEX,
+    SpectralRecordArtifact.TELEMETRY,
+}
+
+
+def _delete_artifact_file(artifact_file):
+    """
+    Delete an artifact File row. Its stored object is kept while any other
+    row (of a record which reused it) references the same name or content.
+    """
+    shared = Q(file=artifact_file.file.name)
+    if artifact_file.content_hash:
+        shared |= Q(content_hash=artifact_file.content_hash)
+    if not File.objects.filter(shared).exclude(id=artifact_file.id).exists():
+        artifact_file.file.delete(save=False)
+    artifact_file.delete()
+
+
+def _discard_partial_artifacts(record):
+    """
+    Remove artifacts left by an interrupted earlier attempt. Artifact files
+    of other records are only unlinked.
+    """
+    for artifact in record.artifacts.select_related('artifact'):
+        artifact_file = artifact.artifact
+        artifact.delete()
+        if artifact_file.metadata.get('source_record_id') != str(record.id):
+            continue
+        if not artifact_file.spectral_artifacts.exists():
+            _delete_artifact_file(artifact_file)
+
+
+def _reuse_existing_artifacts(record):
+    """
+    Reuse the artifacts of an already processed record (of any organization)
+    whose raw log has the same content hash and was ingested by the current
+    parser version. The record gets its own File rows, owned by its
+    organization, pointing at the stored objects of the source record.
+    Returns the source record, or None when nothing could be reused.
+    """
+    content_hash = record.raw_file.content_hash
+    if not content_hash:
+        return None
+
+    sources = SpectralRecord.objects.filter(
+        raw_file__content_hash=content_hash,
+        processing_status=SpectralRecord.PROCESSING_COMPLETED,
+    ).exclude(id=record.id).order_by('-created')
+
+    for source in sources:
+        artifacts = list(source.artifacts.select_related('artifact'))
+        if {artifact.artifact_type for artifact in artifacts} != INGESTION_ARTIFACT_TYPES:
+            continue
+        if any(artifact.artifact.metadata.get('parser_version') != PARSER_VERSION for artifact in artifacts):
+            continue
+
+        with transaction.atomic():
+            for artifact in artifacts:
+                source_file = artifact.artifact
+                artifact_file = File.objects.create(
+                    filename=source_file.filename,
+                    file=source_file.file.name,
+                    file_type=source_file.file_type,
+                    source_type=source_file.source_type,
+                    size=source_file.size,
+                    content_hash=source_file.content_hash,
+                    owner=record.owner,
+                    metadata={
+                        **source_file.metadata,
+                        'source_record_id': str(record.id),
+                        'reused_from_file_id': str(source_file.id),
+                    },
+                )
+                SpectralRecordArtifact.objects.create(
+                    spectral_record=record,
+                    artifact=artifact_file,
+                    artifact_type=artifact.artifact_type,
+                )
+        return source
+    return None
 
-        num_columns = len(candy_line.split(","))
-        file_obj.seek(0)
 
-        return num_columns
+def process_spectral_record_into_spectral_file_async(spectral_record_id):
+    
+    print(f"creating spectral record artifact of type: {SpectralRecordArtifact.SPECTRAL_FILE}")
+    stats = ProcessingStats()
+    progress = ProgressReporter(spectral_record_id)
 
     try:
-        record = SpectralRecord.objects.get(id=spectral_record_id)
-        print(f"Processing SpectralRecord {record.id}")
-        
-        record.processing_status = SpectralRecord.PROCESSING_IN_PROGRESS
-        record.save(update_fields=['processing_status'])
-        
-        # Get raw file
-        if not record.raw_file or record.raw_file.file_type != File.FILE_TYPE_LOG:
-            raise ValueError("No valid raw log file found")
-        
+        with stats.stage('db'):
+            record = SpectralRecord.objects.get(id=spectral_record_id)
+            print(f"Processing SpectralRecord {record.id}")
+
+            record.processing_status = SpectralRecord.PROCESSING_IN_PROGRESS
+            record.save(update_fields=['processing_status'])
+            # the ingestion key may have expired while the task was queued, it is kept while it runs
+            progress.heartbeat = ingest_heartbeat(record)
+            progress.update('parse')
+
+            # Get raw file
+            if not record.raw_file or record.raw_file.file_type != File.FILE_TYPE_LOG:
+                raise ValueError("No valid raw log file found")
+
+            _discard_partial_artifacts(record)
+
+            source = _reuse_existing_artifacts(record)
+            if source is not None:
+                record.metadata = record.metadata or {}
+                record.metadata['artifacts_reused_from'] = str(source.id)
+                record.metadata.pop('ingest_recoveries', None)
+                record.processing_status = SpectralRecord.PROCESSING_COMPLETED
+                record.processing_stats = stats.as_dict()
+                record.save(update_fields=['processing_status', 'metadata', 'processing_stats'])
+                progress.finish(record.processing_status)
+                print(f"SpectralRecord {record.id} has the same raw log as {source.id}, artifacts reused")
+                return
+
         print(f"Processing file from S3: {record.raw_file.filename}")
-        
-        num_columns = get_candy_line_lenght(record.raw_file.file)
-
-        df_log_raw = pd.read_csv(
-            record.raw_file.file,
-            sep=',',
-            header=None,
-            names=range(num_columns),
-            on_bad_lines='skip'
-        )
-        
-        record.raw_file.file.close()
-        
-        print(f"Loaded {len(df_log_raw)} rows from S3")
-        
-        df_candy = df_log_raw[df_log_raw[0] == '$CANDY']
-        
-        print(f"df_candy: {df_candy}")
 
-        if df_candy.empty:
-            raise ValueError("No $CANDY data found in log file")
-            
-        print(f"Found {len(df_candy)} CANDY entries")
-        
-        # Extract data
-        time_col = df_candy[2].astype(float)
-        particle_col = df_candy[3].astype(float)
-        spectrum_channels = df_candy.iloc[:, 10:].fillna(0).astype(int)
-        
-        df_to_save = pd.DataFrame({
-            'id': range(len(df_candy)),
-            'time_ms': time_col.values,
-            'particle_count': particle_col.values
-        })
-        
-        # Add spectrum channels as columns
-        channel_names = [f'channel_{i}' for i in spectrum_channels.columns]
-        spectrum_channels.columns = channel_names
-        df_to_save = pd.concat([df_to_save, spectrum_channels], axis=1)
-        
-        # Normalize time to start from 0
-        df_to_save['time_ms'] = df_to_save['time_ms'] - df_to_save['time_ms'].min()
-        
-        print(f"Created wide DataFrame: {df_to_save.shape[0]} records x {df_to_save.shape[1]} columns")
-        print(f"Time range: {df_to_save['time_ms'].min():.1f} - {df_to_save['time_ms'].max():.1f} ms")
-        print(f"Channels: {len(channel_names)}")
-        
-        # Save as Parquet
-        parquet_buffer = io.BytesIO()
-        df_to_save.to_parquet(parquet_buffer, engine='fastparquet', index=False)
-        parquet_buffer.seek(0)
-        
-        # Create File instance for Parquet
-        spectral_file = File.objects.create(
-            filename=f"spectral_{record.id}.parquet",
-            file_type=File.FILE_TYPE_PARQUET,
-            source_type="generated",
-            author=None,  # System generated
-            owner=record.owner,
-            metadata={
-                'source_record_id': str(record.id),
-                'data_type': 'spectral_parquet_wide',
-                'records_count': len(df_to_save),
-                'channels_count': len(channel_names),
-                'time_range_ms': [float(df_to_save['time_ms'].min()), float(df_to_save['time_ms'].max())],
-                'channel_columns': channel_names
-            }
-        )
-        
-        spectral_file.file.save(
-            f"spectral_{record.id}.parquet",
-            ContentFile(parquet_buffer.read()),
-            save=True
-        )
-        
-        print(f"Parquet file saved to S3: {spectral_file.file.name}")
-        
-        SpectralRecordArtifact.objects.create(
-            spectral_record=record,
-            artifact=spectral_file,
-            artifact_type=SpectralRecordArtifact.SPECTRAL_FILE
-        )
-        
-        record.processing_status = SpectralRecord.PROCESSING_COMPLETED
-        record.save(update_fields=['processing_status'])
+        with tempfile.TemporaryDirectory(prefix=f"spectral_{record.id}_") as workdir:
+            # Single streaming pass over the raw log, parsed chunks above the memory
+            # budget are spilled to disk. Large logs are split into byte ranges
+            # parsed by a process pool sharing the budget.
+            raw_size = record.raw_file.size or record.raw_file.file.size
+            memory_budget = settings.SPECTRAL_MEMORY_BUDGET
+            workers = settings.SPECTRAL_PARSER_WORKERS
+            # Parsed segments are checkpointed to storage, a recovered task resumes
+            # from the last checkpoint instead of byte zero
+            raw_storage = record.raw_file.file.storage
+            interval = settings.SPECTRAL_CHECKPOINT_INTERVAL
+            checkpoint = IngestCheckpoint(record, raw_storage, workdir, interval)
+            parallel = workers > 1 and raw_size >= settings.SPECTRAL_PARALLEL_MIN_SIZE
+            resumed, offset, parsed_ranges = None, 0, {}
+            with stats.stage('fetch'):
+                if parallel:
+                    # byte ranges are checkpointed as they are parsed
+                    parts = byte_range_parts(raw_size, workers, interval)
+                    parsed_ranges = checkpoint.resume_ranges(parts)
+                else:
+                    resumed, offset = checkpoint.resume()
+            if resumed is not None:
+                print(f"Resuming from checkpoint at byte {offset} with {resumed['rows']} CANDY entries")
+                stats.count('resumed_from_byte', offset)
+            if parsed_ranges:
+                print(f"Resuming from checkpoint with {len(parsed_ranges)}/{parts} byte ranges parsed")
+                stats.count('resumed_ranges', len(parsed_ranges))
+
+            with stats.stage('parse'):
+                if parallel:
+                    print(f"Parsing {raw_size} bytes in {parts} byte ranges by {workers} processes")
+                    # S3 reads happen inside the workers and are part of `parse`
+                    summary = spill_candy_segments_parallel(
+                        record.raw_file.file.storage, record.raw_file.file.name, raw_size, workdir, workers,
+                        chunk_size=chunk_size_for_budget(memory_budget // workers),
+                        parts=parts,
+                        done=parsed_ranges,
+                        on_range=progress.ranges_callback(
+                            'parse', split_byte_ranges(raw_size, parts), parsed_ranges, checkpoint.range_parsed
+                        ),
+                    )
+                    stats.count('raw_bytes', raw_size)
+                    stats.count('parser_workers', workers)
+                else:
+                    chunks = iter_storage_chunks(
+                        raw_storage, record.raw_file.file.name, chunk_size_for_budget(memory_budget), start=offset
+                    )
+                    summary = spill_candy_segments(
+                        progress.iter_bytes(stats.timed_iter(chunks, 'fetch', count='raw_bytes'), 'parse', raw_size, offset),
+                        workdir,
+                        memory_budget=memory_budget,
+                        start=offset,
+                        summary=resumed,
+                        on_segment=checkpoint,
+                    )
+                    stats.count('parser_workers', 1)
+            stats.count('rows', summary['rows'])
+            stats.count('channels', summary['channels'])
+            stats.count('segments', len(summary['segments']))
+
+            if summary['rows'] == 0:
+                raise ValueError("No $CANDY data found in log file")
+
+            print(f"Found {summary['rows']} CANDY entries in {len(summary['segments'])} chunks")
+
+            pyramid = EvolutionPyramidBuilder(settings.SPECTRAL_EVOLUTION_LEVELS_MS)
+            index_path = os.path.join(workdir, f"spectrum_index_{record.id}.npy")
+            spectrum_index = CumulativeSpectrumBuilder(
+                index_path, summary['rows'], summary['channels'], compact_channel_dtype(summary['max_count'])
+            )
+            time_range = [0.0, summary['time_max'] - summary['time_min']]
+
+            # Row groups are uploaded while the following ones are encoded.
+            # Derived artifacts are fed in the same pass, their share is part of `encode`.
+            def write_spectral_file(stream):
+                with stats.stage('encode'):
+                    layout = write_spectral_parquet(
+                        summary,
+                        stream,
+                        consumers=[pyramid, spectrum_index, progress.rows_consumer('encode', summary['rows'])],
+                        memory_budget=memory_budget,
+                        channels_path=os.path.join(workdir, 'channels.npy'),
+                    )
+                print(f"Created matrix Parquet: {summary['rows']} records x {layout['channels_count']} channels ({layout['channel_dtype']})")
+                print(f"Time range: {time_range[0]:.1f} - {time_range[1]:.1f} ms")
+                return {
+                    'data_type': 'spectral_parquet_matrix',
+                    'records_count': summary['rows'],
+                    'time_range_ms': time_range,
+                    **layout,
+                }
+
+            spectral_file = _stream_generated_artifact(
+                record, f"spectral_{record.id}.parquet", SpectralRecordArtifact.SPECTRAL_FILE, write_spectral_file, stats
+            )
+            print(f"Parquet file saved to S3: {spectral_file.file.name}")
+
+            # Pre-aggregated count rate evolution, built in the same pass
+            def write_evolution(stream):
+                progress.update('transform')
+                with stats.stage('transform'):
+                    return {'data_type': 'evolution_pyramid', **pyramid.write(stream)}
+
+            evolution_file = _stream_generated_artifact(
+                record, f"evolution_{record.id}.parquet", SpectralRecordArtifact.EVOLUTION_PYRAMID, write_evolution, stats
+            )
+            print(f"Evolution pyramid saved to S3: {evolution_file.file.name}")
+
+            # Cumulative spectra for spectra of arbitrary time windows, written
+            # out of order locally and uploaded once complete
+            def write_spectrum_index(stream):
+                progress.update('transform', 0.5)
+                with stats.stage('transform'):
+                    metadata = spectrum_index.close()
+                    with open(index_path, 'rb') as index_file:
+                        shutil.copyfileobj(index_file, stream, 1024 * 1024)
+                return {
+                    'data_type': 'cumulative_spectrum',
+                    'first_channel': spectral_file.metadata['first_channel'],
+                    **metadata,
+                }
+
+            index_file = _stream_generated_artifact(
+                record,
+                f"spectrum_index_{record.id}.npy",
+                SpectralRecordArtifact.SPECTRUM_INDEX,
+                write_spectrum_index,
+                stats,
+                file_type=File.FILE_TYPE_OTHER,
+            )
+            print(f"Spectrum index saved to S3: {index_file.file.name}")
+
+            # Auxiliary $CANDY fields and telemetry sentences from the same parse
+            def write_telemetry(stream):
+                progress.update('transform', 0.75)
+                with stats.stage('transform'):
+                    return {'data_type': 'telemetry', **write_telemetry_parquet(summary, stream)}
+
+            telemetry_file = _stream_generated_artifact(
+                record, f"telemetry_{record.id}.parquet", SpectralRecordArtifact.TELEMETRY, write_telemetry, stats
+            )
+            print(f"Telemetry saved to S3: {telemetry_file.file.name}")
+
+            checkpoint.clear()
+
+        with stats.stage('db'):
+            record.processing_status = SpectralRecord.PROCESSING_COMPLETED
+            record.processing_stats = stats.as_dict()
+            record.metadata = record.metadata or {}
+            record.metadata.pop('ingest_recoveries', None)
+            record.save(update_fields=['processing_status', 'metadata', 'processing_stats'])
+        progress.finish(record.processing_status)
         
         print(f"SpectralRecord {record.id} processed successfully - Parquet artifact created: {spectral_file.id}")
+        print(f"Processing stats: {record.processing_stats}")
         
     except Exception as e:
         import traceback
@@ -235,14 +477,57 @@ def process_spectral_record_into_spectral_file_async(spectral_record_id):
             record.processing_status = SpectralRecord.PROCESSING_FAILED
             record.metadata = record.metadata or {}
             record.metadata['processing_error'] = str(e)
-            record.save(update_fields=['processing_status', 'metadata'])
+            record.metadata.pop('ingest_recoveries', None)
+            record.processing_stats = stats.as_dict()
+            record.save(update_fields=['processing_status', 'metadata', 'processing_stats'])
+            progress.finish(record.processing_status)
         except Exception as e:
             print(f"Error processing SpectralRecord {spectral_record_id}: Record might not exist. Details: {str(e)}")
 
         
         raise
 
-
-
-
-
+    finally:
+        # the record may be queued again, responses derived from its previous artifacts are stale
+        release_ingest_lock(spectral_record_id)
+        invalidate_record(spectral_record_id)
+
+
+def recover_stale_ingests():
+    """
+    Queue again ingestions which stopped without finishing their record.
+
+    The Redis broker does not acknowledge tasks: a task killed by the cluster
+    timeout (or together with its worker) is never delivered again, and its
+    `finally` does not run, so the record stays `processing`. Records in that
+    state whose ingestion key has expired are queued again and resume from
+    their checkpoint, up to SPECTRAL_INGEST_MAX_RECOVERIES times before they
+    are marked failed. Scheduled periodically by `init_dosportal`.
+    Returns the number of records queued again.
+    """
+    records = SpectralRecord.objects.filter(processing_status=SpectralRecord.PROCESSING_IN_PROGRESS)
+    record_ids = list(records.values_list('id', flat=True))
+    if not record_ids:
+        return 0
+    running = queued_ingests(record_ids)
+
+    recovered = 0
+    for record in records.filter(id__in=set(record_ids) - running).select_related('raw_file'):
+        record.metadata = record.metadata or {}
+        recoveries = record.metadata.get('ingest_recoveries', 0)
+        if recoveries >= settings.SPECTRAL_INGEST_MAX_RECOVERIES:
+            print(f"Ingestion of SpectralRecord {record.id} was interrupted {recoveries + 1} times, giving up")
+            record.processing_status = SpectralRecord.PROCESSING_FAILED
+            record.metadata['processing_error'] = f"Ingestion was interrupted {recoveries + 1} times"
+            record.metadata.pop('ingest_recoveries', None)
+            record.save(update_fields=['processing_status', 'metadata'])
+            publish_progress(record.id, record.processing_status)
+            invalidate_record(record.id)
+            continue
+
+        record.metadata['ingest_recoveries'] = recoveries + 1
+        record.save(update_fields=['metadata'])
+        if schedule_ingest(record) is not None:
+            print(f"Ingestion of SpectralRecord {record.id} was interrupted, queued again")
+            recovered += 1
+    return recovered
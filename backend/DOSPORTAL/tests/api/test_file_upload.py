@@ -1,5 +1,7 @@
 """Tests for file upload API."""
 
+import hashlib
+
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
@@ -109,6 +111,41 @@ class TestFileUploadAPI:
         file_obj = File.objects.get(id=response.data['id'])
         assert file_obj.author == owner_user
         assert file_obj.owner is None
+
+    def test_upload_stores_content_hash(self, api_client, owner_user):
+        api_client.force_authenticate(user=owner_user)
+        file_content = SimpleUploadedFile("test.txt", b"test content", content_type="text/plain")
+
+        response = api_client.post(
+            '/api/file/upload/',
+            {'filename': 'test.txt', 'file': file_content, 'file_type': 'log'},
+            format='multipart'
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        file_obj = File.objects.get(id=response.data['id'])
+        assert file_obj.content_hash == hashlib.sha256(b"test content").hexdigest()
+
+    def test_upload_extracts_log_metadata(self, api_client, owner_user):
+        api_client.force_authenticate(user=owner_user)
+        log = (
+            b"$DOS,AIRDOS04,F4,256,f157c1d,origin,1290c00806a2\n"
+            b"$CANDY,1,1000,5,7,0,0,0,0,1,1,2,3\n"
+            b"$CANDY,2,11000,5,7,0,0,0,0,1,1,2,3\n"
+        )
+        file_content = SimpleUploadedFile("record.log", log, content_type="text/plain")
+
+        response = api_client.post(
+            '/api/file/upload/',
+            {'filename': 'record.log', 'file': file_content, 'file_type': 'log'},
+            format='multipart'
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        log_metadata = File.objects.get(id=response.data['id']).metadata['log']
+        assert log_metadata['detector_type'] == 'AIRDOS04'
+        assert log_metadata['duration_ms'] == 10000.0
+        assert log_metadata['exposures_estimate'] == 2
     
     def test_owner_can_upload_to_organization(self, api_client, owner_user, org_with_members):
         api_client.force_authenticate(user=owner_user)
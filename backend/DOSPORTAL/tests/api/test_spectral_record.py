@@ -1,16 +1,37 @@
 """Tests for SpectralRecord API endpoints."""
 
-import pytest
-import tempfile
+import io
+import json
 import os
+import struct
+import tempfile
+import uuid
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.files.base import ContentFile
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth.models import User
 
+from DOSPORTAL import task_queues
 from DOSPORTAL.models import File, Organization, OrganizationUser
 from DOSPORTAL.models.spectrals import SpectralRecord, SpectralRecordArtifact
+from DOSPORTAL.services import processing_progress
+from DOSPORTAL.services.spectral_parser import PARSER_VERSION, spill_candy_segments
+from DOSPORTAL.services.spectral_telemetry import write_telemetry_parquet
+from DOSPORTAL.task_queues import acquire_ingest_lock
+from DOSPORTAL.tasks import (
+    INGESTION_ARTIFACT_TYPES,
+    _discard_partial_artifacts,
+    _reuse_existing_artifacts,
+    recover_stale_ingests,
+)
 
 
 @pytest.fixture
@@ -108,7 +129,6 @@ def log_file(db, organization, sample_candy_log):
 
 @pytest.fixture
 def spectral_record(db, log_file, user_with_org, organization):
-    from django.utils import timezone
     
     return SpectralRecord.objects.create(
         name='Test Spectral Record',
@@ -123,8 +143,6 @@ def spectral_record(db, log_file, user_with_org, organization):
 
 @pytest.fixture
 def completed_spectral_record_with_artifact(db, spectral_record):
-    import pandas as pd
-    import uuid
     
     data = {
         'id': [0, 1, 2],
@@ -204,7 +222,6 @@ class TestSpectralRecordListEndpoint:
         assert response.data[0]['artifacts_count'] == 0
     
     def test_list_multiple_records(self, api_client, user_with_org, log_file, organization):
-        from django.utils import timezone
         
         api_client.force_authenticate(user=user_with_org)
         
@@ -230,7 +247,6 @@ class TestSpectralRecordListEndpoint:
         assert SpectralRecord.PROCESSING_COMPLETED in statuses
     
     def test_owner_field_returns_spectral_record_owner_name(self, api_client, user_with_org, organization, sample_candy_log):
-        from django.utils import timezone
         
         api_client.force_authenticate(user=user_with_org)
         
@@ -261,7 +277,6 @@ class TestSpectralRecordListEndpoint:
         assert record_data['owner'] == organization.name
     
     def test_owner_field_null_when_no_spectral_record_owner(self, api_client, user_with_org, sample_candy_log):
-        from django.utils import timezone
         
         api_client.force_authenticate(user=user_with_org)
         
@@ -321,7 +336,24 @@ class TestSpectralRecordCreateEndpoint:
         assert record.raw_file == log_file
         assert record.author == user_with_org
         assert record.owner == log_file.owner
-    
+
+    def test_create_when_stored_log_metadata_unreadable(self, api_client, user_with_org, log_file, monkeypatch):
+        # uploaded before metadata was extracted, reading the stored log fails
+        log_file.metadata = {}
+        log_file.save(update_fields=['metadata'])
+
+        def unreadable(field_file):
+            raise OSError('storage unavailable')
+        monkeypatch.setattr('api.views.spectrals.read_stored_log_metadata', unreadable)
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.post('/api/spectral-record/create/', {'name': 'Old upload', 'raw_file_id': str(log_file.id)})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['log_metadata'] is None
+        record = SpectralRecord.objects.get(id=response.data['id'])
+        assert record.record_duration is None
+
     def test_create_missing_file_id(self, api_client, user_with_org):
         api_client.force_authenticate(user=user_with_org)
         
@@ -335,7 +367,6 @@ class TestSpectralRecordCreateEndpoint:
     def test_create_invalid_file_id(self, api_client, user_with_org):
         api_client.force_authenticate(user=user_with_org)
         
-        from uuid import uuid4
         data = {'name': 'Test Record', 'raw_file_id': str(uuid4())}
         
         response = api_client.post('/api/spectral-record/create/', data)
@@ -374,6 +405,41 @@ class TestSpectralRecordCreateEndpoint:
 
 
 
+@pytest.mark.django_db
+class TestSpectralRecordStatusEndpoint:
+
+    def test_status_requires_authentication(self, api_client, spectral_record):
+        response = api_client.get(f'/api/spectral-record/{spectral_record.id}/status/')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_status_falls_back_to_database(self, api_client, spectral_record, user_with_org, monkeypatch):
+        monkeypatch.setattr('api.views.spectrals.read_progress', lambda record_id: None)
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(f'/api/spectral-record/{spectral_record.id}/status/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['processing_status'] == spectral_record.processing_status
+        assert response.data['percent'] is None
+
+    def test_status_waits_for_progress(self, api_client, spectral_record, user_with_org, monkeypatch):
+        calls = []
+
+        def wait_for_progress(record_id, since, timeout):
+            calls.append((since, timeout))
+            return {'processing_status': 'processing', 'stage': 'parse', 'percent': 42, 'updated': since + 1}
+
+        monkeypatch.setattr('api.views.spectrals.wait_for_progress', wait_for_progress)
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(f'/api/spectral-record/{spectral_record.id}/status/?wait=600&since=10')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['percent'] == 42
+        assert calls == [(10.0, 25.0)]
+
+    def test_status_permission_denied(self, api_client, spectral_record, outsider_user):
+        api_client.force_authenticate(user=outsider_user)
+        response = api_client.get(f'/api/spectral-record/{spectral_record.id}/status/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 @pytest.mark.django_db
 class TestSpectralRecordEvolutionEndpoint:
 
@@ -399,8 +465,77 @@ class TestSpectralRecordEvolutionEndpoint:
             assert isinstance(point[0], float)
             assert isinstance(point[1], float)
 
+    def test_evolution_shared_through_result_cache(self, api_client, completed_spectral_record_with_artifact, user_with_org, monkeypatch):
+        record = completed_spectral_record_with_artifact
+        cache = {}
+        monkeypatch.setattr('api.views.spectrals.get_result', cache.get)
+        monkeypatch.setattr('api.views.spectrals.store_result', lambda record_id, key, content: cache.update({key: content}))
+        api_client.force_authenticate(user=user_with_org)
+
+        computed = api_client.get(f'/api/spectral-record/{record.id}/evolution/')
+        assert len(cache) == 1
+
+        # served without reading the artifact
+        monkeypatch.setattr('api.views.spectrals.open_artifact', None)
+        cached = api_client.get(f'/api/spectral-record/{record.id}/evolution/')
+        assert cached.status_code == status.HTTP_200_OK
+        assert cached.json() == computed.json()
+
+    def test_evolution_channel_window(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(f'/api/spectral-record/{record.id}/evolution/?channel_from=3&channel_to=5')
+
+        assert response.status_code == status.HTTP_200_OK
+        exposure_s = response.data['exposure_ms'] / 1000
+        assert [round(cps * exposure_s) for _, cps in response.data['evolution_values']] == [1, 8, 0]
+
+    def test_evolution_cps_independent_of_time_window(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        whole = api_client.get(f'/api/spectral-record/{record.id}/evolution/')
+        window = api_client.get(f'/api/spectral-record/{record.id}/evolution/?time_from=20&time_to=40')
+
+        assert window.status_code == status.HTTP_200_OK
+        # median of the 11 and 12 ms between the exposures
+        assert whole.data['exposure_ms'] == window.data['exposure_ms'] == 11.5
+        assert dict(window.data['evolution_values'])[21] == dict(whole.data['evolution_values'])[21]
+
+    def test_evolution_absolute_time_window(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        record.time_tracked = True
+        record.save()
+        start = record.time_start.timestamp() * 1000
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(
+            f'/api/spectral-record/{record.id}/evolution/?time_base=absolute&time_from={start + 20}&time_to={start + 40}'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [time for time, _ in response.data['evolution_values']] == [start + 21, start + 33]
+
+    def test_evolution_downsampled_to_max_points(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(f'/api/spectral-record/{record.id}/evolution/?max_points=2&downsample=minmax')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['downsampling'] == 'minmax'
+        assert len(response.data['evolution_values']) <= 2
+
+    def test_evolution_unknown_downsampling(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(f'/api/spectral-record/{record.id}/evolution/?downsample=average')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_evolution_record_not_found(self, api_client, user_with_org):
-        from uuid import uuid4
         api_client.force_authenticate(user=user_with_org)
         response = api_client.get(f'/api/spectral-record/{uuid4()}/evolution/')
         assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -444,8 +579,79 @@ class TestSpectralRecordSpectrumEndpoint:
             assert isinstance(point[0], (int, float))
             assert isinstance(point[1], float)
 
+    def test_spectrum_channel_window(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(f'/api/spectral-record/{record.id}/spectrum/?channel_from=1&channel_to=3')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [point[0] for point in response.data['spectrum_values']] == [1, 2, 3]
+
+    def test_spectrum_energy_window_requires_calibration(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(f'/api/spectral-record/{record.id}/spectrum/?energy_from=10')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_spectrum_absolute_time_requires_time_tracking(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(f'/api/spectral-record/{record.id}/spectrum/?time_base=absolute&time_from=0')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_spectrum_binary_columns(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        json_response = api_client.get(f'/api/spectral-record/{record.id}/spectrum/')
+        response = api_client.get(
+            f'/api/spectral-record/{record.id}/spectrum/', HTTP_ACCEPT='application/x-dosportal-columns'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/x-dosportal-columns'
+        content = response.content
+        assert content[:4] == b'DOSC'
+        header_length = struct.unpack('<I', content[4:8])[0]
+        header = json.loads(content[8:8 + header_length])
+        assert header['meta']['calib'] is False
+        columns = {
+            column['name']: np.frombuffer(content, column['dtype'], column['length'], 8 + header_length + column['offset'])
+            for column in header['columns']
+        }
+        np.testing.assert_allclose(columns['cps'], [cps for _, cps in json_response.data['spectrum_values']], rtol=1e-6)
+
+    def test_spectrum_arrow_stream(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+
+        record = completed_spectral_record_with_artifact
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(
+            f'/api/spectral-record/{record.id}/spectrum/', HTTP_ACCEPT='application/vnd.apache.arrow.stream'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.column_names == ['x', 'cps']
+        assert table.num_rows == 10
+
+    def test_spectrum_binary_errors_are_json(self, api_client, spectral_record, user_with_org):
+        api_client.force_authenticate(user=user_with_org)
+
+        response = api_client.get(
+            f'/api/spectral-record/{spectral_record.id}/spectrum/', HTTP_ACCEPT='application/x-dosportal-columns'
+        )
+
+        assert response.status_code == status.HTTP_425_TOO_EARLY
+        assert response['Content-Type'] == 'application/json'
+
     def test_spectrum_record_not_found(self, api_client, user_with_org):
-        from uuid import uuid4
         api_client.force_authenticate(user=user_with_org)
         response = api_client.get(f'/api/spectral-record/{uuid4()}/spectrum/')
         assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -460,3 +666,220 @@ class TestSpectralRecordSpectrumEndpoint:
         api_client.force_authenticate(user=outsider_user)
         response = api_client.get(f'/api/spectral-record/{record.id}/spectrum/')
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestSpectralRecordTelemetryEndpoint:
+
+    @pytest.fixture
+    def telemetry_record(self, completed_spectral_record_with_artifact, tmp_path):
+
+        record = completed_spectral_record_with_artifact
+        log = b"$CANDY,0,1000,5,7,0,0,0,0,1,1,2\n$HOUSE,0,23.5,1013.2\n$CANDY,1,2000,6,8,0,0,0,0,2,4,5\n"
+        summary = spill_candy_segments([log], str(tmp_path))
+        stream = io.BytesIO()
+        metadata = write_telemetry_parquet(summary, stream)
+
+        artifact_file = File.objects.create(
+            filename=f'telemetry_{record.id}.parquet',
+            file=ContentFile(stream.getvalue(), name=f'telemetry_{record.id}.parquet'),
+            file_type=File.FILE_TYPE_PARQUET,
+            owner=record.owner,
+            source_type="generated",
+            metadata={'data_type': 'telemetry', **metadata},
+        )
+        SpectralRecordArtifact.objects.create(
+            spectral_record=record,
+            artifact_type=SpectralRecordArtifact.TELEMETRY,
+            artifact=artifact_file,
+        )
+        return record
+
+    def test_telemetry_lists_sentences(self, api_client, telemetry_record, user_with_org):
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(f'/api/spectral-record/{telemetry_record.id}/telemetry/')
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data['sentences']) == {'CANDY', 'HOUSE'}
+
+    def test_telemetry_reads_requested_fields(self, api_client, telemetry_record, user_with_org):
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(
+            f'/api/spectral-record/{telemetry_record.id}/telemetry/?sentence=HOUSE&fields=field_2,field_3'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['time_ms'] == [0.0]
+        assert response.data['fields'] == {'field_2': [23.5], 'field_3': [1013.2]}
+
+    def test_telemetry_unknown_field(self, api_client, telemetry_record, user_with_org):
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(f'/api/spectral-record/{telemetry_record.id}/telemetry/?sentence=HOUSE&fields=field_99')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_telemetry_artifact_missing(self, api_client, completed_spectral_record_with_artifact, user_with_org):
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(f'/api/spectral-record/{completed_spectral_record_with_artifact.id}/telemetry/')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_telemetry_processing_not_completed(self, api_client, spectral_record, user_with_org):
+        api_client.force_authenticate(user=user_with_org)
+        response = api_client.get(f'/api/spectral-record/{spectral_record.id}/telemetry/')
+        assert response.status_code == status.HTTP_425_TOO_EARLY
+
+
+@pytest.mark.django_db
+class TestSpectralArtifactReuse:
+
+    def make_processed_record(self, user, organization, content_hash, parser_version):
+        raw_file = File.objects.create(
+            filename='raw.log',
+            file=ContentFile(b'$CANDY,0,10,1,1,256,0,0,0,0,5\n', name='raw.log'),
+            file_type=File.FILE_TYPE_LOG,
+            owner=organization,
+            content_hash=content_hash,
+        )
+        record = SpectralRecord.objects.create(
+            name='Processed record',
+            raw_file=raw_file,
+            author=user,
+            owner=organization,
+            processing_status=SpectralRecord.PROCESSING_COMPLETED,
+        )
+        for artifact_type in INGESTION_ARTIFACT_TYPES:
+            artifact_file = File.objects.create(
+                filename=f'{artifact_type}.parquet',
+                file=ContentFile(b'artifact', name=f'{artifact_type}.parquet'),
+                file_type=File.FILE_TYPE_PARQUET,
+                source_type='generated',
+                metadata={'parser_version': parser_version},
+            )
+            SpectralRecordArtifact.objects.create(
+                spectral_record=record,
+                artifact=artifact_file,
+                artifact_type=artifact_type,
+            )
+        return record
+
+    def test_same_content_reuses_artifacts(self, user_with_org, organization, spectral_record):
+        spectral_record.raw_file.content_hash = 'a' * 64
+        spectral_record.raw_file.save()
+        source = self.make_processed_record(user_with_org, organization, 'a' * 64, PARSER_VERSION)
+
+        assert _reuse_existing_artifacts(spectral_record) == source
+
+        reused = {artifact.artifact.file.name for artifact in spectral_record.artifacts.select_related('artifact')}
+        assert reused == {artifact.artifact.file.name for artifact in source.artifacts.select_related('artifact')}
+
+    def test_records_of_other_organizations_get_own_file_rows(self, user_with_org, spectral_record):
+        spectral_record.raw_file.content_hash = 'a' * 64
+        spectral_record.raw_file.save()
+        other_organization = Organization.objects.create(name='Other Organization', slug='other-org')
+        source = self.make_processed_record(user_with_org, other_organization, 'a' * 64, PARSER_VERSION)
+
+        assert _reuse_existing_artifacts(spectral_record) == source
+
+        artifact_files = [artifact.artifact for artifact in spectral_record.artifacts.select_related('artifact')]
+        assert len(artifact_files) == len(INGESTION_ARTIFACT_TYPES)
+        source_ids = set(source.artifacts.values_list('artifact_id', flat=True))
+        for artifact_file in artifact_files:
+            assert artifact_file.id not in source_ids
+            assert artifact_file.owner == spectral_record.owner
+            assert artifact_file.metadata['source_record_id'] == str(spectral_record.id)
+
+    def test_discarding_reused_artifacts_keeps_stored_objects(self, user_with_org, spectral_record):
+        spectral_record.raw_file.content_hash = 'a' * 64
+        spectral_record.raw_file.save()
+        other_organization = Organization.objects.create(name='Other Organization', slug='other-org')
+        source = self.make_processed_record(user_with_org, other_organization, 'a' * 64, PARSER_VERSION)
+        _reuse_existing_artifacts(spectral_record)
+        reused_ids = set(spectral_record.artifacts.values_list('artifact_id', flat=True))
+
+        _discard_partial_artifacts(spectral_record)
+
+        assert not File.objects.filter(id__in=reused_ids).exists()
+        for artifact in source.artifacts.select_related('artifact'):
+            assert artifact.artifact.file.storage.exists(artifact.artifact.file.name)
+
+    def test_other_parser_version_is_not_reused(self, user_with_org, organization, spectral_record):
+        spectral_record.raw_file.content_hash = 'a' * 64
+        spectral_record.raw_file.save()
+        self.make_processed_record(user_with_org, organization, 'a' * 64, PARSER_VERSION - 1)
+
+        assert _reuse_existing_artifacts(spectral_record) is None
+        assert spectral_record.artifacts.count() == 0
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def publish(self, channel, message):
+        pass
+
+    def smembers(self, key):
+        return set()
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def exists(self, key):
+        self.commands.append(key in self.data)
+
+    def execute(self):
+        results, self.commands = self.commands, []
+        return results
+
+
+@pytest.mark.django_db
+class TestRecoverStaleIngests:
+
+    @pytest.fixture
+    def queued(self, monkeypatch):
+        queued = []
+        monkeypatch.setattr(processing_progress, '_client', FakeRedis())
+        monkeypatch.setattr(task_queues, 'async_task', lambda func, *args, **kwargs: queued.append(args[0]) or 'task')
+        return queued
+
+    def test_interrupted_ingestion_is_queued_again(self, spectral_record, queued):
+        spectral_record.processing_status = SpectralRecord.PROCESSING_IN_PROGRESS
+        spectral_record.save()
+
+        assert recover_stale_ingests() == 1
+        assert queued == [spectral_record.id]
+        spectral_record.refresh_from_db()
+        assert spectral_record.metadata['ingest_recoveries'] == 1
+
+        # queued again, its ingestion key is held until the task finishes
+        assert recover_stale_ingests() == 0
+        assert queued == [spectral_record.id]
+
+    def test_running_ingestion_is_left_alone(self, spectral_record, queued):
+        spectral_record.processing_status = SpectralRecord.PROCESSING_IN_PROGRESS
+        spectral_record.save()
+        assert acquire_ingest_lock(spectral_record.id, 60)
+
+        assert recover_stale_ingests() == 0
+        assert queued == []
+
+    def test_repeatedly_interrupted_ingestion_fails(self, spectral_record, queued, settings):
+        settings.SPECTRAL_INGEST_MAX_RECOVERIES = 2
+        spectral_record.processing_status = SpectralRecord.PROCESSING_IN_PROGRESS
+        spectral_record.metadata = {'ingest_recoveries': 2}
+        spectral_record.save()
+
+        assert recover_stale_ingests() == 0
+        assert queued == []
+        spectral_record.refresh_from_db()
+        assert spectral_record.processing_status == SpectralRecord.PROCESSING_FAILED
+        assert 'ingest_recoveries' not in spectral_record.metadata
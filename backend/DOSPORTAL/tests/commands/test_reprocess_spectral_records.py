@@ -0,0 +1,136 @@
+"""Tests for the reprocess_spectral_records management command."""
+
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from DOSPORTAL import task_queues
+from DOSPORTAL.models import File, Organization
+from DOSPORTAL.models.spectrals import SpectralRecord, SpectralRecordArtifact
+from DOSPORTAL.services import processing_progress
+from DOSPORTAL.services.spectral_parser import PARSER_VERSION
+from DOSPORTAL.task_queues import acquire_ingest_lock
+from DOSPORTAL.tasks import INGESTION_ARTIFACT_TYPES
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def publish(self, channel, message):
+        pass
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+
+
+@pytest.fixture
+def organization(db):
+    return Organization.objects.create(name='Test Organization', slug='test-org')
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Record ids queued to the ingestion clusters, against an in-memory Redis."""
+    queued = []
+    monkeypatch.setattr(processing_progress, '_client', FakeRedis())
+    monkeypatch.setattr(task_queues, 'async_task', lambda func, *args, **kwargs: queued.append(args[0]) or 'task')
+    return queued
+
+
+def make_record(user, organization, name, processing_status, parser_version=None):
+    raw_file = File.objects.create(
+        filename=f'{name}.log',
+        file=ContentFile(b'$CANDY,0,10,1,1,256,0,0,0,0,5\n', name=f'{name}.log'),
+        file_type=File.FILE_TYPE_LOG,
+        owner=organization,
+    )
+    record = SpectralRecord.objects.create(
+        name=name,
+        raw_file=raw_file,
+        author=user,
+        owner=organization,
+        processing_status=processing_status,
+    )
+    if parser_version is not None:
+        for artifact_type in INGESTION_ARTIFACT_TYPES:
+            artifact_file = File.objects.create(
+                filename=f'{artifact_type}.parquet',
+                file=ContentFile(b'artifact', name=f'{artifact_type}.parquet'),
+                file_type=File.FILE_TYPE_PARQUET,
+                source_type='generated',
+                metadata={'parser_version': parser_version},
+            )
+            SpectralRecordArtifact.objects.create(spectral_record=record, artifact=artifact_file, artifact_type=artifact_type)
+    return record
+
+
+@pytest.fixture
+def records(user, organization):
+    return {
+        'outdated': make_record(user, organization, 'outdated', SpectralRecord.PROCESSING_COMPLETED, PARSER_VERSION - 1),
+        'failed': make_record(user, organization, 'failed', SpectralRecord.PROCESSING_FAILED),
+        'current': make_record(user, organization, 'current', SpectralRecord.PROCESSING_COMPLETED, PARSER_VERSION),
+    }
+
+
+def reprocess(*args):
+    out = StringIO()
+    call_command('reprocess_spectral_records', *args, stdout=out)
+    return out.getvalue()
+
+
+def listed(output, records):
+    return {name for name, record in records.items() if str(record.id) in output}
+
+
+@pytest.mark.django_db
+class TestReprocessSpectralRecords:
+
+    def test_current_records_are_skipped(self, records, queued):
+        assert listed(reprocess('--dry-run'), records) == {'outdated', 'failed'}
+        assert listed(reprocess('--dry-run', '--force'), records) == {'outdated', 'failed', 'current'}
+
+    def test_selection_by_parser_version(self, records, queued):
+        output = reprocess('--dry-run', '--parser-version', str(PARSER_VERSION - 1))
+
+        assert listed(output, records) == {'outdated'}
+        assert listed(reprocess('--dry-run', '--parser-version', str(PARSER_VERSION)), records) == set()
+
+    def test_selection_by_status(self, records, queued):
+        assert listed(reprocess('--dry-run', '--status', 'failed'), records) == {'failed'}
+        assert listed(reprocess('--dry-run', '--status', 'failed', '--status', 'completed'), records) == {'outdated', 'failed'}
+
+    def test_dry_run_queues_nothing(self, records, queued):
+        output = reprocess('--dry-run')
+
+        assert '2 records selected' in output
+        assert queued == []
+
+    def test_records_are_queued_once(self, records, queued):
+        # ingestion of the failed record is already queued or running
+        assert acquire_ingest_lock(records['failed'].id, 60)
+
+        output = reprocess()
+
+        assert queued == [records['outdated'].id]
+        assert '1 records queued, 1 were queued already' in output
+
+        # the lock of the queued record is held until its task releases it
+        assert '0 records queued, 2 were queued already' in reprocess()
+        assert queued == [records['outdated'].id]
@@ -0,0 +1,66 @@
+"""Tests for the in-process LRU cache of decoded arrays."""
+
+import threading
+import time
+
+from DOSPORTAL.services.array_cache import LRUArrayCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUArrayCache(max_bytes=100)
+    cache.put('a', 'A', 40)
+    cache.put('b', 'B', 40)
+    assert cache.get('a') == 'A'
+
+    cache.put('c', 'C', 40)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert cache.stats() == {
+        'entries': 2, 'bytes': 80, 'max_bytes': 100, 'hits': 3, 'misses': 1, 'evictions': 1,
+    }
+
+
+def test_values_above_budget_are_not_kept():
+    cache = LRUArrayCache(max_bytes=10)
+    assert cache.get_or_load('big', lambda: 'value', lambda value: 11) == 'value'
+    assert cache.stats()['entries'] == 0
+
+
+def test_concurrent_misses_load_once():
+    cache = LRUArrayCache(max_bytes=100)
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load('key', load, lambda value: 1)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 4
+    assert len(loads) == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 3
+
+
+def test_failed_load_is_retried_by_the_next_request():
+    cache = LRUArrayCache(max_bytes=100)
+
+    def fail():
+        raise OSError('storage unavailable')
+
+    try:
+        cache.get_or_load('key', fail, len)
+    except OSError:
+        pass
+    assert cache.get_or_load('key', lambda: 'value', len) == 'value'
@@ -0,0 +1,147 @@
+"""Tests for the node-local disk cache of artifact objects."""
+
+import hashlib
+import fcntl
+import os
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from DOSPORTAL.services.artifact_disk_cache import ArtifactDiskCache
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class Source:
+    """Chunks of an object, counting downloads."""
+
+    def __init__(self, content, delay=0.0):
+        self.content = content
+        self.delay = delay
+        self.downloads = 0
+
+    def __call__(self):
+        self.downloads += 1
+        time.sleep(self.delay)
+        yield self.content[:3]
+        yield self.content[3:]
+
+
+def test_object_is_downloaded_once_and_memory_mapped(tmp_path):
+    cache = ArtifactDiskCache(str(tmp_path), 1024)
+    content = b'artifact content'
+    source = Source(content)
+    key = content_hash(content)
+
+    for _ in range(2):
+        with cache.open(key, len(content), source) as f:
+            assert isinstance(f, pa.MemoryMappedFile)
+            assert f.read() == content
+
+    assert source.downloads == 1
+    assert os.path.exists(os.path.join(tmp_path, key[:2], key))
+
+
+def test_concurrent_misses_download_once(tmp_path):
+    cache = ArtifactDiskCache(str(tmp_path), 1024)
+    content = b'artifact content'
+    source = Source(content, delay=0.05)
+    results = []
+
+    def read():
+        with cache.open(content_hash(content), len(content), source) as f:
+            results.append(f.read())
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [content] * 4
+    assert source.downloads == 1
+
+
+def test_corrupted_download_is_not_kept(tmp_path):
+    cache = ArtifactDiskCache(str(tmp_path), 1024)
+    key = content_hash(b'expected')
+
+    with pytest.raises(ValueError):
+        cache.open(key, 8, Source(b'received'))
+
+    assert not os.path.exists(cache.path(key))
+    assert not [name for name in os.listdir(os.path.dirname(cache.path(key))) if name.endswith('.partial')]
+
+
+def test_least_recently_used_objects_are_evicted(tmp_path):
+    cache = ArtifactDiskCache(str(tmp_path), 25)
+    first, second, third = b'first object', b'second obj', b'third obj'
+    cache.open(content_hash(first), len(first), Source(first)).close()
+    cache.open(content_hash(second), len(second), Source(second)).close()
+    # make `first` the least recently used one
+    os.utime(cache.path(content_hash(first)), (0, 0))
+
+    cache.open(content_hash(third), len(third), Source(third)).close()
+
+    assert not os.path.exists(cache.path(content_hash(first)))
+    assert not os.path.exists(cache.path(content_hash(first)) + '.lock')
+    assert os.path.exists(cache.path(content_hash(second)))
+    assert os.path.exists(cache.path(content_hash(third)))
+
+
+def test_directory_is_walked_only_when_over_budget(tmp_path, monkeypatch):
+    cache = ArtifactDiskCache(str(tmp_path), 25)
+    objects = [b'first object', b'second obj', b'third obj']
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(os, 'walk', lambda *args: walks.append(args) or walk(*args))
+
+    for content in objects[:2]:
+        cache.open(content_hash(content), len(content), Source(content)).close()
+    # the first fill learns the size of the directory
+    assert len(walks) == 1
+
+    cache.open(content_hash(objects[2]), len(objects[2]), Source(objects[2])).close()
+    assert len(walks) == 2
+    remaining = [name for _, _, names in walk(tmp_path) for name in names if not name.startswith('.')]
+    assert sorted(remaining) == sorted(
+        name for content in objects[1:] for name in (content_hash(content), content_hash(content) + '.lock')
+    )
+    assert (tmp_path / '.size').read_text() == str(len(objects[1]) + len(objects[2]))
+
+
+def test_locks_of_fills_in_progress_are_kept(tmp_path):
+    cache = ArtifactDiskCache(str(tmp_path), 25)
+    held, orphaned = cache.path('a' * 64) + '.lock', cache.path('b' * 64) + '.lock'
+    os.makedirs(os.path.dirname(held))
+    os.makedirs(os.path.dirname(orphaned))
+    open(orphaned, 'w').close()
+
+    with open(held, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        cache.evict()
+        assert os.path.exists(held)
+    assert not os.path.exists(orphaned)
+
+
+def test_objects_above_budget_are_not_cached(tmp_path):
+    cache = ArtifactDiskCache(str(tmp_path), 4)
+    source = Source(b'too large')
+
+    assert cache.open(content_hash(b'too large'), 9, source) is None
+    assert source.downloads == 0
+
+
+def test_parquet_read_from_mapped_file(tmp_path):
+    path = tmp_path / 'artifact.parquet'
+    pq.write_table(pa.table({'time_ms': [1.0, 2.0, 3.0]}), path)
+    content = path.read_bytes()
+    cache = ArtifactDiskCache(str(tmp_path / 'cache'), 1024 * 1024)
+
+    with cache.open(content_hash(content), len(content), Source(content)) as f:
+        assert pq.read_table(f).column('time_ms').to_pylist() == [1.0, 2.0, 3.0]
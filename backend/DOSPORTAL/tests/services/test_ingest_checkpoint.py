@@ -0,0 +1,113 @@
+"""Tests for checkpoints of interrupted log ingestion."""
+
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.files.storage import InMemoryStorage
+
+from DOSPORTAL.services.ingest_checkpoint import CHECKPOINT_KEY, IngestCheckpoint, byte_range_parts
+from DOSPORTAL.services.spectral_parser import (
+    iter_line_range,
+    load_segment,
+    merge_summaries,
+    spill_candy_segments,
+    split_byte_ranges,
+)
+
+
+class StubRecord(SimpleNamespace):
+    def save(self, update_fields=None):
+        pass
+
+
+def make_record():
+    return StubRecord(id='record-1', metadata={}, raw_file=SimpleNamespace(id='file-1', size=1000))
+
+
+def segment(value):
+    return {
+        'time_ms': np.array([value], dtype=np.float64),
+        'particle_count': np.array([1]),
+        'channels': np.array([[value, value]], dtype=np.uint16),
+    }
+
+
+def test_checkpoint_round_trip(tmp_path):
+    storage = InMemoryStorage()
+    record = make_record()
+    checkpoint = IngestCheckpoint(record, storage, str(tmp_path), interval=100)
+    summary = {'segments': [segment(1)], 'rows': 1, 'channels': 2, 'max_count': 1, 'time_min': 1.0, 'time_max': 1.0}
+
+    checkpoint(summary, 50)  # below the interval, nothing is saved
+    assert CHECKPOINT_KEY not in record.metadata
+
+    summary['segments'].append(segment(2))
+    summary.update(rows=2, max_count=2, time_max=2.0)
+    checkpoint(summary, 120)
+    assert record.metadata[CHECKPOINT_KEY]['offset'] == 120
+
+    retried = IngestCheckpoint(record, storage, str(tmp_path), interval=100)
+    resumed, offset = retried.resume()
+
+    assert offset == 120
+    assert resumed['rows'] == 2
+    assert [load_segment(path)['channels'].tolist() for path in resumed['segments']] == [[[1, 1]], [[2, 2]]]
+
+    retried.clear()
+    assert CHECKPOINT_KEY not in record.metadata
+    assert not storage.listdir('checkpoints/record-1')[1]
+
+
+def test_checkpoint_of_other_file_is_ignored(tmp_path):
+    storage = InMemoryStorage()
+    record = make_record()
+    summary = {'segments': [segment(1)], 'rows': 1, 'channels': 2, 'max_count': 1, 'time_min': 1.0, 'time_max': 1.0}
+    IngestCheckpoint(record, storage, str(tmp_path), interval=0)(summary, 10)
+
+    record.raw_file.size = 2000
+    assert IngestCheckpoint(record, storage, str(tmp_path), interval=0).resume() == (None, 0)
+
+
+def test_default_settings_checkpoint_large_logs(settings):
+    interval = settings.SPECTRAL_CHECKPOINT_INTERVAL
+    # the longest sequentially parsed log passes at least one checkpoint
+    assert 0 < interval < settings.SPECTRAL_PARALLEL_MIN_SIZE
+
+    for size in (settings.SPECTRAL_PARALLEL_MIN_SIZE, 10 * settings.SPECTRAL_PARALLEL_MIN_SIZE + 1):
+        for workers in (2, 8):
+            ranges = split_byte_ranges(size, byte_range_parts(size, workers, interval))
+            assert len(ranges) >= workers
+            assert max(end - start for start, end in ranges) <= interval
+
+
+def test_parsed_byte_ranges_are_resumed(tmp_path):
+    lines = [f"$CANDY,{i},{10 * i},25583,{i + 1},256,0,0,0,0,{i},{i + 1}" for i in range(30)]
+    data = ("\n".join(lines) + "\n").encode()
+    storage = InMemoryStorage()
+    record = make_record()
+    record.raw_file.size = len(data)
+    ranges = split_byte_ranges(len(data), 4)
+
+    def parse(index):
+        start, end = ranges[index]
+        chunks = iter_line_range([data[max(start - 1, 0):]], start, end)
+        return spill_candy_segments(chunks, str(tmp_path), prefix=f"part_{index:04d}")
+
+    checkpoint = IngestCheckpoint(record, storage, str(tmp_path), interval=0)
+    assert checkpoint.resume_ranges(4) == {}
+    for index in (2, 0):  # ranges finish in any order
+        checkpoint.range_parsed(index, parse(index))
+
+    retried = IngestCheckpoint(record, storage, str(tmp_path), interval=0)
+    assert retried.resume_ranges(3) == {}  # split differently
+    parsed = retried.resume_ranges(4)
+    assert sorted(parsed) == [0, 2]
+
+    summaries = {**parsed, 1: parse(1), 3: parse(3)}
+    merged = merge_summaries([summaries[index] for index in range(4)])
+    times = np.concatenate([load_segment(path)['time_ms'] for path in merged['segments']])
+    assert merged['rows'] == 30
+    assert list(times) == [10 * i for i in range(30)]
+
+    retried.clear()
+    assert not storage.listdir('checkpoints/record-1')[1]
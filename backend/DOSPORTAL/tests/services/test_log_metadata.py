@@ -0,0 +1,42 @@
+"""Tests for metadata extraction from both ends of a log."""
+
+import io
+
+from DOSPORTAL.services.log_metadata import read_log_metadata
+
+
+def make_log(exposures):
+    lines = [b"$DOS,AIRDOS04,F4,256,f157c1d,origin,1290c00806a2"]
+    for i in range(exposures):
+        lines.append(b"$CANDY,%d,%d,5,7,0,0,0,0,1,1,2,3" % (i + 3, 1000 + 10 * i))
+        if i % 50 == 0:
+            lines.append(b"$HOUSE,%d,%d,23.5,1013.2" % (i, 1000 + 10 * i))
+    return b"\n".join(lines) + b"\n"
+
+
+def test_metadata_from_log_edges():
+    log = make_log(2000)
+    f = io.BytesIO(log)
+    f.seek(7)
+
+    metadata = read_log_metadata(f, len(log), edge_bytes=512)
+
+    assert metadata['detector_type'] == 'AIRDOS04'
+    assert metadata['detector_sn'] == '1290c00806a2'
+    assert metadata['channels'] == 256
+    assert metadata['time_first_ms'] == 1000.0
+    assert metadata['time_last_ms'] == 1000.0 + 10 * 1999
+    assert metadata['duration_ms'] == 10 * 1999
+    assert metadata['exposures_estimate'] == 2000
+    # position of the upload is left untouched
+    assert f.tell() == 7
+
+
+def test_metadata_of_short_and_unrelated_files():
+    log = make_log(3)
+    assert read_log_metadata(io.BytesIO(log), len(log))['exposures_estimate'] == 3
+
+    metadata = read_log_metadata(io.BytesIO(b"test content"), 12)
+    assert metadata['detector_type'] is None
+    assert metadata['duration_ms'] is None
+    assert metadata['exposures_estimate'] is None
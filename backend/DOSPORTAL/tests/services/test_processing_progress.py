@@ -0,0 +1,76 @@
+"""Tests for processing progress reporting."""
+
+import pytest
+
+from DOSPORTAL.services import processing_progress
+from DOSPORTAL.services.processing_progress import ProgressReporter
+
+
+@pytest.fixture
+def published(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        processing_progress, 'publish_progress',
+        lambda record_id, status, stage=None, percent=None: calls.append((status, stage, percent)),
+    )
+    return calls
+
+
+def test_updates_are_throttled_to_percent_steps(published):
+    progress = ProgressReporter('record')
+    for fraction in (0.0, 0.001, 0.002, 0.5, 0.5, 1.0):
+        progress.update('parse', fraction)
+    assert published == [
+        ('processing', 'parse', 0),
+        ('processing', 'parse', 35),
+        ('processing', 'parse', 70),
+    ]
+
+
+def test_iter_bytes_reports_share_of_total(published):
+    progress = ProgressReporter('record')
+    chunks = list(progress.iter_bytes([b'x' * 25, b'x' * 25], 'parse', 100, start=50))
+    assert len(chunks) == 2
+    assert [percent for _, _, percent in published] == [52, 70]
+
+
+def test_rows_consumer_covers_encode_stage(published):
+    progress = ProgressReporter('record')
+    consumer = progress.rows_consumer('encode', 4)
+    consumer.add([0, 1], None, None)
+    consumer.add([2, 3], None, None)
+    assert published == [('processing', 'encode', 82), ('processing', 'encode', 95)]
+
+
+def test_ranges_callback_reports_parsed_bytes(published):
+    progress = ProgressReporter('record')
+    parsed = []
+    on_range = progress.ranges_callback(
+        'parse', [(0, 100), (100, 200), (200, 400)], done={0: {}}, on_range=lambda index, summary: parsed.append(index)
+    )
+    on_range(2, {})
+    on_range(1, {})
+
+    assert parsed == [2, 1]
+    # the range parsed before counts from the start
+    assert [percent for _, _, percent in published] == [17, 52, 70]
+
+
+def test_heartbeat_is_throttled_in_time(published, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(processing_progress.time, 'monotonic', lambda: now[0])
+    beats = []
+    progress = ProgressReporter('record', heartbeat=lambda: beats.append(now[0]))
+
+    for _ in range(3):
+        progress.update('parse', 0.5)
+        now[0] += 20
+    assert beats == [1000.0, 1040.0]
+    # the percentage did not change, only the heartbeat
+    assert published == [('processing', 'parse', 35)]
+
+
+def test_finish_reports_final_status(published):
+    ProgressReporter('record').finish('completed')
+    ProgressReporter('record').finish('failed')
+    assert published == [('completed', None, 100), ('failed', None, None)]
@@ -0,0 +1,34 @@
+"""Tests for per-stage processing timings."""
+
+import time
+
+from DOSPORTAL.services.processing_stats import ProcessingStats
+
+
+def test_nested_stage_is_excluded_from_parent():
+    stats = ProcessingStats()
+    with stats.stage('parse'):
+        time.sleep(0.02)
+        with stats.stage('fetch'):
+            time.sleep(0.05)
+
+    assert 0.05 <= stats.stages['fetch'] < 0.07
+    assert 0.02 <= stats.stages['parse'] < 0.045
+
+
+def test_timed_iter_counts_items():
+    stats = ProcessingStats()
+
+    def chunks():
+        for chunk in (b"abc", b"de"):
+            time.sleep(0.01)
+            yield chunk
+
+    with stats.stage('parse'):
+        assert list(stats.timed_iter(chunks(), 'fetch', count='raw_bytes')) == [b"abc", b"de"]
+
+    result = stats.as_dict()
+    assert result['raw_bytes'] == 5
+    assert result['stages_s']['fetch'] >= 0.02
+    assert result['stages_s']['parse'] < result['stages_s']['fetch']
+    assert result['total_s'] >= result['stages_s']['fetch']
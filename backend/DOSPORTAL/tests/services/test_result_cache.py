@@ -0,0 +1,88 @@
+"""Tests for the shared Redis cache of derived spectral responses."""
+
+from types import SimpleNamespace
+
+from DOSPORTAL.services import processing_progress
+from DOSPORTAL.services.result_cache import get_result, invalidate_records, result_key, store_result
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, ()))
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        for name, args, kwargs in self.calls:
+            getattr(self.client, name)(*args, **kwargs)
+
+
+def calib(coef1=1.0):
+    return SimpleNamespace(id='calib', coef0=0.0, coef1=coef1, coef2=0.0)
+
+
+def test_key_depends_on_artifacts_calibration_and_parameters():
+    key = result_key('spectrum', 'record', ['a', 'b'], calib(), [('time_from', '0')])
+
+    assert key == result_key('spectrum', 'record', ['b', 'a'], calib(), [('time_from', '0')])
+    assert key != result_key('spectrum', 'record', ['a', 'c'], calib(), [('time_from', '0')])
+    assert key != result_key('spectrum', 'record', ['a', 'b'], calib(coef1=2.0), [('time_from', '0')])
+    assert key != result_key('spectrum', 'record', ['a', 'b'], None, [('time_from', '0')])
+    assert key != result_key('spectrum', 'record', ['a', 'b'], calib(), [('time_from', '1')])
+    assert key != result_key('evolution', 'record', ['a', 'b'], calib(), [('time_from', '0')])
+
+
+def test_invalidation_drops_only_results_of_the_record(settings, monkeypatch):
+    settings.RESULT_CACHE_TTL = 60
+    settings.RESULT_CACHE_MAX_BYTES = 1024
+    monkeypatch.setattr(processing_progress, '_client', FakeRedis())
+    first = result_key('spectrum', 'first', ['a'], None, [])
+    second = result_key('spectrum', 'second', ['b'], None, [])
+    store_result('first', first, b'{"first": 1}')
+    store_result('second', second, b'{"second": 2}')
+
+    invalidate_records(['first'])
+
+    assert get_result(first) is None
+    assert get_result(second) == b'{"second": 2}'
+
+
+def test_large_results_are_not_cached(settings, monkeypatch):
+    settings.RESULT_CACHE_TTL = 60
+    settings.RESULT_CACHE_MAX_BYTES = 4
+    monkeypatch.setattr(processing_progress, '_client', FakeRedis())
+
+    store_result('record', 'key', b'{"large": true}')
+
+    assert get_result('key') is None
@@ -0,0 +1,134 @@
+"""Tests for reading spectral Parquet artifacts of every schema version."""
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from DOSPORTAL.services.spectral_artifacts import (
+    read_spectral_parquet,
+    select_row_groups,
+    write_spectral_parquet,
+)
+
+
+def test_read_wide_schema(tmp_path):
+    path = tmp_path / 'wide.parquet'
+    pd.DataFrame({
+        'id': [0, 1],
+        'time_ms': [0.0, 11.0],
+        'particle_count': [1.0, 9.0],
+        'channel_10': [5, 7],
+        'channel_12': [1, None],
+        'channel_11': [2, 3],
+    }).to_parquet(path, engine='fastparquet', index=False)
+
+    arrays = read_spectral_parquet(str(path))
+
+    assert arrays.first_channel == 10
+    assert list(arrays.channel_numbers) == [10, 11, 12]
+    np.testing.assert_array_equal(arrays.channels, [[5, 2, 1], [7, 3, 0]])
+    np.testing.assert_array_equal(arrays.particle_count, [1, 9])
+
+
+def write_matrix_artifact(tmp_path, time_ms, row_group_rows, memory_budget=None):
+    segment = tmp_path / 'segment.npz'
+    channels = np.arange(len(time_ms) * 3, dtype=np.uint16).reshape(-1, 3)
+    np.savez(segment, time_ms=np.asarray(time_ms, dtype=np.float64),
+             particle_count=np.ones(len(time_ms), dtype=np.int64), channels=channels)
+    summary = {
+        'segments': [str(segment)],
+        'rows': len(time_ms),
+        'channels': 3,
+        'max_count': int(channels.max()),
+        'time_min': float(min(time_ms)),
+        'time_max': float(max(time_ms)),
+    }
+    path = str(tmp_path / 'matrix.parquet')
+    write_spectral_parquet(summary, path, row_group_rows=row_group_rows, memory_budget=memory_budget)
+    return path, channels
+
+
+def test_channels_are_staged_in_memory_within_budget(tmp_path, monkeypatch):
+    memmaps = []
+    open_memmap = np.lib.format.open_memmap
+
+    def recording_open_memmap(path, *args, **kwargs):
+        memmaps.append(path)
+        return open_memmap(path, *args, **kwargs)
+
+    monkeypatch.setattr(np.lib.format, 'open_memmap', recording_open_memmap)
+
+    write_matrix_artifact(tmp_path, [0, 10, 20], row_group_rows=2, memory_budget=1024)
+    assert memmaps == []
+
+    path, channels = write_matrix_artifact(tmp_path, [0, 10, 20], row_group_rows=2, memory_budget=8)
+    assert memmaps == [f"{path}.channels.npy"]
+    np.testing.assert_array_equal(read_spectral_parquet(path).channels, channels)
+
+
+def test_rows_are_sorted_into_bounded_row_groups(tmp_path):
+    path, channels = write_matrix_artifact(tmp_path, [30, 10, 20, 0, 50, 40, 60], row_group_rows=3)
+
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert max(parquet_file.metadata.row_group(i).num_rows for i in range(3)) == 3
+
+    arrays = read_spectral_parquet(path)
+    assert list(arrays.time_ms) == [0, 10, 20, 30, 40, 50, 60]
+    np.testing.assert_array_equal(arrays.channels[0], channels[3])
+
+
+def test_time_window_prunes_row_groups(tmp_path):
+    path, _ = write_matrix_artifact(tmp_path, list(range(0, 100, 10)), row_group_rows=2)
+
+    parquet_file = pq.ParquetFile(path)
+    assert select_row_groups(parquet_file, time_from=25, time_to=45) == [1, 2]
+
+    arrays = read_spectral_parquet(path, time_from=25, time_to=45)
+    assert list(arrays.time_ms) == [30, 40]
+    assert arrays.channels.shape == (2, 3)
+
+
+def test_time_window_outside_record_is_empty(tmp_path):
+    path, _ = write_matrix_artifact(tmp_path, [0, 10, 20], row_group_rows=2)
+
+    arrays = read_spectral_parquet(path, time_from=1000)
+    assert len(arrays.time_ms) == 0
+    assert arrays.channels.shape == (0, 3)
+
+
+def test_totals_are_read_without_channels(tmp_path):
+    path, channels = write_matrix_artifact(tmp_path, [0, 10, 20], row_group_rows=2)
+
+    assert 'total_count' in pq.ParquetFile(path).schema_arrow.names
+    arrays = read_spectral_parquet(path, columns=('time_ms', 'total_count'))
+    assert arrays.channels is None
+    assert arrays.particle_count is None
+    np.testing.assert_array_equal(arrays.total_count, channels.sum(axis=1))
+
+
+def test_channel_range_of_matrix_schema(tmp_path):
+    path, channels = write_matrix_artifact(tmp_path, [0, 10, 20], row_group_rows=2)
+    first_channel = read_spectral_parquet(path).first_channel
+
+    arrays = read_spectral_parquet(path, columns=('time_ms', 'channels'), channel_range=(first_channel + 1, 100))
+    assert list(arrays.channel_numbers) == [first_channel + 1, first_channel + 2]
+    np.testing.assert_array_equal(arrays.channels, channels[:, 1:])
+
+
+def test_wide_schema_projection(tmp_path):
+    path = tmp_path / 'wide.parquet'
+    pd.DataFrame({
+        'time_ms': [0.0, 11.0],
+        'channel_10': [5, 7],
+        'channel_11': [2, 3],
+        'channel_12': [1, None],
+    }).to_parquet(path, engine='fastparquet', index=False)
+
+    arrays = read_spectral_parquet(str(path), columns=('time_ms', 'channels'), channel_range=(11, 12))
+    assert list(arrays.channel_numbers) == [11, 12]
+    np.testing.assert_array_equal(arrays.channels, [[2, 1], [3, 0]])
+
+    # no stored totals, summed from all channels
+    arrays = read_spectral_parquet(str(path), columns=('time_ms', 'total_count'), channel_range=(11, 12))
+    np.testing.assert_array_equal(arrays.total_count, [8, 10])
@@ -0,0 +1,120 @@
+"""Tests for the multi-resolution evolution pyramid."""
+
+import numpy as np
+
+from DOSPORTAL.services.spectral_evolution import (
+    DOWNSAMPLE_MINMAX,
+    EvolutionPyramidBuilder,
+    aggregate_level,
+    choose_level,
+    downsample_indices,
+    lttb_indices,
+    minmax_indices,
+    read_evolution_level,
+)
+
+
+def test_aggregate_level_buckets():
+    time_ms = np.array([0.0, 4000.0, 9000.0, 12000.0, 31000.0])
+    totals = np.array([1.0, 5.0, 3.0, 8.0, 2.0])
+
+    level = aggregate_level(time_ms, totals, 10000.0)
+
+    assert list(level['time_ms']) == [0.0, 10000.0, 30000.0]
+    assert list(level['exposures']) == [3, 1, 1]
+    assert list(level['min']) == [1.0, 8.0, 2.0]
+    assert list(level['max']) == [5.0, 8.0, 2.0]
+    assert list(level['mean']) == [3.0, 8.0, 2.0]
+
+
+def test_choose_level_by_window_and_budget():
+    levels = [
+        {'resolution_ms': 0.0, 'points': 100_000},
+        {'resolution_ms': 10_000.0, 'points': 10_000},
+        {'resolution_ms': 60_000.0, 'points': 1_700},
+    ]
+
+    assert choose_level(levels, [0.0, 1e8], 2_000) == 60_000.0
+    # a tenth of the record fits with the 10 s buckets, a hundredth with raw data
+    assert choose_level(levels, [0.0, 1e8], 2_000, time_from=0.0, time_to=1e7) == 10_000.0
+    assert choose_level(levels, [0.0, 1e8], 2_000, time_from=5e7, time_to=5.1e7) == 0.0
+    # nothing fits, use the coarsest level
+    assert choose_level(levels, [0.0, 1e8], 10) == 60_000.0
+
+
+def test_pyramid_round_trip(tmp_path):
+    builder = EvolutionPyramidBuilder([0.0, 1000.0])
+    time_ms = np.arange(0.0, 5000.0, 250.0)
+    channels = np.ones((len(time_ms), 4), dtype=np.uint16)
+    # row groups arrive in chunks
+    builder.add(time_ms[:7], None, channels[:7])
+    builder.add(time_ms[7:], None, channels[7:])
+
+    path = str(tmp_path / 'evolution.parquet')
+    metadata = builder.write(path)
+
+    assert metadata['levels'] == [
+        {'resolution_ms': 0.0, 'points': 20},
+        {'resolution_ms': 1000.0, 'points': 5},
+    ]
+    assert metadata['time_range_ms'] == [0.0, 4750.0]
+    assert metadata['exposure_ms'] == 250.0
+
+    raw = read_evolution_level(path, 0.0, time_from=1000.0, time_to=1500.0)
+    assert list(raw['time_ms']) == [1000.0, 1250.0, 1500.0]
+    assert list(raw['mean']) == [4.0, 4.0, 4.0]
+
+    seconds = read_evolution_level(path, 1000.0, time_from=1500.0)
+    assert list(seconds['time_ms']) == [1000.0, 2000.0, 3000.0, 4000.0]
+    assert list(seconds['exposures']) == [4, 4, 4, 4]
+
+
+def test_single_exposure_spike_survives_coarse_level(tmp_path):
+    builder = EvolutionPyramidBuilder([0.0, 10_000.0])
+    time_ms = np.arange(0.0, 100_000.0, 250.0)
+    channels = np.ones((len(time_ms), 4), dtype=np.uint16)
+    channels[123] = 1000  # one exposure at 30.75 s
+    builder.add(time_ms, None, channels)
+    path = str(tmp_path / 'evolution.parquet')
+    builder.write(path)
+
+    level = read_evolution_level(path, 10_000.0)
+
+    assert level['mean'][3] < 200  # averaged away with the other 39 exposures
+    assert level['max'][3] == 4000
+    selected = downsample_indices(level['time_ms'], level['mean'], 4, DOWNSAMPLE_MINMAX,
+                                  low=level['min'], high=level['max'])
+    assert 3 in selected
+
+
+def test_lttb_keeps_peaks_and_ends():
+    time_ms = np.arange(10_000, dtype=np.float64)
+    values = np.ones(10_000)
+    values[1234] = 100.0  # e.g. a solar particle event
+    values[8765] = -50.0
+
+    indices = lttb_indices(time_ms, values, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+    assert 1234 in indices and 8765 in indices
+
+
+def test_minmax_keeps_extremes_of_bounds():
+    low = np.zeros(1000)
+    high = np.zeros(1000)
+    low[10] = -5.0
+    high[500] = 7.0
+
+    indices = minmax_indices(low, high, 50)
+
+    assert len(indices) <= 50
+    assert 10 in indices and 500 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_short_series_are_not_downsampled():
+    time_ms = np.arange(10, dtype=np.float64)
+    for method in ('lttb', 'minmax'):
+        assert list(downsample_indices(time_ms, time_ms, 10, method)) == list(range(10))
@@ -0,0 +1,79 @@
+"""Tests for the cumulative spectrum index."""
+
+import os
+
+import numpy as np
+
+from DOSPORTAL.services.spectral_index import CumulativeSpectrumBuilder, CumulativeSpectrumIndex
+
+
+def build_index(tmp_path, time_ms, channels, group_rows, checkpoint_rows):
+    path = str(tmp_path / 'index.npy')
+    builder = CumulativeSpectrumBuilder(
+        path, len(time_ms), channels.shape[1], channels.dtype, checkpoint_rows=checkpoint_rows
+    )
+    for start in range(0, len(time_ms), group_rows):
+        rows = slice(start, start + group_rows)
+        builder.add(time_ms[rows], None, channels[rows])
+    return path, builder.close()
+
+
+def test_window_spectrum_matches_direct_sum(tmp_path):
+    rng = np.random.default_rng(1)
+    time_ms = np.sort(rng.uniform(0, 100_000, size=500)).round()
+    channels = rng.integers(0, 60_000, size=(500, 8)).astype(np.uint16)
+    path, metadata = build_index(tmp_path, time_ms, channels, group_rows=64, checkpoint_rows=50)
+
+    assert metadata['rows'] == 500
+    assert metadata['time_checkpoints'] == time_ms[::50].tolist()
+
+    with open(path, 'rb') as f:
+        index = CumulativeSpectrumIndex(
+            f, metadata['time_checkpoints'], metadata['checkpoint_rows'], metadata['channel_dtype']
+        )
+
+        windows = [(None, None), (1234.0, 56789.0), (time_ms[50], time_ms[99]), (None, 10.0), (time_ms[480], None)]
+        windows += [tuple(sorted(rng.choice(time_ms, size=2))) for _ in range(50)]
+        for time_from, time_to in windows:
+            selected = np.ones(500, dtype=bool)
+            if time_from is not None:
+                selected &= time_ms >= time_from
+            if time_to is not None:
+                selected &= time_ms <= time_to
+
+            counts, first_time, last_time = index.window(time_from, time_to)
+
+            np.testing.assert_array_equal(counts, channels[selected].sum(axis=0, dtype=np.int64))
+            if selected.any():
+                assert (first_time, last_time) == (time_ms[selected][0], time_ms[selected][-1])
+
+
+def test_empty_window(tmp_path):
+    time_ms = np.arange(10, dtype=np.float64)
+    path, metadata = build_index(tmp_path, time_ms, np.ones((10, 3), dtype=np.uint16), group_rows=4, checkpoint_rows=4)
+
+    with open(path, 'rb') as f:
+        index = CumulativeSpectrumIndex(
+            f, metadata['time_checkpoints'], metadata['checkpoint_rows'], metadata['channel_dtype']
+        )
+        counts, first_time, last_time = index.window(20.0, 30.0)
+
+    assert list(counts) == [0, 0, 0]
+    assert first_time is None and last_time is None
+
+
+def test_spectra_are_compressed_per_block(tmp_path):
+    time_ms = np.arange(1000, dtype=np.float64)
+    channels = np.full((1000, 16), 7, dtype=np.uint16)
+    path, metadata = build_index(tmp_path, time_ms, channels, group_rows=300, checkpoint_rows=128)
+
+    with open(path, 'rb') as f:
+        index = CumulativeSpectrumIndex(
+            f, metadata['time_checkpoints'], metadata['checkpoint_rows'], metadata['channel_dtype']
+        )
+        assert index.n_blocks == 8
+        assert index.channel_dtype == np.uint16
+        np.testing.assert_array_equal(index.window(time_ms[130], time_ms[949])[0], np.full(16, 7 * 820))
+
+    # int64 sums only at block boundaries, the repetitive spectra compress to almost nothing
+    assert os.path.getsize(path) < time_ms.nbytes + 9 * 16 * 8 + channels.nbytes // 10
@@ -0,0 +1,233 @@
+"""Tests for the streaming $CANDY log parser."""
+
+import os
+
+import numpy as np
+
+from DOSPORTAL.services import spectral_parser
+from DOSPORTAL.services.spectral_parser import (
+    FIRST_CHANNEL,
+    HIST_SENTENCE,
+    iter_line_range,
+    iter_sentence_lines,
+    merge_summaries,
+    parse_header,
+    spill_candy_segments,
+    split_byte_ranges,
+    tokenize_sentences,
+)
+from DOSPORTAL.services.spectral_artifacts import read_spectral_parquet, write_spectral_parquet
+
+
+def make_log(spectra, header="$DOS,AIRDOS04,F4,256,f157c1d,origin,1290c00806a2"):
+    lines = [header]
+    for i, spectrum in enumerate(spectra):
+        lines.append(f"$CANDY,{i},{10 + 11 * i},25583,{i + 1},256,0,0,0,0,{','.join(map(str, spectrum))}")
+        lines.append(f"$HOUSE,{i},21.5,1013")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def split_bytes(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_lines_split_across_chunks_are_joined():
+    data = make_log([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+    whole = [line for lines in iter_sentence_lines([data]) for line in lines]
+    chunked = [line for lines in iter_sentence_lines(split_bytes(data, 7)) for line in lines]
+
+    assert len(whole) == 3
+    assert chunked == whole
+
+
+def test_last_line_without_newline_is_kept():
+    data = make_log([[1, 2], [3, 4]]).rstrip(b"\n")
+    lines = [line for lines in iter_sentence_lines(split_bytes(data, 16)) for line in lines]
+    assert len(lines) == 2
+    assert lines[-1].endswith(b"3,4")
+
+
+def test_spill_handles_changing_column_count(tmp_path):
+    data = make_log([[1, 2], [3, 4], [5, 6, 7, 8]])
+    summary = spill_candy_segments(split_bytes(data, 64), str(tmp_path))
+
+    assert summary['rows'] == 3
+    assert summary['channels'] == 4
+    assert summary['time_min'] == 10.0
+    assert summary['time_max'] == 32.0
+    assert summary['header']['detector_type'] == 'AIRDOS04'
+    assert summary['header']['detector_sn'] == '1290c00806a2'
+
+
+def test_segments_stay_in_memory_within_budget(tmp_path):
+    data = make_log([[1, 2], [3, 4], [5, 6, 7, 8]])
+    summary = spill_candy_segments(split_bytes(data, 64), str(tmp_path), memory_budget=2**40)
+
+    assert all(isinstance(segment, dict) for segment in summary['segments'])
+    assert not os.listdir(tmp_path)
+
+    path = os.path.join(tmp_path, 'out.parquet')
+    write_spectral_parquet(summary, path, memory_budget=2**40)
+    assert os.listdir(tmp_path) == ['out.parquet']
+    assert read_spectral_parquet(path).channels.tolist() == [[1, 2, 0, 0], [3, 4, 0, 0], [5, 6, 7, 8]]
+
+
+def test_segments_spill_above_budget(tmp_path):
+    data = make_log([[1, 2], [3, 4], [5, 6, 7, 8]])
+    summary = spill_candy_segments(split_bytes(data, 64), str(tmp_path), memory_budget=1)
+
+    assert len(summary['segments']) > 1
+    assert all(os.path.exists(segment) for segment in summary['segments'])
+
+
+def test_artifact_is_padded_and_normalized(tmp_path):
+    data = make_log([[1, 2], [3, 4], [5, 6, 7, 8]])
+    summary = spill_candy_segments(split_bytes(data, 64), str(tmp_path))
+    path = os.path.join(tmp_path, 'out.parquet')
+
+    layout = write_spectral_parquet(summary, path)
+    arrays = read_spectral_parquet(path)
+
+    assert layout['channels_count'] == 4
+    assert arrays.first_channel == FIRST_CHANNEL
+    assert arrays.channels.dtype == np.uint16
+    assert list(arrays.time_ms) == [0.0, 11.0, 22.0]
+    np.testing.assert_array_equal(arrays.channels, [[1, 2, 0, 0], [3, 4, 0, 0], [5, 6, 7, 8]])
+
+
+def test_tokenizer_returns_typed_arrays():
+    lines = [
+        b"$CANDY,0,10,25583,1,256,0,0,0,0,5693,14394,329,1",
+        b"$CANDY,1,21,25606,9,256,0,0,0,0,5813,14251,321,6,1,1",
+    ]
+    time_ms, particle_count, channels = tokenize_sentences(lines)
+
+    assert time_ms.dtype == np.float64
+    assert particle_count.dtype == np.int64
+    assert channels.dtype == np.uint16
+    np.testing.assert_array_equal(time_ms, [10, 21])
+    np.testing.assert_array_equal(particle_count, [25583, 25606])
+    np.testing.assert_array_equal(channels, [[5693, 14394, 329, 1, 0, 0], [5813, 14251, 321, 6, 1, 1]])
+
+
+def test_tokenizer_widens_dtype_for_large_counts():
+    _, _, channels = tokenize_sentences([b"$CANDY,0,10,1,1,256,0,0,0,0,70000,2"])
+    assert channels.dtype == np.uint32
+    assert channels[0, 0] == 70000
+
+
+def test_tokenizer_fallback_for_decimal_time_and_bad_lines():
+    lines = [
+        b"$HIST,0,10.5,3,1,256,0,0,0,0,7,8",
+        b"$HIST,1,garbage,3",
+        b"$HIST,2,20.25,4,1,256,0,0,0,0,9,,1",
+    ]
+    time_ms, particle_count, channels = tokenize_sentences(lines, HIST_SENTENCE)
+
+    np.testing.assert_array_equal(time_ms, [10.5, 20.25])
+    np.testing.assert_array_equal(particle_count, [3, 4])
+    np.testing.assert_array_equal(channels, [[7, 8, 0], [9, 0, 1]])
+
+
+def test_tokenizer_skips_lines_without_channels():
+    lines = [
+        b"$CANDY,0,10,3,1,256,0,0,0,0,7,8",
+        b"$CANDY,1,21,4,1,256,0,0",
+        b"$CANDY,2,33,5,1,256,0,0,0",
+    ]
+    time_ms, particle_count, channels = tokenize_sentences(lines)
+
+    np.testing.assert_array_equal(time_ms, [10])
+    np.testing.assert_array_equal(channels, [[7, 8]])
+
+    time_ms, _, channels = tokenize_sentences(lines[1:])
+    assert time_ms.shape == (0,)
+    assert channels.shape == (0, 0)
+
+
+def test_tokenizer_falls_back_for_offending_lines_only(monkeypatch):
+    fallback_lines = []
+    fallback = spectral_parser._tokenize_fallback
+    monkeypatch.setattr(spectral_parser, '_tokenize_fallback', lambda lines: fallback_lines.extend(lines) or fallback(lines))
+    lines = [
+        b"$CANDY,0,10.5,3,1,256,-2,0,0,0,7,8",
+        b"$CANDY,1,21,4,1,256,0,0,n/a,0,9,1",
+        b"$CANDY,2,33.25,5,1,256,0,0,0,0,1,2,3",
+        b"$CANDY,3,44,6,1,256,0,0,0,0,4,5",
+    ]
+    time_ms, particle_count, channels, aux = tokenize_sentences(lines, aux=True)
+
+    assert fallback_lines == [b"1,21,4,1,256,0,0,n/a,0,9,1"]
+    np.testing.assert_array_equal(time_ms, [10.5, 33.25, 44])
+    np.testing.assert_array_equal(particle_count, [3, 5, 6])
+    np.testing.assert_array_equal(channels, [[7, 8, 0], [1, 2, 3], [4, 5, 0]])
+    assert aux[0, 3] == -2  # log column 6
+
+
+def test_parse_header():
+    header = parse_header(b"$DOS,AIRDOS04,F4,256,f157c1d,origin,1290c00806a2\r\n")
+    assert header['detector_type'] == 'AIRDOS04'
+    assert header['channels'] == '256'
+    assert header['detector_sn'] == '1290c00806a2'
+
+
+def test_byte_ranges_cover_every_line_once():
+    data = make_log([[i, i + 1, i + 2] for i in range(40)])
+
+    for parts in (1, 2, 3, 7, 16, 50, 200):
+        for chunk_size in (1, 2, 3, 5, 13):
+            pieces = []
+            for start, end in split_byte_ranges(len(data), parts):
+                chunks = split_bytes(data[max(start - 1, 0):], chunk_size)
+                pieces.append(b"".join(iter_line_range(chunks, start, end)))
+            assert b"".join(pieces) == data, (parts, chunk_size)
+
+
+def test_range_ending_on_newline_stops_there():
+    data = b"aa\nbb\ncc\n"
+
+    for chunk_size in (1, 2, 3, 4, 100):
+        assert b"".join(iter_line_range(split_bytes(data, chunk_size), 0, 3)) == b"aa\n"
+        assert b"".join(iter_line_range(split_bytes(data, chunk_size), 0, 4)) == b"aa\nbb\n"
+        assert b"".join(iter_line_range(split_bytes(data[2:], chunk_size), 3, 6)) == b"bb\n"
+
+
+def test_parallel_summaries_merge_in_file_order(tmp_path):
+    data = make_log([[1, 2], [3, 4], [5, 6, 7], [8, 9]])
+    summaries = []
+    for index, (start, end) in enumerate(split_byte_ranges(len(data), 3)):
+        chunks = iter_line_range([data[max(start - 1, 0):]], start, end)
+        summaries.append(spill_candy_segments(chunks, str(tmp_path), prefix=f"part_{index}"))
+
+    summary = merge_summaries(summaries)
+    path = os.path.join(tmp_path, 'out.parquet')
+    write_spectral_parquet(summary, path)
+    arrays = read_spectral_parquet(path)
+
+    assert summary['rows'] == 4
+    assert summary['time_min'] == 10.0
+    assert list(arrays.time_ms) == [0.0, 11.0, 22.0, 33.0]
+    np.testing.assert_array_equal(arrays.channels, [[1, 2, 0], [3, 4, 0], [5, 6, 7], [8, 9, 0]])
+
+
+def test_parse_resumes_from_segment_offset(tmp_path):
+    data = make_log([[i, i + 1, i + 2] for i in range(40)])
+    full = spill_candy_segments(split_bytes(data, 100), str(tmp_path / 'full'), memory_budget=2**40)
+
+    # interrupt after the third segment, resume from the offset reported for it
+    checkpoints = []
+
+    def on_segment(summary, end):
+        checkpoints.append((dict(summary, segments=list(summary['segments'])), end))
+
+    spill_candy_segments(split_bytes(data, 100), str(tmp_path), memory_budget=2**40, on_segment=on_segment)
+    summary, offset = checkpoints[2]
+    assert data[offset - 1:offset] == b"\n"
+
+    resumed = spill_candy_segments(split_bytes(data[offset:], 100), str(tmp_path), memory_budget=2**40,
+                                   start=offset, summary=summary)
+
+    assert resumed['rows'] == full['rows'] == 40
+    assert resumed['time_max'] == full['time_max']
+    times = np.concatenate([segment['time_ms'] for segment in resumed['segments']])
+    assert list(times) == [10 + 11 * i for i in range(40)]
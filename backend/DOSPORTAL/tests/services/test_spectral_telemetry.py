@@ -0,0 +1,62 @@
+"""Tests for auxiliary $CANDY fields and telemetry extraction."""
+
+import numpy as np
+import pytest
+
+from DOSPORTAL.services.spectral_parser import spill_candy_segments, tokenize_telemetry
+from DOSPORTAL.services.spectral_telemetry import read_telemetry, write_telemetry_parquet
+
+
+# $HOUSE: sequence, temperature, pressure, supply voltage, no time of its own
+LOG = (
+    b"$DOS,AIRDOS04,F4,256,f157c1d,origin,1290c00806a2\n"
+    b"$HOUSE,0,22.0,1013.0\n"
+    b"$CANDY,0,1000,5,7,0,0,0,0,1,1,2,3\n"
+    b"$HOUSE,1,23.5,1013.2\n"
+    b"$CANDY,1,2000,6,8,0,0,0,0,2,4,5,6\n"
+    b"$HIST,0,2000,1,2,3\n"
+    b"$HOUSE,2,24.0,n/a,4.98\n"
+    b"$CANDY,2,3000,7,9,0,0,0,0,3,7,8,9\n"
+)
+
+
+def test_tokenize_telemetry_by_sentence():
+    tables, times = tokenize_telemetry(
+        [b"$HOUSE,0,23.5,1013.2", b"$GPS,1,50.1", b"$HOUSE,1,,1013.5,4.98"], time_ms=[1000.0, 1000.0, 2000.0]
+    )
+
+    assert sorted(tables) == ['GPS', 'HOUSE']
+    np.testing.assert_array_equal(tables['HOUSE'], [[0, 23.5, 1013.2, np.nan], [1, np.nan, 1013.5, 4.98]])
+    np.testing.assert_array_equal(tables['GPS'], [[1, 50.1]])
+    assert list(times['HOUSE']) == [1000.0, 2000.0]
+
+
+@pytest.mark.parametrize('line_chunks', [True, False])
+def test_telemetry_round_trip(tmp_path, line_chunks):
+    # with one chunk per line, every sentence ends up in its own segment
+    chunks = [line + b"\n" for line in LOG.split(b"\n") if line] if line_chunks else [LOG]
+    summary = spill_candy_segments(chunks, str(tmp_path), memory_budget=1024 * 1024)
+
+    assert summary['rows'] == 3
+    assert summary['telemetry'] == {'HOUSE': 4}
+    assert summary['header']['detector_type'] == 'AIRDOS04'
+
+    path = str(tmp_path / 'telemetry.parquet')
+    metadata = write_telemetry_parquet(summary, path, row_group_rows=2)
+
+    assert metadata['sentences'] == {
+        'CANDY': {'rows': 3, 'fields': ['field_1', 'field_4', 'field_5', 'field_6', 'field_7', 'field_8', 'field_9']},
+        'HOUSE': {'rows': 3, 'fields': ['field_1', 'field_2', 'field_3', 'field_4']},
+    }
+
+    # time is relative to the first $CANDY exposure, like the spectral artifact,
+    # telemetry takes the time of the exposure logged before it
+    time_ms, values = read_telemetry(path, 'HOUSE', ['field_2', 'field_3'])
+    assert list(time_ms) == [0.0, 0.0, 1000.0]
+    assert list(values['field_2']) == [22.0, 23.5, 24.0]
+    assert np.isnan(values['field_3'][2])
+
+    time_ms, values = read_telemetry(path, 'CANDY', ['field_1', 'field_4'], time_from=1000.0)
+    assert list(time_ms) == [1000.0, 2000.0]
+    assert list(values['field_1']) == [1.0, 2.0]
+    assert list(values['field_4']) == [8.0, 9.0]
@@ -0,0 +1,77 @@
+"""Tests for routing of background tasks to django-q clusters."""
+
+from DOSPORTAL import task_queues
+from DOSPORTAL.services import processing_progress
+from DOSPORTAL.task_queues import (
+    INGEST,
+    INGEST_LARGE,
+    ingest_cluster,
+    ingest_heartbeat,
+    ingest_lock_ttl,
+    release_ingest_lock,
+    schedule_ingest,
+)
+
+
+def test_ingest_cluster_by_log_size(settings):
+    settings.SPECTRAL_LARGE_LOG_SIZE = 1000
+
+    assert ingest_cluster(999) == INGEST
+    assert ingest_cluster(1000) == INGEST_LARGE
+    # size not known yet
+    assert ingest_cluster(None) == INGEST
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def publish(self, channel, message):
+        pass
+
+
+class StubRecord:
+    id = 'record'
+    raw_file = None
+    processing_status = 'pending'
+
+
+def test_ingest_lock_ttl_follows_cluster_timeout(settings):
+    settings.Q_CLUSTER = {'timeout': 60, 'retry': 120, 'ALT_CLUSTERS': {'slow': {'timeout': 600}}}
+
+    assert ingest_lock_ttl(INGEST) == 60 + task_queues.INGEST_LOCK_MARGIN
+    assert ingest_lock_ttl('slow') == 600 + task_queues.INGEST_LOCK_MARGIN
+
+
+def test_ingest_is_queued_once_until_released(settings, monkeypatch):
+    settings.SPECTRAL_LARGE_LOG_SIZE = 1000
+    queued = []
+    monkeypatch.setattr(processing_progress, '_client', FakeRedis())
+    monkeypatch.setattr(task_queues, 'async_task', lambda func, *args, **kwargs: queued.append(args) or 'task')
+
+    assert schedule_ingest(StubRecord()) == 'task'
+    assert schedule_ingest(StubRecord()) is None
+    release_ingest_lock(StubRecord.id)
+    assert schedule_ingest(StubRecord()) == 'task'
+    assert queued == [('record',), ('record',)]
+
+
+def test_heartbeat_keeps_the_ingest_key(settings, monkeypatch):
+    monkeypatch.setattr(processing_progress, '_client', FakeRedis())
+    monkeypatch.setattr(task_queues, 'async_task', lambda func, *args, **kwargs: 'task')
+
+    assert schedule_ingest(StubRecord()) == 'task'
+    # expired while the task was queued, taken again by the running task
+    release_ingest_lock(StubRecord.id)
+    ingest_heartbeat(StubRecord())()
+    assert schedule_ingest(StubRecord()) is None
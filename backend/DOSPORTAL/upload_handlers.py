@@ -0,0 +1,37 @@
+"""
+Upload handlers computing a content hash while the upload streams in.
+
+The hash is attached to the resulting UploadedFile as `content_hash` and
+stored on `File.content_hash`, so identical raw logs can be recognized
+without reading them again from storage.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+CONTENT_HASH_ALGORITHM = 'sha256'
+
+
+class ContentHashMixin:
+    def new_file(self, *args, **kwargs):
+        self.content_hash = hashlib.new(CONTENT_HASH_ALGORITHM)
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.content_hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self.content_hash.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
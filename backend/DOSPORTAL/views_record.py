@@ -11,7 +11,9 @@ import django_tables2 as tables
 from django.utils.html import format_html
 from django.urls import reverse
 
-from django_q.tasks import async_task
+from .task_queues import schedule_dose
+from .services.log_metadata import read_log_metadata
+from .services.spectral_parser import parse_header
 
 import itertools
 
@@ -75,41 +77,19 @@ def handle_uploaded_file(f, file):
 
 
 def obtain_parameters_from_log(file):
-
-    f = open(file)
-    line_1 = f.readline().rstrip().split(',')
-    record_metadata = {}
-    record_metadata['detector'] = dict(zip(['DET', 'detector_type', 'firmware_build', 'channels', 'firmware_commit', 'firmware_origin', 'detector_sn'], line_1))
-
-    time_start = 0
-    while True:
-        line = f.readline()
-        if line.startswith('$HIST'):
-            line = line.rstrip().split(',')
-            time_start = float(line[2])
-            break
-    i = -1
-    flen = len(f.readlines())
-    while True:
-        f.seek(flen+i)
-        line = f.readline()
-        if line.startswith('$HIST'):
-            line = line.rstrip().split(',')
-            time_stop = float(line[2])
-            count = int(line[1])
-            break
-        i -= 1
-    
-    record_metadata['record'] = {}
-    record_metadata['record'] = {
-        'duration': time_stop - time_start,
-        'count': count
+    # only the first and the last few KB of the log are read
+    with open(file, 'rb') as f:
+        detector = parse_header(f.readline())
+        metadata = read_log_metadata(f, os.path.getsize(file))
+
+    return {
+        'detector': detector,
+        'record': {
+            'duration': metadata['duration_ms'],
+            'count': metadata['exposures_estimate'],
+        },
     }
 
-
-    f.close()
-    return record_metadata
-
 def RecordNewView(request):
     if request.method == "POST":
         print("POST... s formulářem :) ")
@@ -302,7 +282,7 @@ def CalcDSI(request, pk):
 #     return HttpResponse(f"Dose rate: {dose_rate} \n  \n" + str(df), content_type="text/csv")
 
 
-    t = async_task('DOSPORTAL.tasks.process_record_entry', pk)
+    t = schedule_dose(pk)
 
 
     return HttpResponse(f"Done {t}")
\ No newline at end of file
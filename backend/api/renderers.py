@@ -0,0 +1,91 @@
+"""
+Binary columnar renderers of chart data, selected by the Accept header.
+
+Views pass ColumnarData (NumPy arrays plus a few scalars) instead of lists
+of lists, the buffers are written as they are, without a Python object per
+element. Responses which are not ColumnarData (errors) are rendered as JSON.
+
+application/vnd.apache.arrow.stream
+    Arrow IPC stream of one record batch, scalars are JSON in the schema
+    metadata under `dosportal.meta`.
+
+application/x-dosportal-columns
+    Raw little-endian arrays for clients without an Arrow library:
+
+        b'DOSC' | uint32 header length | header JSON, space padded to 8 bytes
+        | column buffers, each padded to 8 bytes
+
+    The header is {"meta": {...}, "columns": [{"name", "dtype", "length",
+    "offset"}, ...]}, `dtype` is a NumPy type string (e.g. `<f4`) and
+    `offset` counts from the end of the header.
+"""
+import json
+import struct
+from dataclasses import dataclass, field
+
+import numpy as np
+import pyarrow as pa
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+COLUMNS_MAGIC = b'DOSC'
+ALIGNMENT = 8
+
+
+@dataclass
+class ColumnarData:
+    """Equal length columns of chart data and scalars describing them."""
+    columns: dict
+    meta: dict = field(default_factory=dict)
+
+
+def _pad(length):
+    return -length % ALIGNMENT
+
+
+class _ColumnarRenderer(BaseRenderer):
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, ColumnarData):
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = JSONRenderer.media_type
+            return JSONRenderer().render(data)
+        return self.render_columns(data)
+
+
+class ArrowStreamRenderer(_ColumnarRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+    def render_columns(self, data):
+        table = pa.table(
+            {name: pa.array(values) for name, values in data.columns.items()},
+            metadata={'dosportal.meta': json.dumps(data.meta)},
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+class ColumnsRenderer(_ColumnarRenderer):
+    media_type = 'application/x-dosportal-columns'
+    format = 'columns'
+
+    def render_columns(self, data):
+        buffers = []
+        columns = []
+        offset = 0
+        for name, values in data.columns.items():
+            values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+            columns.append({'name': name, 'dtype': values.dtype.str, 'length': len(values), 'offset': offset})
+            buffers.append(memoryview(values).cast('B'))
+            buffers.append(b'\0' * _pad(values.nbytes))
+            offset += values.nbytes + _pad(values.nbytes)
+
+        header = json.dumps({'meta': data.meta, 'columns': columns}).encode()
+        # magic and length take 8 bytes, buffers start aligned
+        header += b' ' * _pad(len(header))
+        return b''.join([COLUMNS_MAGIC, struct.pack('<I', len(header)), header, *buffers])
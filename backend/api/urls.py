@@ -25,8 +25,10 @@ urlpatterns = [
     path("spectral-record/", spectrals.SpectralRecordList),
     path("spectral-record/create/", spectrals.SpectralRecordCreate),
     path("spectral-record/<uuid:record_id>/", spectrals.SpectralRecordDetail),
+    path("spectral-record/<uuid:record_id>/status/", spectrals.SpectralRecordStatus),
     path("spectral-record/<uuid:record_id>/evolution/", spectrals.SpectralRecordEvolution),
     path("spectral-record/<uuid:record_id>/spectrum/", spectrals.SpectralRecordSpectrum),
+    path("spectral-record/<uuid:record_id>/telemetry/", spectrals.SpectralRecordTelemetry),
     path("spectral-record-artifact/", spectrals.SpectralRecordArtifactList),
     # Detectors
     path("detector/", views.DetectorGet),
@@ -47,8 +47,10 @@ from .spectrals import (
     SpectralRecordList,
     SpectralRecordCreate,
     SpectralRecordDetail,
+    SpectralRecordStatus,
     SpectralRecordEvolution,
     SpectralRecordSpectrum,
+    SpectralRecordTelemetry,
 )
 
 __all__ = [
@@ -90,6 +92,8 @@ __all__ = [
     "SpectralRecordList",
     "SpectralRecordCreate",
     "SpectralRecordDetail",
+    "SpectralRecordStatus",
     "SpectralRecordEvolution",
     "SpectralRecordSpectrum",
+    "SpectralRecordTelemetry",
 ]
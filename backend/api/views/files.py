@@ -178,6 +178,7 @@ def FileUpload(request):
                 'filename': file_obj.filename,
                 'file_type': file_obj.file_type,
                 'size': file_obj.size,
+                'metadata': file_obj.metadata,
                 'created_at': file_obj.created_at.isoformat(),
             }, status=status.HTTP_201_CREATED)
         
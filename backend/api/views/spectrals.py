@@ -1,18 +1,38 @@
 """
 API views for SpectralRecord management with Parquet support.
 """
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-import pandas as pd
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 import numpy as np
 
+import datetime
 import logging
 from DOSPORTAL.models import File, OrganizationUser
 from DOSPORTAL.models.detectors import Detector
 from DOSPORTAL.models.spectrals import SpectralRecord, SpectralRecordArtifact
+from DOSPORTAL.services.array_cache import spectral_array_cache
+from DOSPORTAL.services.spectral_artifacts import ARRAY_COLUMNS, open_artifact, read_spectral_parquet
+from DOSPORTAL.services.spectral_evolution import (
+    DOWNSAMPLE_LTTB,
+    DOWNSAMPLE_METHODS,
+    RAW_RESOLUTION,
+    choose_level,
+    downsample_indices,
+    exposure_time,
+    read_evolution_level,
+)
+from DOSPORTAL.services.spectral_index import CumulativeSpectrumIndex
+from DOSPORTAL.services.spectral_telemetry import read_telemetry
+from DOSPORTAL.services.processing_progress import read_progress, wait_for_progress
+from DOSPORTAL.services.log_metadata import METADATA_KEY, read_stored_log_metadata
+from DOSPORTAL.services.result_cache import get_result, result_key, store_result
 from .organizations import check_org_member_permission
+from ..renderers import ArrowStreamRenderer, ColumnarData, ColumnsRenderer
 from ..serializers.organizations import UserSummarySerializer
 from ..serializers.measurements import FileSerializer
 
@@ -98,14 +118,19 @@ def SpectralRecordCreate(request):
         else:
             # Use raw file's owner by default
             owner = raw_file.owner
-        
+
+        log_metadata = _raw_log_metadata(raw_file)
+        duration_ms = log_metadata.get('duration_ms') if log_metadata else None
+
         record = SpectralRecord.objects.create(
             name=data.get('name', 'Spectral Record'),
             raw_file=raw_file,
             author=request.user,
             owner=owner,
             description=data.get('description', ''),
-            processing_status=SpectralRecord.PROCESSING_PENDING
+            processing_status=SpectralRecord.PROCESSING_PENDING,
+            metadata={METADATA_KEY: log_metadata} if log_metadata else {},
+            record_duration=datetime.timedelta(milliseconds=duration_ms) if duration_ms is not None else None,
         )
         
         # Optionally attach a detector
@@ -122,6 +147,7 @@ def SpectralRecordCreate(request):
             'id': str(record.id),
             'name': record.name,
             'processing_status': record.processing_status,
+            'log_metadata': log_metadata,
             'message': 'SpectralRecord created, async processing scheduled'
         }, status=status.HTTP_201_CREATED)
         
@@ -132,6 +158,26 @@ def SpectralRecordCreate(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def _raw_log_metadata(raw_file):
+    """
+    Header and time range of a raw log, extracted at upload. Files uploaded
+    earlier are read at both ends now, best effort: None when that fails.
+    """
+    file_metadata = raw_file.metadata if isinstance(raw_file.metadata, dict) else {}
+    log_metadata = file_metadata.get(METADATA_KEY)
+    if log_metadata is not None:
+        return log_metadata
+    try:
+        log_metadata = read_stored_log_metadata(raw_file.file)
+    except Exception as e:
+        logger.warning(f"Metadata of log file {raw_file.id} not read: {str(e)}")
+        return None
+    if isinstance(raw_file.metadata, dict):
+        raw_file.metadata[METADATA_KEY] = log_metadata
+        raw_file.save(update_fields=['metadata'])
+    return log_metadata
+
+
 def check_spectral_record_permission(user, record):
     """Check if user has access to spectral record."""
     if not record.owner:
@@ -171,6 +217,8 @@ def SpectralRecordDetail(request, record_id):
             'artifacts_count': record.artifacts.count(),
             'description': record.description,
             'detector': {'id': str(record.detector.id), 'name': record.detector.name} if record.detector else None,
+            'processing_stats': record.processing_stats,
+            'log_metadata': (record.metadata or {}).get(METADATA_KEY),
         }
         
         return Response(data)
@@ -183,6 +231,57 @@ def SpectralRecordDetail(request, record_id):
         )
 
 
+STATUS_MAX_WAIT = 25  # seconds, below common proxy read timeouts
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def SpectralRecordStatus(request, record_id):
+    """Get processing status and progress of a spectral record.
+    Progress is read from Redis, published by the ingestion task. With `wait` (seconds)
+    the request is held until progress newer than `since` (the last `updated`) is
+    published, so clients long-poll instead of polling the record detail.
+
+    Returns {id, processing_status, stage, percent, updated}
+    """
+    try:
+        try:
+            wait = min(max(float(request.GET.get('wait', 0)), 0.0), STATUS_MAX_WAIT)
+            since = float(request.GET.get('since', 0))
+        except ValueError:
+            return Response({'error': 'wait and since must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            record = SpectralRecord.objects.only('id', 'processing_status', 'owner', 'author').get(id=record_id)
+        except SpectralRecord.DoesNotExist:
+            return Response({'error': 'SpectralRecord not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        has_permission, _ = check_spectral_record_permission(request.user, record)
+        if not has_permission:
+            return Response(
+                {'error': 'You do not have permission to access this record'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if wait:
+            progress = wait_for_progress(record.id, since, wait)
+        else:
+            progress = read_progress(record.id)
+
+        if progress is None:
+            # nothing published (expired or Redis unavailable), the database status is authoritative
+            progress = {'processing_status': record.processing_status, 'stage': None, 'percent': None, 'updated': None}
+
+        return Response({'id': str(record.id), **progress})
+
+    except Exception as e:
+        logger.exception(f'Failed to get spectral record status: {str(e)}')
+        return Response(
+            {'error': 'Failed to get spectral record status.'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def SpectralRecordArtifactList(request):
@@ -241,9 +340,12 @@ def SpectralRecordArtifactList(request):
         )
 
 
-def _load_spectral_parquet(record):
-    """Load Parquet DataFrame from a completed SpectralRecord's artifact.
-    Returns (df, error_response). If error_response is not None, return it directly.
+def _load_spectral_parquet(record, time_from=None, time_to=None, columns=None, channel_range=None):
+    """Load decoded spectral arrays from a completed SpectralRecord's artifact.
+    Only `columns` (see ARRAY_COLUMNS, default all) are decoded, `channel_range` restricts the channels.
+    Artifacts fitting the per-process cache are decoded whole once and windowed in memory,
+    otherwise with time_from/time_to (ms from record start) only the overlapping row groups are read.
+    Returns (data, error_response). If error_response is not None, return it directly.
     """
     if record.processing_status != SpectralRecord.PROCESSING_COMPLETED:
         return None, Response(
@@ -252,7 +354,7 @@ def _load_spectral_parquet(record):
         )
 
     try:
-        artifact = SpectralRecordArtifact.objects.get(
+        artifact = SpectralRecordArtifact.objects.select_related('artifact').get(
             spectral_record=record,
             artifact_type=SpectralRecordArtifact.SPECTRAL_FILE
         )
@@ -262,21 +364,276 @@ def _load_spectral_parquet(record):
             status=status.HTTP_404_NOT_FOUND
         )
 
-    artifact.artifact.file.open('rb')
-    df = pd.read_parquet(artifact.artifact.file, engine='fastparquet')
-    artifact.artifact.file.close()
-    
-    channel_cols = [col for col in df.columns if col.startswith('channel_')]
-    df[channel_cols] = df[channel_cols].fillna(0)
-    return df, None
+    columns = tuple(sorted(ARRAY_COLUMNS if columns is None else columns))
+    artifact_file = artifact.artifact
+    cache = spectral_array_cache()
+    if not cache.max_bytes or _decoded_size(artifact_file, columns) > cache.max_bytes:
+        with open_artifact(artifact_file.file) as f:
+            data = read_spectral_parquet(
+                f, time_from=time_from, time_to=time_to, columns=columns, channel_range=channel_range
+            )
+            return data, None
+
+    def load():
+        with open_artifact(artifact_file.file) as f:
+            return read_spectral_parquet(f, columns=columns)
+
+    # artifact files are immutable, the content hash tells regenerated ones apart
+    key = ('spectral', artifact_file.id, artifact_file.content_hash or artifact_file.size, columns)
+    data = cache.get_or_load(key, load, lambda data: data.nbytes)
+    return data.window(time_from, time_to).select_channels(channel_range), None
+
+
+def _decoded_size(artifact_file, columns):
+    """Estimated bytes of the decoded `columns` of a spectral artifact, 0 when unknown."""
+    metadata = artifact_file.metadata or {}
+    try:
+        row_bytes = 8 * len([column for column in columns if column != 'channels'])
+        if 'channels' in columns:
+            row_bytes += np.dtype(metadata['channel_dtype']).itemsize * metadata['channels_count']
+        return metadata['records_count'] * row_bytes
+    except (KeyError, TypeError):
+        return 0
+
+
+TIME_BASE_RELATIVE = 'relative'
+TIME_BASE_ABSOLUTE = 'absolute'
+
+
+def _parse_time_base(request, record):
+    """Read the optional time_base query parameter. Times are ms from the record start (relative),
+    or Unix times in ms (absolute), for time tracked records only.
+    Returns (offset_ms, error_response), offset_ms is the record start in the requested time base.
+    """
+    time_base = request.GET.get('time_base') or TIME_BASE_RELATIVE
+    if time_base == TIME_BASE_RELATIVE:
+        return 0.0, None
+    if time_base != TIME_BASE_ABSOLUTE:
+        return None, Response({'error': 'time_base must be relative or absolute'}, status=status.HTTP_400_BAD_REQUEST)
+    if not record.time_tracked or record.time_start is None:
+        return None, Response(
+            {'error': 'Absolute time is only available for time tracked records'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return record.time_start.timestamp() * 1000, None
+
+
+def _parse_time_window(request, offset=0.0):
+    """Read optional time_from/time_to query parameters, shifted by `offset` to ms from record start.
+    Returns (time_from, time_to, error_response).
+    """
+    window = []
+    for name in ('time_from', 'time_to'):
+        value = request.GET.get(name)
+        if value in (None, ''):
+            window.append(None)
+            continue
+        try:
+            window.append(float(value) - offset)
+        except ValueError:
+            return None, None, Response({'error': f'{name} must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    return window[0], window[1], None
+
+
+def _parse_channel_window(request, record):
+    """Read optional channel_from/channel_to (log channel numbers) or energy_from/energy_to (keV)
+    query parameters, energies are converted to channels with the record's calibration.
+    Returns (channel_range, error_response), channel_range is an inclusive (first, last) or None.
+    """
+    bounds = {}
+    for name in ('channel_from', 'channel_to', 'energy_from', 'energy_to'):
+        value = request.GET.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            bounds[name] = float(value)
+        except ValueError:
+            return None, Response({'error': f'{name} must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    has_channels = 'channel_from' in bounds or 'channel_to' in bounds
+    has_energies = 'energy_from' in bounds or 'energy_to' in bounds
+    if has_channels and has_energies:
+        return None, Response(
+            {'error': 'Use either a channel or an energy window, not both'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if has_channels:
+        return (bounds.get('channel_from', -np.inf), bounds.get('channel_to', np.inf)), None
+
+    if has_energies:
+        calib = record.calib
+        if calib is None or calib.coef1 <= 0:
+            return None, Response(
+                {'error': 'Energy window requires a calibrated record'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # inverse of the keV scale of the spectrum (coef0 + channel * coef1) / 1000
+        first = np.ceil((bounds.get('energy_from', -np.inf) * 1000 - calib.coef0) / calib.coef1)
+        last = np.floor((bounds.get('energy_to', np.inf) * 1000 - calib.coef0) / calib.coef1)
+        return (first, last), None
+
+    return None, None
+
+
+def _parse_max_points(request):
+    """Read the optional max_points query parameter. Returns (max_points, error_response)."""
+    value = request.GET.get('max_points')
+    if value in (None, ''):
+        return settings.SPECTRAL_EVOLUTION_MAX_POINTS, None
+    try:
+        max_points = int(value)
+    except ValueError:
+        max_points = 0
+    if max_points <= 0:
+        return None, Response({'error': 'max_points must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return max_points, None
+
+
+def _parse_downsample(request):
+    """Read the optional downsample query parameter. Returns (method, error_response)."""
+    method = request.GET.get('downsample') or DOWNSAMPLE_LTTB
+    if method not in DOWNSAMPLE_METHODS:
+        return None, Response(
+            {'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return method, None
+
+
+def _load_evolution_pyramid(record, max_points, time_from=None, time_to=None):
+    """Read the evolution pyramid level fitting `max_points` within the time window.
+    Returns (resolution_ms, level, total_time), or None when the record has no pyramid artifact.
+    """
+    artifact = SpectralRecordArtifact.objects.filter(
+        spectral_record=record,
+        artifact_type=SpectralRecordArtifact.EVOLUTION_PYRAMID
+    ).select_related('artifact').first()
+    if artifact is None:
+        return None
+
+    metadata = artifact.artifact.metadata
+    record_start, record_end = metadata['time_range_ms']
+    resolution_ms = choose_level(metadata['levels'], metadata['time_range_ms'], max_points, time_from, time_to)
+    with open_artifact(artifact.artifact.file) as artifact_file:
+        level = read_evolution_level(artifact_file, resolution_ms, time_from, time_to)
+
+    window_start = record_start if time_from is None else max(time_from, record_start)
+    window_end = record_end if time_to is None else min(time_to, record_end)
+    total_time = window_end - window_start
+    if total_time <= 0:
+        total_time = 1.0
+    return resolution_ms, level, total_time
+
+
+def _load_window_spectrum(record, time_from=None, time_to=None):
+    """Summed spectrum of a time window from the cumulative spectrum index.
+    Returns (channel_counts, channel_numbers, total_time), or None when the record has no index artifact.
+    """
+    artifact = SpectralRecordArtifact.objects.filter(
+        spectral_record=record,
+        artifact_type=SpectralRecordArtifact.SPECTRUM_INDEX
+    ).select_related('artifact').first()
+    if artifact is None:
+        return None
+
+    metadata = artifact.artifact.metadata
+    with open_artifact(artifact.artifact.file) as artifact_file:
+        index = CumulativeSpectrumIndex(
+            artifact_file, metadata['time_checkpoints'], metadata['checkpoint_rows'], metadata['channel_dtype']
+        )
+        counts, first_time, last_time = index.window(time_from, time_to)
+
+    channel_numbers = np.arange(metadata['first_channel'], metadata['first_channel'] + len(counts))
+    total_time = _total_time(np.array([first_time, last_time])) if first_time is not None else 1.0
+    return counts, channel_numbers, total_time
+
+
+# chart data is JSON by default, binary columns when requested by the Accept header
+CHART_DATA_RENDERERS = [JSONRenderer, BrowsableAPIRenderer, ArrowStreamRenderer, ColumnsRenderer]
+
+
+def _wants_columns(request):
+    """True when the negotiated response format is a binary columnar one."""
+    return isinstance(request.accepted_renderer, (ArrowStreamRenderer, ColumnsRenderer))
+
+
+def _result_cache_key(view, request, record):
+    """Key of the shared result cache for a derived response of `record` to `request`."""
+    artifact_ids = record.artifacts.values_list('artifact_id', flat=True)
+    params = [(name, value) for name, values in request.GET.lists() for value in values]
+    # absolute time windows depend on the record start
+    params.append(('time_start', record.time_start.isoformat() if record.time_start else None))
+    params.append(('format', request.accepted_renderer.format if _wants_columns(request) else 'json'))
+    return result_key(view, record.id, artifact_ids, record.calib, params)
+
+
+def _cached_response(request, key):
+    """Response rendered earlier by any web process, None on a miss."""
+    content = get_result(key)
+    if content is None:
+        return None
+    media_type = request.accepted_renderer.media_type if _wants_columns(request) else JSONRenderer.media_type
+    return HttpResponse(content, content_type=media_type)
+
+
+def _cache_response(request, record, key, data):
+    renderer = request.accepted_renderer if _wants_columns(request) else JSONRenderer()
+    store_result(record.id, key, renderer.render(data))
+    return Response(data)
+
+
+def _total_time(time_ms):
+    if not len(time_ms):
+        return 1.0
+    total_time = float(time_ms.max() - time_ms.min())
+    if total_time == 0 or np.isnan(total_time) or np.isinf(total_time):
+        total_time = 1.0  # avoid division by zero for single-row data
+    return total_time
+
+
+def _exposure_time(record):
+    """Duration (ms) of one exposure, the median time between exposures of the whole record,
+    so the cps of a point do not depend on the requested window or pyramid level.
+    Taken from the evolution pyramid metadata, records processed before it was stored
+    read the time column of the spectral artifact.
+    Returns (exposure_ms, error_response).
+    """
+    artifact = SpectralRecordArtifact.objects.filter(
+        spectral_record=record,
+        artifact_type=SpectralRecordArtifact.EVOLUTION_PYRAMID
+    ).select_related('artifact').first()
+    exposure_ms = (artifact.artifact.metadata or {}).get('exposure_ms') if artifact is not None else None
+    if exposure_ms is None:
+        data, err = _load_spectral_parquet(record, columns=('time_ms',))
+        if err:
+            return None, err
+        exposure_ms = exposure_time(data.time_ms)
+    # a lone exposure is shown per second
+    return exposure_ms or 1000.0, None
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(CHART_DATA_RENDERERS)
 def SpectralRecordEvolution(request, record_id):
     """Get counts-per-second evolution over time from Parquet artifact.
-
-    Returns {evolution_values: [[time_ms, cps], ...], total_time: float}
+    Optional time_from/time_to query parameters (ms) restrict the time window, from the record
+    start or with time_base=absolute as Unix times (time tracked records, times in the response too).
+    The finest pre-aggregated resolution giving at most max_points points is used,
+    aggregated points carry the mean and the min/max range of their exposures.
+    Counts of a point are divided by the record's exposure time (exposure_ms), not by the window.
+    Series still longer than max_points are downsampled with `downsample` = lttb (default,
+    Largest-Triangle-Three-Buckets) or minmax (extremes of every bucket), peaks stay visible.
+    With channel_from/channel_to or energy_from/energy_to (keV, calibrated records) only counts
+    of those channels are summed, per exposure from the spectral artifact.
+    Responses are shared by all web processes through the Redis result cache.
+
+    Returns {evolution_values: [[time_ms, cps], ...], total_time: float, exposure_ms: float, resolution_ms: float,
+             evolution_range: [[time_ms, cps_min, cps_max], ...] (aggregated levels only),
+             downsampling: method or null}
+    or, with Accept: application/vnd.apache.arrow.stream or application/x-dosportal-columns,
+    columns time_ms (float64), cps, cps_min, cps_max (float32) and the scalars as meta (see api.renderers)
     """
     try:
 
@@ -289,29 +646,95 @@ def SpectralRecordEvolution(request, record_id):
         if not has_permission:
             return Response({'error': 'You do not have permission to access this record'}, status=status.HTTP_403_FORBIDDEN)
 
-        df, err = _load_spectral_parquet(record)
+        offset, err = _parse_time_base(request, record)
         if err:
             return err
 
-        channel_columns = [col for col in df.columns if col.startswith('channel_')]
+        time_from, time_to, err = _parse_time_window(request, offset)
+        if err:
+            return err
 
-        total_time = float(df['time_ms'].max() - df['time_ms'].min())
-        if total_time == 0 or np.isnan(total_time) or np.isinf(total_time):
-            total_time = 1.0  # avoid division by zero for single-row data
+        channel_range, err = _parse_channel_window(request, record)
+        if err:
+            return err
 
-        row_sums = df[channel_columns].sum(axis=1)
-        counts_per_second = row_sums / total_time 
+        max_points, err = _parse_max_points(request)
+        if err:
+            return err
 
-        # Replace any NaN/inf with 0 to ensure JSON serialization
-        counts_per_second = counts_per_second.replace([np.inf, -np.inf], 0).fillna(0)
-        time_series = df['time_ms'].replace([np.inf, -np.inf], 0).fillna(0)
+        downsample, err = _parse_downsample(request)
+        if err:
+            return err
 
-        evolution_values = list(zip(time_series.astype(float).tolist(), counts_per_second.tolist()))
+        if record.processing_status != SpectralRecord.PROCESSING_COMPLETED:
+            return Response(
+                {'error': f'Processing not completed. Status: {record.processing_status}'},
+                status=status.HTTP_425_TOO_EARLY
+            )
 
-        return Response({
-            'evolution_values': evolution_values,
+        cache_key = _result_cache_key('evolution', request, record)
+        cached = _cached_response(request, cache_key)
+        if cached is not None:
+            return cached
+
+        # the pyramid holds totals of all channels only
+        pyramid = None if channel_range else _load_evolution_pyramid(record, max_points, time_from, time_to)
+        if pyramid is None:
+            # channel windows, or records processed before the pyramid artifact existed
+            columns = ('time_ms', 'total_count') if channel_range is None else ('time_ms', 'channels')
+            data, err = _load_spectral_parquet(record, time_from, time_to, columns=columns, channel_range=channel_range)
+            if err:
+                return err
+            total_time = _total_time(data.time_ms)
+            resolution_ms = RAW_RESOLUTION
+            time_series = data.time_ms
+            row_sums = data.total_count if channel_range is None else data.channels.sum(axis=1, dtype=np.int64)
+            row_min = row_max = row_sums
+        else:
+            resolution_ms, level, total_time = pyramid
+            time_series = level['time_ms']
+            row_sums, row_min, row_max = level['mean'], level['min'], level['max']
+
+        exposure_ms, err = _exposure_time(record)
+        if err:
+            return err
+
+        downsampling = None
+        if len(time_series) > max_points:
+            # bounded by the chart width, not by the record length
+            selected = downsample_indices(time_series, row_sums, max_points, downsample, low=row_min, high=row_max)
+            time_series, row_sums = time_series[selected], row_sums[selected]
+            row_min, row_max = row_min[selected], row_max[selected]
+            downsampling = downsample
+
+        # Replace any NaN/inf with 0 to ensure JSON serialization
+        def cps(values):
+            return np.nan_to_num(values / (exposure_ms / 1000), nan=0.0, posinf=0.0, neginf=0.0)
+
+        time_series = np.nan_to_num(time_series, nan=0.0, posinf=0.0, neginf=0.0) + offset
+        if _wants_columns(request):
+            columns = {'time_ms': time_series.astype(np.float64), 'cps': cps(row_sums).astype(np.float32)}
+            if resolution_ms != RAW_RESOLUTION:
+                columns['cps_min'] = cps(row_min).astype(np.float32)
+                columns['cps_max'] = cps(row_max).astype(np.float32)
+            meta = {
+                'total_time': total_time, 'exposure_ms': exposure_ms,
+                'resolution_ms': resolution_ms, 'downsampling': downsampling,
+            }
+            return _cache_response(request, record, cache_key, ColumnarData(columns, meta))
+
+        response = {
+            'evolution_values': np.column_stack([time_series, cps(row_sums)]).tolist(),
             'total_time': total_time,
-        })
+            'exposure_ms': exposure_ms,
+            'resolution_ms': resolution_ms,
+            'downsampling': downsampling,
+        }
+        if resolution_ms != RAW_RESOLUTION:
+            # spread of the exposures aggregated into every point
+            response['evolution_range'] = np.column_stack([time_series, cps(row_min), cps(row_max)]).tolist()
+
+        return _cache_response(request, record, cache_key, response)
 
     except Exception as e:
         print(f'Failed to generate evolution. {str(e)}')
@@ -320,10 +743,17 @@ def SpectralRecordEvolution(request, record_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(CHART_DATA_RENDERERS)
 def SpectralRecordSpectrum(request, record_id):
-    """Get energy/channel spectrum (sum over all exposures) from Parquet artifact.
+    """Get energy/channel spectrum (sum over all exposures) from the cumulative spectrum index.
+    Optional time_from/time_to query parameters (ms, see time_base of the evolution) restrict
+    the time window, the window spectrum is the difference of two cumulative rows.
+    Optional channel_from/channel_to or energy_from/energy_to (keV, calibrated records)
+    restrict the returned channels.
+    Responses are shared by all web processes through the Redis result cache.
 
     Returns {spectrum_values: [[channel_or_keV, cps], ...], total_time: float, calib: bool}
+    or, with a binary Accept header (see SpectralRecordEvolution), float32 columns x and cps
     """
     try:
         try:
@@ -335,32 +765,63 @@ def SpectralRecordSpectrum(request, record_id):
         if not has_permission:
             return Response({'error': 'You do not have permission to access this record'}, status=status.HTTP_403_FORBIDDEN)
 
-        df, err = _load_spectral_parquet(record)
+        offset, err = _parse_time_base(request, record)
+        if err:
+            return err
+
+        time_from, time_to, err = _parse_time_window(request, offset)
+        if err:
+            return err
+
+        channel_range, err = _parse_channel_window(request, record)
         if err:
             return err
 
-        channel_columns = [col for col in df.columns if col.startswith('channel_')]
+        if record.processing_status != SpectralRecord.PROCESSING_COMPLETED:
+            return Response(
+                {'error': f'Processing not completed. Status: {record.processing_status}'},
+                status=status.HTTP_425_TOO_EARLY
+            )
 
-        total_time = float(df['time_ms'].max() - df['time_ms'].min())
-        if total_time == 0:
-            total_time = 1.0
+        cache_key = _result_cache_key('spectrum', request, record)
+        cached = _cached_response(request, cache_key)
+        if cached is not None:
+            return cached
 
-        # Sum all rows per channel → total counts, then divide by time → cps
-        channel_sums = df[channel_columns].sum(axis=0) / total_time
-        channel_sums = channel_sums.fillna(0)
+        window_spectrum = _load_window_spectrum(record, time_from, time_to)
+        if window_spectrum is None:
+            # records processed before the spectrum index existed
+            data, err = _load_spectral_parquet(
+                record, time_from, time_to, columns=('time_ms', 'channels'), channel_range=channel_range
+            )
+            if err:
+                return err
+            total_time = _total_time(data.time_ms)
+            channel_counts = data.channels.sum(axis=0, dtype=np.int64)
+            channel_numbers = data.channel_numbers
+        else:
+            channel_counts, channel_numbers, total_time = window_spectrum
+            if channel_range is not None:
+                in_window = (channel_numbers >= channel_range[0]) & (channel_numbers <= channel_range[1])
+                channel_counts, channel_numbers = channel_counts[in_window], channel_numbers[in_window]
+
+        # Total counts per channel divided by time → cps
+        channel_sums = np.nan_to_num(channel_counts / total_time, nan=0.0)
 
         has_calib = record.calib is not None
-        spectrum_values = []
-        for col in channel_columns:
-            channel_num = int(col.replace('channel_', ''))
-            cps = float(channel_sums[col])
-            if has_calib:
-                x_val = (record.calib.coef0 + channel_num * record.calib.coef1) / 1000  # keV
-            else:
-                x_val = channel_num
-            spectrum_values.append([x_val, cps])
+        if has_calib:
+            x_values = (record.calib.coef0 + channel_numbers * record.calib.coef1) / 1000  # keV
+        else:
+            x_values = channel_numbers
 
-        return Response({
+        if _wants_columns(request):
+            columns = {'x': x_values.astype(np.float32), 'cps': channel_sums.astype(np.float32)}
+            meta = {'total_time': total_time, 'calib': has_calib}
+            return _cache_response(request, record, cache_key, ColumnarData(columns, meta))
+
+        spectrum_values = [[x, cps] for x, cps in zip(x_values.tolist(), channel_sums.tolist())]
+
+        return _cache_response(request, record, cache_key, {
             'spectrum_values': spectrum_values,
             'total_time': total_time,
             'calib': has_calib,
@@ -368,4 +829,76 @@ def SpectralRecordSpectrum(request, record_id):
 
     except Exception as e:
         print(f'Failed to generate spectrum. {str(e)}')
-        return Response({'error': 'Failed to generate spectrum data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({'error': 'Failed to generate spectrum data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def SpectralRecordTelemetry(request, record_id):
+    """Get auxiliary $CANDY fields and telemetry sentences from the telemetry artifact.
+    Without `sentence` the available sentences and their fields are listed (no artifact read).
+    With `sentence` (e.g. HOUSE) only the requested comma separated `fields`
+    (default: all of the sentence) within optional time_from/time_to (ms, see time_base of the evolution) are read.
+
+    Returns {sentences: {name: {rows, fields}}, header: {...}} or
+            {sentence: str, time_ms: [...], fields: {field_N: [...]}}, values which are not numbers are null
+    """
+    try:
+        try:
+            record = SpectralRecord.objects.get(id=record_id)
+        except SpectralRecord.DoesNotExist:
+            return Response({'error': 'SpectralRecord not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        has_permission, _ = check_spectral_record_permission(request.user, record)
+        if not has_permission:
+            return Response({'error': 'You do not have permission to access this record'}, status=status.HTTP_403_FORBIDDEN)
+
+        offset, err = _parse_time_base(request, record)
+        if err:
+            return err
+
+        time_from, time_to, err = _parse_time_window(request, offset)
+        if err:
+            return err
+
+        if record.processing_status != SpectralRecord.PROCESSING_COMPLETED:
+            return Response(
+                {'error': f'Processing not completed. Status: {record.processing_status}'},
+                status=status.HTTP_425_TOO_EARLY
+            )
+
+        artifact = SpectralRecordArtifact.objects.filter(
+            spectral_record=record,
+            artifact_type=SpectralRecordArtifact.TELEMETRY
+        ).select_related('artifact').first()
+        if artifact is None:
+            return Response({'error': 'Telemetry artifact not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        metadata = artifact.artifact.metadata
+        sentence = request.GET.get('sentence')
+        if not sentence:
+            return Response({'sentences': metadata['sentences'], 'header': metadata['header']})
+
+        if sentence not in metadata['sentences']:
+            return Response({'error': f'Unknown sentence {sentence}'}, status=status.HTTP_400_BAD_REQUEST)
+        available = metadata['sentences'][sentence]['fields']
+        fields = [field for field in request.GET.get('fields', '').split(',') if field] or available
+        unknown = [field for field in fields if field not in available]
+        if unknown:
+            return Response({'error': f"Unknown fields of {sentence}: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with open_artifact(artifact.artifact.file) as artifact_file:
+            time_ms, values = read_telemetry(artifact_file, sentence, fields, time_from, time_to)
+
+        def as_list(array):
+            return np.where(np.isnan(array), None, array).tolist()
+
+        return Response({
+            'sentence': sentence,
+            'time_ms': as_list(time_ms + offset),
+            'fields': {field: as_list(array) for field, array in values.items()},
+        })
+
+    except Exception as e:
+        logger.exception(f'Failed to get telemetry: {str(e)}')
+        return Response({'error': 'Failed to get telemetry data.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -5,6 +5,9 @@ import { theme } from '../theme'
 
 type EvolutionData = {
   evolution_values: [number, number][]
+  // min/max of the exposures of every point, aggregated levels only
+  evolution_min: [number, number][] | null
+  evolution_max: [number, number][] | null
   total_time: number
 }
 
@@ -14,6 +17,39 @@ type SpectrumData = {
   calib: boolean
 }
 
+// Raw little-endian columns (see backend api/renderers.py), no JSON parsing of every value
+const COLUMNS_MEDIA_TYPE = 'application/x-dosportal-columns'
+
+type ColumnHeader = { name: string; dtype: '<f8' | '<f4' | '<u4'; length: number; offset: number }
+
+const decodeColumns = (buffer: ArrayBuffer) => {
+  const view = new DataView(buffer)
+  const headerLength = view.getUint32(4, true)
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength))) as {
+    meta: Record<string, unknown>
+    columns: ColumnHeader[]
+  }
+  const base = 8 + headerLength
+  const columns: Record<string, Float64Array | Float32Array | Uint32Array> = {}
+  for (const column of header.columns) {
+    const offset = base + column.offset
+    columns[column.name] =
+      column.dtype === '<f8' ? new Float64Array(buffer, offset, column.length)
+        : column.dtype === '<f4' ? new Float32Array(buffer, offset, column.length)
+          : new Uint32Array(buffer, offset, column.length)
+  }
+  return { meta: header.meta, columns }
+}
+
+const toPairs = (x: ArrayLike<number>, y: ArrayLike<number>): [number, number][] =>
+  Array.from({ length: x.length }, (_, i) => [x[i], y[i]])
+
+const fetchColumns = (url: string, headers: Record<string, string>, label: string) =>
+  fetch(url, { method: 'GET', headers: { ...headers, Accept: COLUMNS_MEDIA_TYPE } }).then(res => {
+    if (!res.ok) throw new Error(`${label} HTTP ${res.status}`)
+    return res.arrayBuffer().then(decodeColumns)
+  })
+
 export const SpectralCharts = ({
   apiBase,
   recordId,
@@ -35,21 +71,24 @@ export const SpectralCharts = ({
       ...getAuthHeader(),
     }
 
-    const fetchEvolution = fetch(`${apiBase}/spectral-record/${recordId}/evolution/`, {
-      method: 'GET',
-      headers,
-    }).then(res => {
-      if (!res.ok) throw new Error(`Evolution HTTP ${res.status}`)
-      return res.json() as Promise<EvolutionData>
-    })
-
-    const fetchSpectrum = fetch(`${apiBase}/spectral-record/${recordId}/spectrum/`, {
-      method: 'GET',
-      headers,
-    }).then(res => {
-      if (!res.ok) throw new Error(`Spectrum HTTP ${res.status}`)
-      return res.json() as Promise<SpectrumData>
-    })
+    // a min/max pair per horizontal pixel is all the chart can show
+    const maxPoints = 2 * Math.ceil(window.innerWidth * (window.devicePixelRatio || 1))
+    const fetchEvolution = fetchColumns(
+      `${apiBase}/spectral-record/${recordId}/evolution/?max_points=${maxPoints}`, headers, 'Evolution'
+    ).then(({ meta, columns }): EvolutionData => ({
+      evolution_values: toPairs(columns.time_ms, columns.cps),
+      evolution_min: columns.cps_min ? toPairs(columns.time_ms, columns.cps_min) : null,
+      evolution_max: columns.cps_max ? toPairs(columns.time_ms, columns.cps_max) : null,
+      total_time: meta.total_time as number,
+    }))
+
+    const fetchSpectrum = fetchColumns(
+      `${apiBase}/spectral-record/${recordId}/spectrum/`, headers, 'Spectrum'
+    ).then(({ meta, columns }): SpectrumData => ({
+      spectrum_values: toPairs(columns.x, columns.cps),
+      total_time: meta.total_time as number,
+      calib: meta.calib as boolean,
+    }))
 
     Promise.all([fetchEvolution, fetchSpectrum])
       .then(([evo, spec]) => {
@@ -90,6 +129,21 @@ export const SpectralCharts = ({
     ? { name: 'Energy [keV]', axisLabel: { formatter: '{value} keV' } }
     : { name: 'Channel [#]', axisLabel: { formatter: '{value} ch' } }
 
+  // Aggregated points hold the mean of their exposures, a short peak only shows in the max
+  const rangeSeries = (id: string, data: [number, number][] | null) =>
+    data ? [{
+      id,
+      data,
+      type: 'line' as const,
+      xAxisIndex: 0,
+      yAxisIndex: 0,
+      symbol: 'none',
+      lineStyle: { color: '#198754', opacity: 0.35, width: 1 },
+      z: 1,
+      emphasis: { disabled: true },
+      tooltip: { show: false },
+    }] : []
+
   const option: EChartsOption = {
     title: [
       { left: 'center', text: 'Counts evolution', top: '0%' },
@@ -178,6 +232,8 @@ export const SpectralCharts = ({
         symbolSize: 5,
         itemStyle: { color: '#198754' },
       },
+      ...rangeSeries('evolution-max', evolutionData.evolution_max),
+      ...rangeSeries('evolution-min', evolutionData.evolution_min),
       {
         id: 'spectrum-trend',
         data: spectrumData.spectrum_values,
@@ -15,8 +15,35 @@ type SpectralRecord = {
   raw_file_id: string | null
   artifacts_count: number
   description?: string
+  log_metadata?: LogMetadata | null
 }
 
+// Read from both ends of the log at upload, available before processing
+type LogMetadata = {
+  detector_type: string | null
+  detector_sn: string | null
+  duration_ms: number | null
+  exposures_estimate: number | null
+}
+
+type ProcessingProgress = {
+  processing_status: string
+  stage: string | null
+  percent: number | null
+  updated: number | null
+}
+
+const PROCESSING_STAGE_LABELS: Record<string, string> = {
+  'parse': 'Parsing log',
+  'encode': 'Writing spectral file',
+  'transform': 'Building derived artifacts',
+}
+
+// Seconds the status endpoint holds a request until progress changes
+const STATUS_WAIT_SECONDS = 20
+
+const isFinished = (status?: string) => status === 'completed' || status === 'failed'
+
 const PROCESSING_STATUS_LABELS: Record<string, string> = {
   'pending': 'Pending',
   'processing': 'Processing',
@@ -45,6 +72,7 @@ export const SpectralRecordStatusPage = ({
   const [record, setRecord] = useState<SpectralRecord | null>(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
+  const [progress, setProgress] = useState<ProcessingProgress | null>(null)
 
   const fetchRecord = async () => {
     if (!isAuthed || !id) return
@@ -86,20 +114,56 @@ export const SpectralRecordStatusPage = ({
 
   useEffect(() => {
     fetchRecord()
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [apiBase, isAuthed, id])
 
-    // Only poll if status is pending or processing
-    if (record && (record.processing_status === 'completed' || record.processing_status === 'failed')) {
-      return
-    }
+  // Long-poll the status endpoint, it answers as soon as the ingestion task publishes progress
+  useEffect(() => {
+    if (!isAuthed || !id) return
+    const controller = new AbortController()
 
-    // Poll every 5 seconds
-    const interval = setInterval(() => {
-      fetchRecord()
-    }, 5000)
+    const pollStatus = async () => {
+      let since = 0
+      while (!controller.signal.aborted) {
+        try {
+          const res = await fetch(
+            `${apiBase}/spectral-record/${id}/status/?wait=${STATUS_WAIT_SECONDS}&since=${since}`,
+            {
+              method: 'GET',
+              headers: {
+                'Content-Type': 'application/json',
+                ...getAuthHeader(),
+              },
+              signal: controller.signal,
+            }
+          )
+          if (!res.ok) {
+            throw new Error(`HTTP ${res.status}`)
+          }
+          const data: ProcessingProgress = await res.json()
+          setProgress(data)
+          if (isFinished(data.processing_status)) {
+            // final artifacts count and details
+            fetchRecord()
+            return
+          }
+          if (data.updated === null) {
+            // no progress published yet, do not hammer the endpoint
+            await new Promise(resolve => setTimeout(resolve, 5000))
+          } else {
+            since = data.updated
+          }
+        } catch {
+          if (controller.signal.aborted) return
+          await new Promise(resolve => setTimeout(resolve, 5000))
+        }
+      }
+    }
 
-    return () => clearInterval(interval)
+    pollStatus()
+    return () => controller.abort()
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [apiBase, isAuthed, id, record?.processing_status])
+  }, [apiBase, isAuthed, id])
 
   const formatDate = (dateStr?: string) => {
     if (!dateStr) return 'N/A'
@@ -116,6 +180,13 @@ export const SpectralRecordStatusPage = ({
     }
   }
 
+  const formatDuration = (ms: number) => {
+    const seconds = Math.round(ms / 1000)
+    const hours = Math.floor(seconds / 3600)
+    const minutes = Math.floor((seconds % 3600) / 60)
+    return `${hours} h ${minutes} min ${seconds % 60} s`
+  }
+
   const handleClose = () => {
     navigate('/logs')
   }
@@ -193,9 +264,11 @@ export const SpectralRecordStatusPage = ({
     )
   }
 
-  const statusLabel = PROCESSING_STATUS_LABELS[record.processing_status] || record.processing_status
-  const statusColor = PROCESSING_STATUS_COLORS[record.processing_status] || theme.colors.textSecondary
-  const isCompleted = record.processing_status === 'completed'
+  const processingStatus = progress?.processing_status ?? record.processing_status
+  const statusLabel = PROCESSING_STATUS_LABELS[processingStatus] || processingStatus
+  const statusColor = PROCESSING_STATUS_COLORS[processingStatus] || theme.colors.textSecondary
+  const isCompleted = processingStatus === 'completed'
+  const stageLabel = progress?.stage ? (PROCESSING_STAGE_LABELS[progress.stage] || progress.stage) : null
 
   return (
     <PageLayout>
@@ -231,7 +304,7 @@ export const SpectralRecordStatusPage = ({
               alignItems: 'center',
               gap: theme.spacing.sm,
             }}>
-              {record.processing_status === 'processing' && (
+              {processingStatus === 'processing' && (
                 <div style={{
                   width: '20px',
                   height: '20px',
@@ -255,6 +328,11 @@ export const SpectralRecordStatusPage = ({
               }}>
                 {statusLabel}
               </span>
+              {processingStatus === 'processing' && progress?.percent != null && (
+                <span style={{ color: theme.colors.textSecondary }}>
+                  {progress.percent}%{stageLabel && ` · ${stageLabel}`}
+                </span>
+              )}
             </div>
           </div>
           
@@ -263,6 +341,26 @@ export const SpectralRecordStatusPage = ({
             value={formatDate(record.created)}
             isReadOnly={true}
           />
+
+          {record.log_metadata && (
+            <>
+              <FormField
+                label="Detector"
+                value={[record.log_metadata.detector_type, record.log_metadata.detector_sn].filter(Boolean).join(' · ') || '—'}
+                isReadOnly={true}
+              />
+              <FormField
+                label="Duration"
+                value={record.log_metadata.duration_ms != null ? formatDuration(record.log_metadata.duration_ms) : '—'}
+                isReadOnly={true}
+              />
+              <FormField
+                label="Exposures (approx.)"
+                value={record.log_metadata.exposures_estimate != null ? record.log_metadata.exposures_estimate.toLocaleString('en-US') : '—'}
+                isReadOnly={true}
+              />
+            </>
+          )}
           
           {record.author && (
             <div style={{ marginBottom: theme.spacing['2xl'], paddingBottom: theme.spacing.lg, borderBottom: `${theme.borders.width} solid ${theme.colors.border}` }}>